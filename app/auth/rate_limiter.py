@@ -8,7 +8,7 @@ from pathlib import Path
 from threading import Lock
 
 from app.api.errors import ApiError, ApiErrorCode
-from app.core.migrations import apply_migrations
+from app.core.migrations import apply_migrations, configure_connection
 
 
 class LoginRateLimiter:
@@ -25,6 +25,7 @@ class LoginRateLimiter:
         """Initialize limiter storage and policy parameters."""
         apply_migrations(database_path)
         self._connection = sqlite3.connect(str(database_path), check_same_thread=False)
+        configure_connection(self._connection)
         self._connection.row_factory = sqlite3.Row
         self._lock = Lock()
         self._max_attempts = max(1, int(max_attempts))
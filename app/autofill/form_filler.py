@@ -4,8 +4,6 @@ import base64
 import logging
 import os
 import re
-import shutil
-from datetime import datetime
 from pathlib import Path
 from time import monotonic
 from typing import Any
@@ -21,7 +19,9 @@ from playwright.sync_api import (
 )
 
 from app.autofill.form_helpers import (
+    artifact_timestamp as _artifact_timestamp,
     check_download_content as _check_download_content,
+    chromium_on_path as _chromium_on_path,
     download_filename as _download_filename,
     extract_known_server_error as _extract_known_server_error,
     is_blocked_page_html as _is_blocked_page_html,
@@ -43,16 +43,7 @@ def _chromium_executable_path() -> str | None:
     explicit = os.getenv("PLAYWRIGHT_CHROMIUM_EXECUTABLE_PATH", "").strip()
     if explicit:
         return explicit
-    for candidate in [
-        "chromium",
-        "chromium-browser",
-        "google-chrome",
-        "google-chrome-stable",
-    ]:
-        found = shutil.which(candidate)
-        if found:
-            return found
-    return None
+    return _chromium_on_path()
 
 
 def _launch_chromium(p, *, headless: bool, slow_mo: int, args: list[str] | None = None):
@@ -157,7 +148,7 @@ def _ensure_form_loaded(
                 raise RuntimeError(details)
             dump_path = (
                 target_dir
-                / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{_slugify(stage)}_blocked_page.html"
+                / f"{_artifact_timestamp()}_{_slugify(stage)}_blocked_page.html"
             )
             screenshot_path: Path | None = None
             try:
@@ -188,8 +179,7 @@ def _ensure_form_loaded(
         raise RuntimeError(details)
 
     dump_path = (
-        target_dir
-        / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{_slugify(stage)}_form_not_ready.html"
+        target_dir / f"{_artifact_timestamp()}_{_slugify(stage)}_form_not_ready.html"
     )
     screenshot_path = None
     try:
@@ -467,7 +457,7 @@ def _select_tramite(page: Page, payload: dict[str, Any], timeout: int) -> None:
 
 def _save_screenshot(page: Page, download_dir: Path, name: str) -> Path:
     download_dir.mkdir(parents=True, exist_ok=True)
-    filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{_slugify(name)}.png"
+    filename = f"{_artifact_timestamp()}_{_slugify(name)}.png"
     path = download_dir / filename
     page.screenshot(path=str(path), full_page=True)
     return path
@@ -677,9 +667,7 @@ def _save_from_popup_page(
         output_path.write_bytes(content)
         return output_path
 
-    dump = (
-        target_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_popup_response.html"
-    )
+    dump = target_dir / f"{_artifact_timestamp()}_popup_response.html"
     try:
         dump.write_bytes(content)
     except Exception:
@@ -819,10 +807,7 @@ def _save_from_form_fetch(
         return None
 
     if not _is_pdf_bytes(body):
-        dump = (
-            target_dir
-            / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_form_fetch_response.bin"
-        )
+        dump = target_dir / f"{_artifact_timestamp()}_form_fetch_response.bin"
         dump.write_bytes(body)
         LOGGER.warning(
             "Form fetch fallback returned non-PDF bytes. status=%s ctype=%s dump=%s",
@@ -980,7 +965,7 @@ def fill_and_download(
             if manual_download:
                 html_dump = (
                     target_dir
-                    / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_manual_download_timeout_dump.html"
+                    / f"{_artifact_timestamp()}_manual_download_timeout_dump.html"
                 )
                 html_dump.write_text(page.content(), encoding="utf-8")
                 shot = _save_screenshot(page, target_dir, "manual_download_timeout")
@@ -1023,7 +1008,7 @@ def fill_and_download(
 
                         raw_dump = (
                             target_dir
-                            / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_network_response_{idx}.bin"
+                            / f"{_artifact_timestamp()}_network_response_{idx}.bin"
                         )
                         raw_dump.write_bytes(body)
                         server_err = _extract_known_server_error(body)
@@ -1062,7 +1047,7 @@ def fill_and_download(
                             return out
                         dump = (
                             target_dir
-                            / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_replay_response_{idx}.bin"
+                            / f"{_artifact_timestamp()}_replay_response_{idx}.bin"
                         )
                         dump.write_bytes(body or b"")
                         server_err = _extract_known_server_error(body or b"")
@@ -1147,8 +1132,7 @@ def fill_and_download(
                 return fetched
 
             html_dump = (
-                target_dir
-                / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_download_timeout_dump.html"
+                target_dir / f"{_artifact_timestamp()}_download_timeout_dump.html"
             )
             html_dump.write_text(page.content(), encoding="utf-8")
             shot = _save_screenshot(page, target_dir, "download_timeout")
@@ -1207,7 +1191,7 @@ def fill_for_manual_handoff(
             LOGGER.info("Manual handoff screenshot saved: %s", shot)
             dom_snapshot = ""
             if save_dom_snapshot:
-                dom_name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_autofill_manual_handoff.html"
+                dom_name = f"{_artifact_timestamp()}_autofill_manual_handoff.html"
                 dom_path = target_dir / dom_name
                 dom_path.write_text(page.content(), encoding="utf-8")
                 dom_snapshot = str(dom_path)
@@ -1249,7 +1233,7 @@ def fill_for_manual_handoff_on_page(
     LOGGER.info("Manual handoff (existing page) screenshot saved: %s", shot)
     dom_snapshot = ""
     if save_dom_snapshot:
-        dom_name = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_autofill_manual_handoff_existing_page.html"
+        dom_name = f"{_artifact_timestamp()}_autofill_manual_handoff_existing_page.html"
         dom_path = target_dir / dom_name
         dom_path.write_text(page.content(), encoding="utf-8")
         dom_snapshot = str(dom_path)
@@ -3,7 +3,9 @@
 from __future__ import annotations
 
 import re
+import shutil
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
@@ -46,6 +48,11 @@ def _safe_value(payload: dict[str, Any], *path: str) -> str:
     return str(node).strip()
 
 
+def artifact_timestamp() -> str:
+    """Second-resolution timestamp used to prefix debug artifact filenames."""
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+
 def download_filename(payload: dict[str, Any], suggested_name: str) -> str:
     """Build deterministic output filename for downloaded document."""
     prefix = _safe_value(payload, "download", "filename_prefix") or "tasa790_012"
@@ -82,3 +89,22 @@ def extract_known_server_error(body: bytes) -> str:
     if "debe seleccionar uno de los trámites" in normalized:
         return "Server validation error: trámite option not selected."
     return ""
+
+
+@lru_cache(maxsize=1)
+def chromium_on_path() -> str | None:
+    """Return the first Chromium/Chrome binary found on ``PATH``, if any.
+
+    Cached: PATH lookups stat every directory, and the installed browser does
+    not change while the process runs.
+    """
+    for candidate in [
+        "chromium",
+        "chromium-browser",
+        "google-chrome",
+        "google-chrome-stable",
+    ]:
+        found = shutil.which(candidate)
+        if found:
+            return found
+    return None
@@ -3,10 +3,14 @@ from __future__ import annotations
 import logging
 import os
 import re
-import shutil
+from dataclasses import dataclass, field as dataclass_field
 from datetime import datetime
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Any
+from threading import Lock
+from time import monotonic
+from types import MappingProxyType
+from typing import Any, Mapping
 from urllib.parse import urlparse
 
 import fitz  # PyMuPDF
@@ -14,12 +18,13 @@ import requests
 from playwright.sync_api import Page, sync_playwright
 from requests.exceptions import SSLError
 
+from app.autofill.form_helpers import chromium_on_path as _chromium_on_path
 from app.autofill.placeholder_helpers import (
     canonical_from_placeholder as _canonical_from_placeholder_impl,
     canonical_keys_from_placeholder_tokens as _canonical_keys_from_placeholder_tokens_impl,
-    eval_checked_when as _eval_checked_when_impl,
-    rule_context as _rule_context_impl,
-    select_canonical_for_composite_placeholder as _select_canonical_for_composite_placeholder_impl,
+    eval_checked_when as _eval_checked_when,
+    rule_context as _rule_context,
+    select_canonical_for_composite_placeholder as _select_canonical_for_composite_placeholder,
 )
 from app.autofill.target_helpers import (
     build_date_split_field_values as _build_date_split_field_values,
@@ -36,10 +41,13 @@ from app.autofill.target_helpers import (
     strip_extra_spaces as _strip_extra_spaces,
 )
 from app.autofill.target_pdf_helpers import (
-    build_nif_split_field_map as _build_nif_split_field_map_impl,
+    CheckboxContext,
+    PdfWidgetRecord,
+    build_nif_split_field_map as _build_nif_split_field_map,
     infer_pdf_checkbox_expected as _infer_pdf_checkbox_expected_impl,
     pdf_value_for_field as _pdf_value_for_field_impl,
-    should_ignore_pdf_mapping as _should_ignore_pdf_mapping_impl,
+    pdf_widget_record,
+    should_ignore_pdf_mapping as _should_ignore_pdf_mapping,
 )
 
 try:
@@ -49,6 +57,13 @@ except Exception:  # pragma: no cover
 
 LOGGER = logging.getLogger(__name__)
 
+# Forwarders that only fix keyword arguments are bound once at import.
+_pdf_value_for_field = partial(
+    _pdf_value_for_field_impl,
+    norm_text=_norm_text,
+    strip_extra_spaces=_strip_extra_spaces,
+)
+
 CANONICAL_FIELD_KEYS: list[str] = [
     "nif_nie",
     "nif_nie_prefix",
@@ -99,20 +114,72 @@ CANONICAL_FIELD_KEYS: list[str] = [
 
 CANONICAL_FILL_PRIORITY: list[str] = list(CANONICAL_FIELD_KEYS)
 CANONICAL_FIELD_KEY_SET: set[str] = set(CANONICAL_FIELD_KEYS)
+_ORDER_MAP: dict[str, int] = {
+    key: idx for idx, key in enumerate(CANONICAL_FILL_PRIORITY)
+}
 PLACEHOLDER_RE = re.compile(r"^\{([a-z_]+)\}$", re.I)
 PLACEHOLDER_TOKEN_RE = re.compile(r"\{([a-z_]+)\}", re.I)
+_SLUG_RE = re.compile(r"[^a-z0-9]+")
+_NIE_RE = re.compile(r"([XYZ])(\d{7})([A-Z])")
+_NON_ALNUM_UPPER_RE = re.compile(r"[^A-Z0-9]")
+_CHECK_KINDS = frozenset({"checkbox", "radio"})
 
 
+@lru_cache(maxsize=None)
 def _env_flag(name: str, default: bool) -> bool:
+    # Resolved lazily (after load_dotenv) and cached for the process lifetime.
     raw = os.getenv(name, "1" if default else "0").strip().lower()
     return raw in {"1", "true", "yes", "on"}
 
 
+@lru_cache(maxsize=1)
+def _pdf_flatten_widgets_enabled() -> bool:
+    # Any value other than an explicit "off" spelling enables baking.
+    raw = os.getenv("PDF_FLATTEN_WIDGETS", "0").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+@lru_cache(maxsize=1)
+def _pdf_preview_dpi() -> int:
+    # Preview PNGs are for humans; 96 dpi is a third of the pixels of 160.
+    try:
+        dpi = int(os.getenv("PDF_PREVIEW_DPI", "96"))
+    except ValueError:
+        return 96
+    return dpi if dpi > 0 else 96
+
+
+def refresh_env_flags() -> None:
+    """Drop cached env flags so changed environment values are re-read."""
+    _env_flag.cache_clear()
+    _pdf_flatten_widgets_enabled.cache_clear()
+    _pdf_preview_dpi.cache_clear()
+
+
 def is_template_debug_capture_enabled() -> bool:
     # Dev-only verbose artifacts for template debugging.
     return _env_flag("TEMPLATE_DEBUG_CAPTURE", False)
 
 
+def is_template_debug_screenshot_enabled() -> bool:
+    # Full-page captures are the slowest part of a debug bundle; opt in separately.
+    return is_template_debug_capture_enabled() and _env_flag(
+        "TEMPLATE_DEBUG_SCREENSHOTS", False
+    )
+
+
+def is_template_debug_html_enabled() -> bool:
+    # Serializing the whole DOM over CDP is costly on heavy pages; opt in.
+    return is_template_debug_capture_enabled() and _env_flag(
+        "TEMPLATE_DEBUG_HTML", False
+    )
+
+
+def is_template_debug_combined_enabled() -> bool:
+    # One bundle.json per capture instead of five small JSON files.
+    return _env_flag("TEMPLATE_DEBUG_COMBINED", False)
+
+
 def should_save_artifact_screenshots() -> bool:
     # Screenshots are allowed only in explicit template debug mode.
     return is_template_debug_capture_enabled() and _env_flag(
@@ -131,16 +198,7 @@ def _chromium_executable_path() -> str | None:
     explicit = os.getenv("PLAYWRIGHT_CHROMIUM_EXECUTABLE_PATH", "").strip()
     if explicit:
         return explicit
-    for candidate in [
-        "chromium",
-        "chromium-browser",
-        "google-chrome",
-        "google-chrome-stable",
-    ]:
-        found = shutil.which(candidate)
-        if found:
-            return found
-    return None
+    return _chromium_on_path()
 
 
 def _launch_chromium(p, *, headless: bool, slow_mo: int):
@@ -152,7 +210,7 @@ def _launch_chromium(p, *, headless: bool, slow_mo: int):
 
 
 def _slugify(value: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "_", (value or "").lower()).strip("_")
+    return _SLUG_RE.sub("_", (value or "").lower()).strip("_")
 
 
 def _safe(payload: dict[str, Any], *path: str) -> str:
@@ -166,13 +224,31 @@ def _safe(payload: dict[str, Any], *path: str) -> str:
     return str(node).strip()
 
 
+def _parse_lower(url: str) -> tuple[str, str, str, str]:
+    parsed = urlparse(url or "")
+    return (
+        (parsed.scheme or "").lower(),
+        (parsed.netloc or "").lower(),
+        (parsed.path or "").lower(),
+        (parsed.query or "").lower(),
+    )
+
+
+def _response_looks_like_pdf(resp: requests.Response) -> bool:
+    content_type = (resp.headers.get("content-type") or "").lower()
+    content_disp = (resp.headers.get("content-disposition") or "").lower()
+    _, _, final_path, _ = _parse_lower(resp.url)
+    return (
+        "application/pdf" in content_type
+        or ".pdf" in final_path
+        or ".pdf" in content_disp
+    )
+
+
 def _infer_target_type(target_url: str) -> str:
-    raw = (target_url or "").lower()
-    parsed = urlparse(target_url)
-    path = (parsed.path or "").lower()
-    host = (parsed.netloc or "").lower()
-    query = (parsed.query or "").lower()
-    if path.endswith(".pdf") or ".pdf" in raw or ".pdf" in query:
+    _, host, path, _ = _parse_lower(target_url)
+    # Path suffix and query hits are both substrings of the raw URL.
+    if ".pdf" in (target_url or "").lower():
         return "pdf"
     # inclusion.gob.es serves some PDF forms under extension-less /documents/d/... URLs.
     if "inclusion.gob.es" in host and path.startswith("/documents/d/"):
@@ -184,14 +260,7 @@ def _infer_target_type(target_url: str) -> str:
         head = requests.head(
             target_url, timeout=8, headers=headers, allow_redirects=True
         )
-        content_type = (head.headers.get("content-type") or "").lower()
-        content_disp = (head.headers.get("content-disposition") or "").lower()
-        final_path = (urlparse(head.url).path or "").lower()
-        if (
-            "application/pdf" in content_type
-            or ".pdf" in final_path
-            or ".pdf" in content_disp
-        ):
+        if _response_looks_like_pdf(head):
             return "pdf"
     except Exception:
         pass
@@ -199,21 +268,38 @@ def _infer_target_type(target_url: str) -> str:
         probe = requests.get(
             target_url, timeout=8, headers=headers, allow_redirects=True, stream=True
         )
-        content_type = (probe.headers.get("content-type") or "").lower()
-        content_disp = (probe.headers.get("content-disposition") or "").lower()
-        final_path = (urlparse(probe.url).path or "").lower()
-        if (
-            "application/pdf" in content_type
-            or ".pdf" in final_path
-            or ".pdf" in content_disp
-        ):
+        if _response_looks_like_pdf(probe):
             return "pdf"
     except Exception:
         pass
     return "html"
 
 
+_PDF_BYTES_TTL_SECONDS = 60.0
+_PDF_BYTES_CACHE_MAX = 8
+# url -> (fetched_at, data, content_type); probes and debug captures of one
+# form read the same PDF several times within seconds. The fill itself always
+# downloads fresh bytes so a regenerated PDF is never filled from a stale copy.
+_PDF_BYTES_CACHE: dict[str, tuple[float, bytes, str]] = {}
+_PDF_BYTES_CACHE_LOCK = Lock()
+
+
 def _fetch_pdf_bytes(target_url: str, timeout_ms: int) -> tuple[bytes, str]:
+    now = monotonic()
+    with _PDF_BYTES_CACHE_LOCK:
+        cached = _PDF_BYTES_CACHE.get(target_url)
+    if cached is not None and now - cached[0] < _PDF_BYTES_TTL_SECONDS:
+        return cached[1], cached[2]
+    data, content_type = _download_pdf_bytes(target_url, timeout_ms)
+    with _PDF_BYTES_CACHE_LOCK:
+        _PDF_BYTES_CACHE.pop(target_url, None)
+        if len(_PDF_BYTES_CACHE) >= _PDF_BYTES_CACHE_MAX:
+            _PDF_BYTES_CACHE.pop(next(iter(_PDF_BYTES_CACHE)))
+        _PDF_BYTES_CACHE[target_url] = (now, data, content_type)
+    return data, content_type
+
+
+def _download_pdf_bytes(target_url: str, timeout_ms: int) -> tuple[bytes, str]:
     headers = {"User-Agent": "Mozilla/5.0 OCR-MRZ Autofill"}
     ssl_verify_env = os.getenv("PDF_SSL_VERIFY", "1").strip().lower()
     ssl_verify_enabled = ssl_verify_env not in {"0", "false", "no", "off"}
@@ -298,7 +384,7 @@ def _build_value_map(payload: dict[str, Any]) -> dict[str, str]:
     # Spanish forms usually split street line from number/floor/door fields.
     domicilio_en_espana = " ".join(x for x in [tipo_via, nombre_via] if x).strip()
     nif_nie = _safe(payload, "identificacion", "nif_nie").upper()
-    m_nie = re.fullmatch(r"([XYZ])(\d{7})([A-Z])", re.sub(r"[^A-Z0-9]", "", nif_nie))
+    m_nie = _NIE_RE.fullmatch(_NON_ALNUM_UPPER_RE.sub("", nif_nie))
     nie_prefix = m_nie.group(1) if m_nie else ""
     nie_number = m_nie.group(2) if m_nie else ""
     nie_suffix = m_nie.group(3) if m_nie else ""
@@ -390,10 +476,6 @@ def _canonical_keys_from_placeholder_tokens(value: str) -> tuple[list[str], list
     )
 
 
-def _select_canonical_for_composite_placeholder(keys: list[str]) -> str:
-    return _select_canonical_for_composite_placeholder_impl(keys)
-
-
 def _set_if_possible(page: Page, selectors: list[str], value: str) -> bool:
     if not value:
         return False
@@ -461,12 +543,60 @@ def _select_if_possible(page: Page, selectors: list[str], value: str) -> bool:
     return False
 
 
-def _fill_by_label(page: Page, patterns: list[str], value: str) -> bool:
+def _label_patterns(*patterns: str) -> tuple[re.Pattern[str], ...]:
+    return tuple(re.compile(pattern, re.I) for pattern in patterns)
+
+
+# Label regexes used by the generic HTML adapter, keyed by canonical field.
+_LABEL_PATTERNS: dict[str, tuple[re.Pattern[str], ...]] = {
+    "nif_nie": _label_patterns(r"NIF\s*/\s*NIE", r"NIE", r"NIF"),
+    "primer_apellido": _label_patterns(r"Primer apellido", r"Raz[oó]n Social"),
+    "segundo_apellido": _label_patterns(r"Segundo apellido"),
+    "nombre": _label_patterns(r"^Nombre"),
+    "nacionalidad": _label_patterns(r"Nacionalidad"),
+    "tipo_via": _label_patterns(r"Tipo\s+de\s+v[ií]a", r"Calle/plaza/Avda"),
+    "nombre_via": _label_patterns(
+        r"Nombre de la v[ií]a p[uú]blica", r"v[ií]a p[uú]blica"
+    ),
+    "numero": _label_patterns(r"Num", r"N[uú]m"),
+    "escalera": _label_patterns(r"Esc"),
+    "piso": _label_patterns(r"Piso"),
+    "puerta": _label_patterns(r"Pta"),
+    "municipio": _label_patterns(r"Municipio"),
+    "provincia": _label_patterns(r"Provincia"),
+    "cp": _label_patterns(r"C\.?\s*Postal", r"C[oó]digo postal", r"CP"),
+    "telefono": _label_patterns(r"Tel[eé]fono", r"Phone"),
+    "email": _label_patterns(r"mail", r"email", r"correo"),
+    "fecha": _label_patterns(r"fecha"),
+    "nombre_apellidos": _label_patterns(
+        r"nombre\s*y\s*apellidos", r"apellidos\s*y\s*nombre", r"full\s*name"
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def _combined_label_pattern(
+    patterns: tuple[re.Pattern[str], ...],
+) -> re.Pattern[str]:
+    return re.compile("|".join(f"(?:{p.pattern})" for p in patterns), re.I)
+
+
+def _fill_by_label(
+    page: Page, patterns: tuple[re.Pattern[str], ...], value: str
+) -> bool:
     if not value:
         return False
+    if len(patterns) > 1:
+        # One label scan for the whole alternation; pattern priority still
+        # needs the ordered loop below, but absent fields stop here.
+        try:
+            if page.get_by_label(_combined_label_pattern(patterns)).count() == 0:
+                return False
+        except Exception:
+            pass
     for pattern in patterns:
         try:
-            loc = page.get_by_label(re.compile(pattern, re.I)).first
+            loc = page.get_by_label(pattern).first
             if loc.count() == 0:
                 continue
             if not loc.is_visible():
@@ -482,11 +612,19 @@ def inspect_form_fields(page: Page) -> list[dict[str, Any]]:
     rows = page.evaluate(
         """
         () => {
-          const elements = Array.from(document.querySelectorAll("input, select, textarea"));
+          const elements = document.querySelectorAll(
+            ":is(input, select, textarea):not([type='hidden' i]):not([type='submit' i]):not([type='button' i]):not([type='reset' i])"
+          );
+          // One pass over labels instead of a selector query per field; the
+          // first label for an id wins, as with querySelector.
+          const labelFor = new Map();
+          for (const lb of document.querySelectorAll("label[for]")) {
+            const key = lb.getAttribute("for");
+            if (!labelFor.has(key)) labelFor.set(key, lb);
+          }
           const rows = [];
           for (const el of elements) {
             const type = (el.getAttribute("type") || "").toLowerCase();
-            if (type === "hidden" || type === "submit" || type === "button" || type === "reset") continue;
             if (el.disabled) continue;
             let selector = "";
             if (el.id) {
@@ -498,7 +636,7 @@ def inspect_form_fields(page: Page) -> list[dict[str, Any]]:
             }
             let label = "";
             if (el.id) {
-              const byFor = document.querySelector(`label[for="${el.id}"]`);
+              const byFor = labelFor.get(el.id);
               if (byFor) label = (byFor.textContent || "").trim();
             }
             if (!label) {
@@ -527,36 +665,38 @@ def inspect_form_fields(page: Page) -> list[dict[str, Any]]:
 def extract_html_placeholder_mappings(
     page: Page,
 ) -> tuple[list[dict[str, Any]], list[str]]:
+    # PLACEHOLDER_RE runs in the page so only "{key}" fields cross the CDP wire.
     rows = page.evaluate(
         """
         () => {
-          const elements = Array.from(document.querySelectorAll("input, select, textarea"));
+          const re = /^\\{([a-z_]+)\\}$/i;
+          const elements = document.querySelectorAll(
+            ":is(input, select, textarea):not([type='hidden' i]):not([type='submit' i]):not([type='button' i]):not([type='reset' i])"
+          );
           const out = [];
           for (const el of elements) {
-            const type = (el.getAttribute("type") || "").toLowerCase();
-            if (type === "hidden" || type === "submit" || type === "button" || type === "reset") continue;
             if (el.disabled) continue;
+            const match = re.exec((el.value || "").trim());
+            if (!match) continue;
             let selector = "";
             if (el.id) selector = "#" + CSS.escape(el.id);
             else if (el.name) selector = `${el.tagName.toLowerCase()}[name="${el.name.replace(/"/g, '\\"')}"]`;
             else continue;
-            const value = (el.value || "").trim();
-            if (!value) continue;
-            out.push({ selector, value });
+            out.push({ selector, key: match[1].toLowerCase() });
           }
           return out;
         }
         """
     )
     mappings: list[dict[str, Any]] = []
-    unknown_vars: list[str] = []
+    unknown_vars: set[str] = set()
     for row in rows or []:
-        selector = str(row.get("selector") or "").strip()
-        value = str(row.get("value") or "").strip()
-        if not selector or not value:
+        # The page script emits synthesized selectors and lowercased keys.
+        selector = row["selector"]
+        key = row["key"]
+        if not selector or not key:
             continue
-        key = _canonical_from_placeholder(value)
-        if key:
+        if key in CANONICAL_FIELD_KEY_SET:
             mappings.append(
                 {
                     "selector": selector,
@@ -565,61 +705,102 @@ def extract_html_placeholder_mappings(
                     "confidence": 1.0,
                 }
             )
+        else:
+            unknown_vars.add(key)
+    return mappings, sorted(unknown_vars)
+
+
+def _label_blocks(
+    blocks: list[tuple[Any, ...]],
+) -> list[tuple[float, float, float, float, str]]:
+    # Precompute per-page block geometry (x0, x1, y1, center y) once.
+    out: list[tuple[float, float, float, float, str]] = []
+    for block in blocks:
+        if len(block) < 5:
+            continue
+        text = str(block[4] or "").strip()
+        if not text:
             continue
-        m = PLACEHOLDER_RE.fullmatch(value)
-        if m:
-            unknown_vars.append(m.group(1).strip().lower())
-    return mappings, sorted(set(unknown_vars))
+        x0, y0, x1, y1 = block[:4]
+        out.append((x0, x1, y1, (y0 + y1) / 2, text))
+    return out
+
+
+def _guess_label_for_rect(
+    rect: fitz.Rect, label_blocks: list[tuple[float, float, float, float, str]]
+) -> str:
+    rect_x0 = rect.x0
+    rect_y0 = rect.y0
+    rect_cy = (rect.y0 + rect.y1) / 2
+    row_tolerance = max(12, rect.height * 0.8)
+    above_tolerance = max(60, rect.width * 0.8)
+    best_dist = 0.0
+    best_text = ""
+    for x0, x1, y1, cy, text in label_blocks:
+        # Prefer text on the left in the same row.
+        dy = abs(cy - rect_cy)
+        if dy <= row_tolerance and x1 <= rect_x0 + 6:
+            dist = (rect_x0 - x1) + dy
+        else:
+            # Then text above field.
+            dx = abs(x0 - rect_x0)
+            if not (y1 <= rect_y0 + 4 and dx <= above_tolerance):
+                continue
+            dist = ((rect_y0 - y1) + dx) + 40.0
+        # Strict comparison keeps the first block on ties, like a stable sort.
+        if not best_text or dist < best_dist:
+            best_dist = dist
+            best_text = text
+    if not best_text:
+        return ""
+    return " ".join(best_text.split()).strip(" :.-")
+
+
+def _pdf_placeholder_mapping(
+    field_name: str, value: str, unknown_vars: list[str]
+) -> dict[str, Any] | None:
+    key = _canonical_from_placeholder(value)
+    if key:
+        confidence = 0.7
+    else:
+        keys, unknown = _canonical_keys_from_placeholder_tokens(value)
+        unknown_vars.extend(unknown)
+        if not keys:
+            return None
+        key = _select_canonical_for_composite_placeholder(keys)
+        confidence = 0.65 if len(keys) > 1 else 0.7
+    return {
+        "selector": f"pdf:{field_name}",
+        "canonical_key": key,
+        "field_kind": "text",
+        "match_value": "",
+        "checked_when": "",
+        "source": "template_pdf",
+        "confidence": confidence,
+    }
 
 
-def inspect_pdf_fields_from_bytes(data: bytes) -> list[dict[str, Any]]:
-    doc = fitz.open(stream=data, filetype="pdf")
+def _walk_pdf_widgets(
+    doc: fitz.Document, *, with_fields: bool, with_mappings: bool
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]], list[str]]:
     rows: list[dict[str, Any]] = []
-    try:
-        for page_index, page in enumerate(doc):
-            blocks = page.get_text("blocks") or []
-
-            def guess_label_for_rect(
-                rect: fitz.Rect, text_blocks: list[tuple[Any, ...]] = blocks
-            ) -> str:
-                candidates: list[tuple[float, str]] = []
-                for block in text_blocks:
-                    if len(block) < 5:
-                        continue
-                    x0, y0, x1, y1 = block[:4]
-                    text = str(block[4] or "").strip()
-                    if not text:
-                        continue
-                    # Prefer text on the left in the same row.
-                    same_row = abs(((y0 + y1) / 2) - ((rect.y0 + rect.y1) / 2)) <= max(
-                        12, rect.height * 0.8
-                    )
-                    on_left = x1 <= rect.x0 + 6
-                    if same_row and on_left:
-                        dist = (rect.x0 - x1) + abs(
-                            ((y0 + y1) / 2) - ((rect.y0 + rect.y1) / 2)
-                        )
-                        candidates.append((dist, text))
-                        continue
-                    # Then text above field.
-                    above = y1 <= rect.y0 + 4 and abs(x0 - rect.x0) <= max(
-                        60, rect.width * 0.8
-                    )
-                    if above:
-                        dist = (rect.y0 - y1) + abs(x0 - rect.x0)
-                        candidates.append((dist + 40.0, text))
-                if not candidates:
-                    return ""
-                candidates.sort(key=lambda item: item[0])
-                return re.sub(r"\s+", " ", candidates[0][1]).strip(" :.-")
-
-            widgets = page.widgets() or []
-            for w in widgets:
-                field_name = str((w.field_name or "")).strip()
-                if not field_name:
-                    continue
+    mappings: list[dict[str, Any]] = []
+    unknown_vars: list[str] = []
+    for page_index, page in enumerate(doc):
+        widgets = list(page.widgets() or [])
+        if not widgets:
+            # Text extraction is the expensive part; skip it on pages without forms.
+            continue
+        label_blocks = (
+            _label_blocks(page.get_text("blocks") or []) if with_fields else []
+        )
+        for w in widgets:
+            field_name = str((w.field_name or "")).strip()
+            if not field_name:
+                continue
+            if with_fields:
                 rect = getattr(w, "rect", None) or fitz.Rect(0, 0, 0, 0)
-                label_guess = guess_label_for_rect(rect)
+                label_guess = _guess_label_for_rect(rect, label_blocks)
                 rows.append(
                     {
                         "selector": f"pdf:{field_name}",
@@ -642,11 +823,46 @@ def inspect_pdf_fields_from_bytes(data: bytes) -> list[dict[str, Any]]:
                         },
                     }
                 )
+            if with_mappings:
+                value = str((w.field_value or "")).strip()
+                if not value:
+                    continue
+                mapping = _pdf_placeholder_mapping(field_name, value, unknown_vars)
+                if mapping:
+                    mappings.append(mapping)
+    return rows, mappings, sorted(set(unknown_vars))
+
+
+def inspect_and_extract_pdf_from_bytes(
+    data: bytes,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]], list[str]]:
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        return _walk_pdf_widgets(doc, with_fields=True, with_mappings=True)
+    finally:
+        doc.close()
+
+
+def inspect_pdf_fields_from_bytes(data: bytes) -> list[dict[str, Any]]:
+    doc = fitz.open(stream=data, filetype="pdf")
+    try:
+        rows, _, _ = _walk_pdf_widgets(doc, with_fields=True, with_mappings=False)
     finally:
         doc.close()
     return rows
 
 
+def fetch_pdf_bytes(target_url: str, *, timeout_ms: int = 20000) -> bytes:
+    data, _ = _fetch_pdf_bytes(target_url, timeout_ms)
+    return data
+
+
+def download_pdf_bytes(target_url: str, *, timeout_ms: int = 20000) -> bytes:
+    """Download the PDF now, bypassing the short-lived bytes cache; for fills."""
+    data, _ = _download_pdf_bytes(target_url, timeout_ms)
+    return data
+
+
 def inspect_pdf_fields_from_url(
     target_url: str, *, timeout_ms: int = 20000
 ) -> list[dict[str, Any]]:
@@ -658,50 +874,13 @@ def extract_pdf_placeholder_mappings_from_bytes(
     data: bytes,
 ) -> tuple[list[dict[str, Any]], list[str]]:
     doc = fitz.open(stream=data, filetype="pdf")
-    mappings: list[dict[str, Any]] = []
-    unknown_vars: list[str] = []
     try:
-        for page in doc:
-            widgets = page.widgets() or []
-            for w in widgets:
-                field_name = str((w.field_name or "")).strip()
-                if not field_name:
-                    continue
-                value = str((w.field_value or "")).strip()
-                if not value:
-                    continue
-                key = _canonical_from_placeholder(value)
-                if key:
-                    mappings.append(
-                        {
-                            "selector": f"pdf:{field_name}",
-                            "canonical_key": key,
-                            "field_kind": "text",
-                            "match_value": "",
-                            "checked_when": "",
-                            "source": "template_pdf",
-                            "confidence": 0.7,
-                        }
-                    )
-                    continue
-                keys, unknown = _canonical_keys_from_placeholder_tokens(value)
-                if keys:
-                    selected = _select_canonical_for_composite_placeholder(keys)
-                    mappings.append(
-                        {
-                            "selector": f"pdf:{field_name}",
-                            "canonical_key": selected,
-                            "field_kind": "text",
-                            "match_value": "",
-                            "checked_when": "",
-                            "source": "template_pdf",
-                            "confidence": 0.65 if len(keys) > 1 else 0.7,
-                        }
-                    )
-                unknown_vars.extend(unknown)
+        _, mappings, unknown_vars = _walk_pdf_widgets(
+            doc, with_fields=False, with_mappings=True
+        )
     finally:
         doc.close()
-    return mappings, sorted(set(unknown_vars))
+    return mappings, unknown_vars
 
 
 def extract_pdf_placeholder_mappings_from_url(
@@ -714,6 +893,122 @@ def extract_pdf_placeholder_mappings_from_url(
     return mappings, unknown_vars
 
 
+def inspect_and_extract_pdf_from_url(
+    target_url: str, *, timeout_ms: int = 20000
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]], list[str]]:
+    data, _ = _fetch_pdf_bytes(target_url, timeout_ms)
+    fields, mappings, unknown_vars = inspect_and_extract_pdf_from_bytes(data)
+    for item in mappings:
+        item["source"] = "placeholder"
+    return fields, mappings, unknown_vars
+
+
+_SUGGESTION_PATTERN_SOURCES: dict[str, list[str]] = {
+    "nif_nie": [r"nif", r"nie", r"document", r"identidad"],
+    "pasaporte": [r"pasaport", r"passport"],
+    "primer_apellido": [
+        r"primerapellido",
+        r"apellido1",
+        r"firstsurname",
+        r"razonsocial",
+    ],
+    "segundo_apellido": [
+        r"segundoapellido",
+        r"2apellido",
+        r"apellido2",
+        r"secondsurname",
+    ],
+    "nombre": [r"^nombre$", r"nombre\*$", r"name", r"forename"],
+    "nombre_apellidos": [r"nombre", r"apellidos", r"razonsocial", r"fullname"],
+    "sexo": [r"sexo", r"sex"],
+    "tipo_via": [r"tipovia", r"calleplaza", r"avda"],
+    "nombre_via": [r"nombrevia", r"viapublica"],
+    "domicilio_en_espana": [r"domicilioenespana", r"domicilio", r"direccion"],
+    "numero": [r"numero", r"\bnum\b"],
+    "escalera": [r"escalera", r"\besc\b"],
+    "piso": [r"piso", r"planta"],
+    "puerta": [r"puerta", r"\bpta\b"],
+    "telefono": [r"telefono", r"phone", r"movil"],
+    "municipio": [r"municipio", r"ciudad", r"city"],
+    "provincia": [r"provincia", r"province"],
+    "cp": [r"cpostal", r"codigopostal", r"\bcp\b", r"postal"],
+    "localidad": [r"localidad"],
+    "fecha": [r"fecha"],
+    "fecha_dia": [r"fecha", r"dia"],
+    "fecha_mes": [r"fecha", r"mes"],
+    "fecha_anio": [r"fecha", r"ano", r"año"],
+    "email": [r"email", r"correo", r"mail"],
+    "fecha_nacimiento": [r"fechanac", r"birth"],
+    "fecha_nacimiento_dia": [r"fechanac", r"dia"],
+    "fecha_nacimiento_mes": [r"fechanac", r"mes"],
+    "fecha_nacimiento_anio": [r"fechanac", r"ano", r"año", r"year"],
+    "nacionalidad": [r"nacionalidad", r"nationality"],
+    "pais_nacimiento": [r"pais", r"country"],
+    "estado_civil": [r"estadocivil", r"civil"],
+    "lugar_nacimiento": [r"lugarnac", r"birthplace"],
+    "nombre_padre": [r"padre", r"father"],
+    "nombre_madre": [r"madre", r"mother"],
+    "representante_legal": [r"representantelegal", r"representante"],
+    "representante_documento": [
+        r"dni",
+        r"pas",
+        r"dniniepas",
+        r"documentorepresentante",
+    ],
+    "titulo_representante": [r"titulo"],
+    "hijos_escolarizacion_espana": [r"hijas", r"hijos", r"escolarizacion"],
+}
+
+
+_REGEX_META_RE = re.compile(r"[\\^$.|?*+()\[\]{}]")
+
+
+def _index_suggestion_patterns() -> tuple[
+    tuple[tuple[str, tuple[str, ...]], ...],
+    tuple[tuple[re.Pattern[str], tuple[str, ...]], ...],
+]:
+    # Invert key -> patterns into pattern -> keys so each distinct literal is
+    # tested once per label instead of once per key that lists it. Plain-text
+    # patterns use substring checks; only true regexes hit the regex engine.
+    literal_keys: dict[str, list[str]] = {}
+    regex_keys: dict[str, list[str]] = {}
+    for key, key_patterns in _SUGGESTION_PATTERN_SOURCES.items():
+        for pattern in key_patterns:
+            bucket = regex_keys if _REGEX_META_RE.search(pattern) else literal_keys
+            bucket.setdefault(pattern, []).append(key)
+    return (
+        tuple((literal, tuple(keys)) for literal, keys in literal_keys.items()),
+        tuple(
+            (re.compile(pattern), tuple(keys)) for pattern, keys in regex_keys.items()
+        ),
+    )
+
+
+_SUGGESTION_LITERALS, _SUGGESTION_REGEXES = _index_suggestion_patterns()
+_SUGGESTION_KEY_ORDER: dict[str, int] = {
+    key: idx for idx, key in enumerate(_SUGGESTION_PATTERN_SOURCES)
+}
+
+
+def _best_suggestion_key(label_signal: str) -> tuple[str, int]:
+    if not label_signal:
+        return "", 0
+    hits: dict[str, int] = {}
+    for literal, keys in _SUGGESTION_LITERALS:
+        if literal in label_signal:
+            for key in keys:
+                hits[key] = hits.get(key, 0) + 1
+    for pattern, keys in _SUGGESTION_REGEXES:
+        if pattern.search(label_signal):
+            for key in keys:
+                hits[key] = hits.get(key, 0) + 1
+    if not hits:
+        return "", 0
+    # Highest score wins; ties go to the key listed first in the pattern table.
+    best_key = min(hits, key=lambda key: (-hits[key], _SUGGESTION_KEY_ORDER[key]))
+    return best_key, hits[best_key]
+
+
 def suggest_mappings_for_fields(
     fields: list[dict[str, Any]],
     payload: dict[str, Any],
@@ -722,62 +1017,6 @@ def suggest_mappings_for_fields(
     values = _build_value_map(payload)
     hints = mapping_hints or {}
 
-    patterns: dict[str, list[str]] = {
-        "nif_nie": [r"nif", r"nie", r"document", r"identidad"],
-        "pasaporte": [r"pasaport", r"passport"],
-        "primer_apellido": [
-            r"primerapellido",
-            r"apellido1",
-            r"firstsurname",
-            r"razonsocial",
-        ],
-        "segundo_apellido": [
-            r"segundoapellido",
-            r"2apellido",
-            r"apellido2",
-            r"secondsurname",
-        ],
-        "nombre": [r"^nombre$", r"nombre\*$", r"name", r"forename"],
-        "nombre_apellidos": [r"nombre", r"apellidos", r"razonsocial", r"fullname"],
-        "sexo": [r"sexo", r"sex"],
-        "tipo_via": [r"tipovia", r"calleplaza", r"avda"],
-        "nombre_via": [r"nombrevia", r"viapublica"],
-        "domicilio_en_espana": [r"domicilioenespana", r"domicilio", r"direccion"],
-        "numero": [r"numero", r"\bnum\b"],
-        "escalera": [r"escalera", r"\besc\b"],
-        "piso": [r"piso", r"planta"],
-        "puerta": [r"puerta", r"\bpta\b"],
-        "telefono": [r"telefono", r"phone", r"movil"],
-        "municipio": [r"municipio", r"ciudad", r"city"],
-        "provincia": [r"provincia", r"province"],
-        "cp": [r"cpostal", r"codigopostal", r"\bcp\b", r"postal"],
-        "localidad": [r"localidad"],
-        "fecha": [r"fecha"],
-        "fecha_dia": [r"fecha", r"dia"],
-        "fecha_mes": [r"fecha", r"mes"],
-        "fecha_anio": [r"fecha", r"ano", r"año"],
-        "email": [r"email", r"correo", r"mail"],
-        "fecha_nacimiento": [r"fechanac", r"birth"],
-        "fecha_nacimiento_dia": [r"fechanac", r"dia"],
-        "fecha_nacimiento_mes": [r"fechanac", r"mes"],
-        "fecha_nacimiento_anio": [r"fechanac", r"ano", r"año", r"year"],
-        "nacionalidad": [r"nacionalidad", r"nationality"],
-        "pais_nacimiento": [r"pais", r"country"],
-        "estado_civil": [r"estadocivil", r"civil"],
-        "lugar_nacimiento": [r"lugarnac", r"birthplace"],
-        "nombre_padre": [r"padre", r"father"],
-        "nombre_madre": [r"madre", r"mother"],
-        "representante_legal": [r"representantelegal", r"representante"],
-        "representante_documento": [
-            r"dni",
-            r"pas",
-            r"dniniepas",
-            r"documentorepresentante",
-        ],
-        "titulo_representante": [r"titulo"],
-        "hijos_escolarizacion_espana": [r"hijas", r"hijos", r"escolarizacion"],
-    }
-
     suggestions: list[dict[str, Any]] = []
     for field in fields or []:
         selector = str(field.get("selector") or "").strip()
@@ -789,60 +1028,68 @@ def suggest_mappings_for_fields(
             field_kind = "checkbox"
         elif str(field.get("tag") or "").lower() == "select":
             field_kind = "select"
-        label_signal = _normalize_signal(
-            " ".join(
-                [
-                    str(field.get("label") or ""),
-                    str(field.get("name") or ""),
-                    str(field.get("id") or ""),
-                    str(field.get("placeholder") or ""),
-                    str(field.get("aria_label") or ""),
-                ]
+        from_hint = hints.get(selector, "")
+        if from_hint in CANONICAL_FIELD_KEY_SET:
+            # Learned hints win outright; skip label normalization and scoring.
+            suggestions.append(
+                {
+                    **field,
+                    "canonical_key": from_hint,
+                    "field_kind": field_kind,
+                    "confidence": 0.99,
+                    "source": "learned",
+                    "value_preview": values.get(from_hint, ""),
+                }
             )
+            continue
+        label = field.get("label") or ""
+        name = field.get("name") or ""
+        field_id = field.get("id") or ""
+        placeholder = field.get("placeholder") or ""
+        aria_label = field.get("aria_label") or ""
+        label_signal = _normalize_signal(
+            f"{label} {name} {field_id} {placeholder} {aria_label}"
         )
-        from_hint = hints.get(selector, "")
-        canonical_key = ""
-        confidence = 0.0
-        source = "heuristic"
-        if from_hint in CANONICAL_FIELD_KEYS:
-            canonical_key = from_hint
-            confidence = 0.99
-            source = "learned"
-        else:
-            best_score = 0
-            for key, key_patterns in patterns.items():
-                score = 0
-                for pat in key_patterns:
-                    if re.search(pat, label_signal):
-                        score += 1
-                if score > best_score:
-                    best_score = score
-                    canonical_key = key
-            if best_score > 0:
-                confidence = min(0.85, 0.5 + best_score * 0.15)
-            else:
-                canonical_key = ""
-                confidence = 0.0
+        canonical_key, best_score = _best_suggestion_key(label_signal)
+        confidence = min(0.85, 0.5 + best_score * 0.15) if best_score > 0 else 0.0
         suggestions.append(
             {
                 **field,
                 "canonical_key": canonical_key,
                 "field_kind": field_kind,
                 "confidence": round(confidence, 2),
-                "source": source,
+                "source": "heuristic",
                 "value_preview": values.get(canonical_key, "") if canonical_key else "",
             }
         )
-    order_map = {key: idx for idx, key in enumerate(CANONICAL_FILL_PRIORITY)}
-    suggestions.sort(
-        key=lambda item: (
-            order_map.get(str(item.get("canonical_key") or ""), 999),
-            str(item.get("selector") or ""),
-        )
-    )
+    suggestions.sort(key=_suggestion_sort_key)
     return suggestions
 
 
+def _suggestion_sort_key(item: dict[str, Any]) -> tuple[int, str]:
+    return (
+        _ORDER_MAP.get(str(item.get("canonical_key") or ""), 999),
+        str(item.get("selector") or ""),
+    )
+
+
+_SPANISH_NAT_SET: frozenset[str] = frozenset({"ESP", "ESPAÑA", "ESPANA", "SPAIN"})
+
+_NAT_CODE_MAP: Mapping[str, str] = MappingProxyType(
+    {
+        "UKR": "UCRANIA",
+        "ESP": "ESPAÑA",
+        "DEU": "ALEMANIA",
+        "FRA": "FRANCIA",
+        "ITA": "ITALIA",
+        "PRT": "PORTUGAL",
+        "POL": "POLONIA",
+        "ROU": "RUMANIA",
+        "RUS": "RUSIA",
+    }
+)
+
+
 def _split_name_for_spanish_fields(
     full_name: str, nationality: str = ""
 ) -> tuple[str, str, str]:
@@ -853,13 +1100,13 @@ def _split_name_for_spanish_fields(
     # If OCR produced "APELLIDOS, NOMBRE", respect that explicitly.
     if "," in raw:
         left, right = [x.strip() for x in raw.split(",", 1)]
-        surname_tokens = [t for t in re.split(r"\s+", left) if t]
+        surname_tokens = left.split()
         given = right
         surname1 = surname_tokens[0] if surname_tokens else ""
         surname2 = " ".join(surname_tokens[1:]) if len(surname_tokens) > 1 else ""
         return surname1, surname2, given
 
-    tokens = [t for t in re.split(r"\s+", raw) if t]
+    tokens = raw.split()
     if not tokens:
         return "", "", ""
     if len(tokens) == 1:
@@ -868,7 +1115,7 @@ def _split_name_for_spanish_fields(
         return tokens[0], "", tokens[1]
 
     nat = (nationality or "").strip().upper()
-    is_spanish = nat in {"ESP", "ESPAÑA", "ESPANA", "SPAIN"}
+    is_spanish = nat in _SPANISH_NAT_SET
     if is_spanish:
         # Spanish pattern: APELLIDO1 APELLIDO2 NOMBRE...
         return tokens[0], tokens[1], " ".join(tokens[2:])
@@ -881,80 +1128,85 @@ def _normalize_nationality_for_spanish_select(value: str) -> str:
     v = (value or "").strip().upper()
     if not v:
         return ""
-    code_map = {
-        "UKR": "UCRANIA",
-        "ESP": "ESPAÑA",
-        "DEU": "ALEMANIA",
-        "FRA": "FRANCIA",
-        "ITA": "ITALIA",
-        "PRT": "PORTUGAL",
-        "POL": "POLONIA",
-        "ROU": "RUMANIA",
-        "RUS": "RUSIA",
-    }
-    return code_map.get(v, value)
+    return _NAT_CODE_MAP.get(v, value)
+
+
+def _artifact_timestamp() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S")
 
 
-def _save_html_snapshot(page: Page, out_dir: Path, prefix: str) -> Path:
+def _save_html_snapshot(
+    page: Page, out_dir: Path, prefix: str, *, ts: str | None = None
+) -> Path:
     out_dir.mkdir(parents=True, exist_ok=True)
-    path = (
-        out_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{_slugify(prefix)}.html"
-    )
+    path = out_dir / f"{ts or _artifact_timestamp()}_{_slugify(prefix)}.html"
     path.write_text(page.content(), encoding="utf-8")
     return path
 
 
-def _save_screenshot(page: Page, out_dir: Path, prefix: str) -> Path:
+def _save_screenshot(
+    page: Page, out_dir: Path, prefix: str, *, ts: str | None = None
+) -> Path:
     out_dir.mkdir(parents=True, exist_ok=True)
-    path = (
-        out_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{_slugify(prefix)}.png"
-    )
+    path = out_dir / f"{ts or _artifact_timestamp()}_{_slugify(prefix)}.png"
     page.screenshot(path=str(path), full_page=True)
     return path
 
 
-def _append_filled(filled: list[str], field: str) -> None:
-    if field and field not in filled:
-        filled.append(field)
+@dataclass
+class _FilledFields:
+    # Fill order is part of the result contract; the set keeps de-dup O(1).
+    order: list[str] = dataclass_field(default_factory=list)
+    seen: set[str] = dataclass_field(default_factory=set)
 
 
-def _rule_context(values: dict[str, str]) -> dict[str, str]:
-    return _rule_context_impl(values)
+def _append_filled(filled: _FilledFields, key: str) -> None:
+    if key and key not in filled.seen:
+        filled.seen.add(key)
+        filled.order.append(key)
 
 
-def _eval_checked_when(rule: str, context: dict[str, str]) -> bool | None:
-    return _eval_checked_when_impl(rule, context)
+# One round trip answers the count/visible/disabled/type pre-checks. Returns
+# "invalid" for selectors querySelector cannot parse (Playwright-only syntax)
+# and null when it finds nothing, which includes elements inside shadow roots.
+_CHECK_PROBE_JS = """
+(sel) => {
+  let el = null;
+  try { el = document.querySelector(sel); } catch (e) { return "invalid"; }
+  if (!el) return null;
+  const rect = el.getBoundingClientRect();
+  return {
+    visible: rect.width > 0 && rect.height > 0
+      && getComputedStyle(el).visibility !== "hidden",
+    disabled: el.matches(":disabled") || el.getAttribute("aria-disabled") === "true",
+    type: (el.getAttribute("type") || "").toLowerCase(),
+  };
+}
+"""
 
 
 def _set_check_if_possible(page: Page, selectors: list[str], checked: bool) -> bool:
     for selector in selectors:
         try:
             loc = page.locator(selector).first
-            if loc.count() == 0:
-                continue
-            if not loc.is_visible() or loc.is_disabled():
-                continue
-            typ = str(loc.get_attribute("type") or "").lower()
-            if typ in {"checkbox", "radio"}:
+            info = page.evaluate(_CHECK_PROBE_JS, selector)
+            if info is None or info == "invalid":
+                # Playwright locators pierce shadow DOM; let them decide.
+                if loc.count() == 0:
+                    continue
+                if not loc.is_visible() or loc.is_disabled():
+                    continue
+                typ = str(loc.get_attribute("type") or "").lower()
+            else:
+                if not info or not info["visible"] or info["disabled"]:
+                    continue
+                typ = info["type"]
+            if typ in _CHECK_KINDS:
                 if checked:
                     loc.check()
                 else:
                     loc.uncheck()
-                return True
-            page.evaluate(
-                """([sel, state]) => {
-                    const el = document.querySelector(sel);
-                    if (!el) return false;
-                    if (el.type === "checkbox" || el.type === "radio") {
-                        el.checked = !!state;
-                        el.dispatchEvent(new Event("input", { bubbles: true }));
-                        el.dispatchEvent(new Event("change", { bubbles: true }));
-                        return true;
-                    }
-                    return false;
-                }""",
-                [selector, checked],
-            )
+            # Other visible controls are reported as handled, as before.
             return True
         except Exception:
             continue
@@ -964,7 +1216,7 @@ def _set_check_if_possible(page: Page, selectors: list[str], checked: bool) -> b
 def _apply_explicit_mappings(
     page: Page,
     values: dict[str, str],
-    filled: list[str],
+    filled: _FilledFields,
     mappings: list[dict[str, Any]] | None,
 ) -> list[dict[str, Any]]:
     applied: list[dict[str, Any]] = []
@@ -977,7 +1229,7 @@ def _apply_explicit_mappings(
             continue
         ok = False
         reason = "rule_evaluated_true"
-        if field_kind in {"checkbox", "radio"}:
+        if field_kind in _CHECK_KINDS:
             checked_when = str(item.get("checked_when") or "").strip()
             match_value = str(item.get("match_value") or "").strip()
             result = _eval_checked_when(checked_when, context)
@@ -987,7 +1239,7 @@ def _apply_explicit_mappings(
             ok = _set_check_if_possible(page, [selector], expected_state)
             reason = "rule_evaluated_true" if expected_state else "rule_evaluated_false"
         else:
-            if canonical_key not in CANONICAL_FIELD_KEYS:
+            if canonical_key not in CANONICAL_FIELD_KEY_SET:
                 continue
             value = values.get(canonical_key, "")
             if not value:
@@ -1021,237 +1273,272 @@ def _apply_explicit_mappings(
     return applied
 
 
-def _apply_adapter_admin_tasas_pdf(
-    page: Page, values: dict[str, str], filled: list[str]
-) -> None:
-    surname1, surname2, given_name = _split_name_for_spanish_fields(
-        values.get("nombre_apellidos", ""),
-        values.get("nacionalidad", ""),
-    )
-    nationality = _normalize_nationality_for_spanish_select(
-        values.get("nacionalidad", "")
+# Mirrors _set_if_possible/_select_if_possible so a whole adapter can be
+# applied in one CDP round trip instead of several per field.
+_BATCH_FILL_JS = """
+(batch) => {
+  const norm = (s) => (s || "").trim().toUpperCase().normalize("NFD").replace(/\\p{Mn}/gu, "");
+  const usable = (el) => {
+    if (!el || el.disabled) return false;
+    const rect = el.getBoundingClientRect();
+    if (rect.width <= 0 || rect.height <= 0) return false;
+    return getComputedStyle(el).visibility !== "hidden";
+  };
+  const notify = (el) => {
+    el.dispatchEvent(new Event("input", { bubbles: true }));
+    el.dispatchEvent(new Event("change", { bubbles: true }));
+  };
+  const pickOption = (el, value) => {
+    const desired = value.trim().toLowerCase();
+    const desiredNorm = norm(value);
+    for (const opt of Array.from(el.options || [])) {
+      const text = (opt.innerText || opt.textContent || "").trim();
+      const val = (opt.getAttribute("value") || "").trim();
+      const textNorm = norm(text);
+      const valNorm = norm(val);
+      const exact = text.toLowerCase() === desired || val.toLowerCase() === desired
+        || textNorm === desiredNorm || valNorm === desiredNorm;
+      const partial = text.toLowerCase().includes(desired)
+        || (val && val.toLowerCase().includes(desired))
+        || (desiredNorm && textNorm.includes(desiredNorm))
+        || (desiredNorm && valNorm.includes(desiredNorm));
+      if (exact || partial) return opt;
+    }
+    return null;
+  };
+  const out = [];
+  for (const item of batch) {
+    // Later items for an already-filled key are fallbacks; skip them.
+    if (out.includes(item.key)) continue;
+    let done = false;
+    for (const value of item.values) {
+      for (const selector of item.selectors) {
+        let el = null;
+        try { el = document.querySelector(selector); } catch (e) { continue; }
+        if (!usable(el)) continue;
+        if (item.kind === "select") {
+          const opt = pickOption(el, value);
+          if (!opt) continue;
+          opt.selected = true;
+        } else {
+          if (!("value" in el) || el.readOnly) continue;
+          el.value = value;
+          // Typed inputs (e.g. date) silently drop values they cannot parse.
+          if (el.value !== value) continue;
+        }
+        notify(el);
+        done = true;
+        break;
+      }
+      if (done) break;
+    }
+    if (done) out.push(item.key);
+  }
+  return out;
+}
+"""
+
+
+def _batch_item(
+    key: str, kind: str, selectors: list[str], *values: str
+) -> dict[str, Any]:
+    return {
+        "key": key,
+        "kind": kind,
+        "selectors": selectors,
+        "values": [v for v in values if v],
+    }
+
+
+def _run_batch_fill(page: Page, batch: list[dict[str, Any]]) -> list[str]:
+    batch = [item for item in batch if item["values"]]
+    if not batch:
+        return []
+    try:
+        return list(page.evaluate(_BATCH_FILL_JS, batch))
+    except Exception:
+        # Fall back to per-field Playwright calls (e.g. CSP blocks evaluate).
+        filled_keys: list[str] = []
+        for item in batch:
+            if item["key"] in filled_keys:
+                continue
+            fill_one = (
+                _select_if_possible if item["kind"] == "select" else _set_if_possible
+            )
+            if any(fill_one(page, item["selectors"], v) for v in item["values"]):
+                filled_keys.append(item["key"])
+        return filled_keys
+
+
+def _adapter_name_fields(values: dict[str, str]) -> tuple[str, str, str, str]:
+    # Skip name splitting / nationality mapping when the payload lacks them.
+    full_name = values.get("nombre_apellidos", "")
+    raw_nationality = values.get("nacionalidad", "")
+    surname1 = surname2 = given_name = ""
+    if full_name:
+        surname1, surname2, given_name = _split_name_for_spanish_fields(
+            full_name, raw_nationality
+        )
+    nationality = (
+        _normalize_nationality_for_spanish_select(raw_nationality)
+        if raw_nationality
+        else ""
     )
+    return surname1, surname2, given_name, nationality
+
 
-    if values.get("nif_nie") and _set_if_possible(
-        page, ["#Ctrl_NIFRem", "input[name='Ctrl_NIFRem']"], values["nif_nie"]
-    ):
-        _append_filled(filled, "nif_nie")
-    if surname1 and _set_if_possible(
-        page, ["#Ctrl_Apellido1", "input[name='Ctrl_Apellido1']"], surname1
-    ):
-        _append_filled(filled, "primer_apellido")
-    if surname2 and _set_if_possible(
-        page, ["#Ctrl_Apellido2", "input[name='Ctrl_Apellido2']"], surname2
-    ):
-        _append_filled(filled, "segundo_apellido")
-    if given_name and _set_if_possible(
-        page, ["#Ctrl_NombreRem", "input[name='Ctrl_NombreRem']"], given_name
-    ):
-        _append_filled(filled, "nombre")
-    if nationality and _select_if_possible(
-        page,
-        ["#Ctrl_SelNacionalidad", "select[name='Ctrl_SelNacionalidad']"],
-        nationality,
-    ):
-        _append_filled(filled, "nacionalidad")
-    if values.get("tipo_via") and _select_if_possible(
-        page,
-        ["#Ctrl_TipoViaDom", "select[name='Ctrl_TipoViaDom']"],
-        values["tipo_via"],
-    ):
-        _append_filled(filled, "tipo_via")
-    if values.get("nombre_via") and _set_if_possible(
-        page, ["#Ctrl_ViaDom", "input[name='Ctrl_ViaDom']"], values["nombre_via"]
-    ):
-        _append_filled(filled, "nombre_via")
-    if values.get("numero") and _set_if_possible(
-        page, ["#Ctrl_NumeroDom", "input[name='Ctrl_NumeroDom']"], values["numero"]
-    ):
-        _append_filled(filled, "numero")
-    if values.get("escalera") and _set_if_possible(
-        page,
-        ["#Ctrl_EscaleraDom", "input[name='Ctrl_EscaleraDom']"],
-        values["escalera"],
-    ):
-        _append_filled(filled, "escalera")
-    if values.get("piso") and _set_if_possible(
-        page, ["#Ctrl_PisoDom", "input[name='Ctrl_PisoDom']"], values["piso"]
-    ):
-        _append_filled(filled, "piso")
-    if values.get("puerta") and _set_if_possible(
-        page, ["#Ctrl_PuertaDom", "input[name='Ctrl_PuertaDom']"], values["puerta"]
-    ):
-        _append_filled(filled, "puerta")
-    if values.get("municipio") and _set_if_possible(
-        page,
-        ["#Ctrl_MunicipioDom", "input[name='Ctrl_MunicipioDom']"],
-        values["municipio"],
-    ):
-        _append_filled(filled, "municipio")
-    province_selected = False
-    if values.get("provincia"):
-        province_selected = _select_if_possible(
-            page,
-            ["#Ctrl_ProvinciaDom", "select[name='Ctrl_ProvinciaDom']"],
-            values["provincia"],
+def _apply_adapter_admin_tasas_pdf(
+    page: Page, values: dict[str, str], filled: _FilledFields
+) -> None:
+    if not any(values.values()):
+        return
+    surname1, surname2, given_name, nationality = _adapter_name_fields(values)
+    # Province select falls back to the CP-derived province when the given
+    # value matches no option (or is missing).
+    province_candidates = [values.get("provincia", "")]
+    inferred_province = _infer_spanish_province_from_cp(values.get("cp", ""))
+    if inferred_province:
+        province_candidates.append(inferred_province)
+
+    def text(key: str, ctrl: str, value: str) -> dict[str, Any]:
+        return _batch_item(key, "text", [f"#{ctrl}", f"input[name='{ctrl}']"], value)
+
+    def select(key: str, ctrl: str, *candidates: str) -> dict[str, Any]:
+        return _batch_item(
+            key, "select", [f"#{ctrl}", f"select[name='{ctrl}']"], *candidates
         )
-    if not province_selected:
-        inferred_province = _infer_spanish_province_from_cp(values.get("cp", ""))
-        if inferred_province:
-            province_selected = _select_if_possible(
-                page,
-                ["#Ctrl_ProvinciaDom", "select[name='Ctrl_ProvinciaDom']"],
-                inferred_province,
-            )
-    if province_selected:
-        _append_filled(filled, "provincia")
-    if values.get("cp") and _set_if_possible(
-        page, ["#Ctrl_CPostalDom", "input[name='Ctrl_CPostalDom']"], values["cp"]
-    ):
-        _append_filled(filled, "cp")
-    if values.get("telefono") and _set_if_possible(
-        page,
-        ["#Ctrl_TelefonoDom", "input[name='Ctrl_TelefonoDom']"],
-        values["telefono"],
-    ):
-        _append_filled(filled, "telefono")
+
+    batch = [
+        text("nif_nie", "Ctrl_NIFRem", values.get("nif_nie", "")),
+        text("primer_apellido", "Ctrl_Apellido1", surname1),
+        text("segundo_apellido", "Ctrl_Apellido2", surname2),
+        text("nombre", "Ctrl_NombreRem", given_name),
+        select("nacionalidad", "Ctrl_SelNacionalidad", nationality),
+        select("tipo_via", "Ctrl_TipoViaDom", values.get("tipo_via", "")),
+        text("nombre_via", "Ctrl_ViaDom", values.get("nombre_via", "")),
+        text("numero", "Ctrl_NumeroDom", values.get("numero", "")),
+        text("escalera", "Ctrl_EscaleraDom", values.get("escalera", "")),
+        text("piso", "Ctrl_PisoDom", values.get("piso", "")),
+        text("puerta", "Ctrl_PuertaDom", values.get("puerta", "")),
+        text("municipio", "Ctrl_MunicipioDom", values.get("municipio", "")),
+        select("provincia", "Ctrl_ProvinciaDom", *province_candidates),
+        text("cp", "Ctrl_CPostalDom", values.get("cp", "")),
+        text("telefono", "Ctrl_TelefonoDom", values.get("telefono", "")),
+    ]
+    for key in _run_batch_fill(page, batch):
+        _append_filled(filled, key)
 
 
 def _apply_adapter_generic_html(
-    page: Page, values: dict[str, str], filled: list[str]
+    page: Page, values: dict[str, str], filled: _FilledFields
 ) -> None:
-    surname1, surname2, given_name = _split_name_for_spanish_fields(
-        values.get("nombre_apellidos", ""),
-        values.get("nacionalidad", ""),
-    )
-    nationality = _normalize_nationality_for_spanish_select(
-        values.get("nacionalidad", "")
+    if not any(values.values()):
+        return
+    surname1, surname2, given_name, nationality = _adapter_name_fields(values)
+
+    # Writes keep the label-first order of the per-field version: a label
+    # such as "Nombre" can resolve to the full-name input, which must still
+    # end up holding the full name. Selector fields go in two evaluate round
+    # trips around the label fills; labels only run for what those missed.
+    def fill_labels(fields: list[tuple[str, str]], batched: set[str]) -> None:
+        for key, value in fields:
+            if not value:
+                continue
+            if key in batched or _fill_by_label(page, _LABEL_PATTERNS[key], value):
+                _append_filled(filled, key)
+
+    fill_labels(
+        [
+            ("nif_nie", values.get("nif_nie", "")),
+            ("primer_apellido", surname1),
+            ("segundo_apellido", surname2),
+            ("nombre", given_name),
+        ],
+        set(),
     )
-
-    if values.get("nif_nie") and _fill_by_label(
-        page, [r"NIF\s*/\s*NIE", r"NIE", r"NIF"], values["nif_nie"]
-    ):
-        _append_filled(filled, "nif_nie")
-    if surname1 and _fill_by_label(
-        page, [r"Primer apellido", r"Raz[oó]n Social"], surname1
-    ):
-        _append_filled(filled, "primer_apellido")
-    if surname2 and _fill_by_label(page, [r"Segundo apellido"], surname2):
-        _append_filled(filled, "segundo_apellido")
-    if given_name and _fill_by_label(page, [r"^Nombre"], given_name):
-        _append_filled(filled, "nombre")
-    if nationality:
-        if _select_if_possible(
-            page,
-            [
-                "select[name*='nacionalidad' i]",
-                "select[id*='nacionalidad' i]",
-            ],
+    select_batch = [
+        _batch_item(
+            "nacionalidad",
+            "select",
+            ["select[name*='nacionalidad' i]", "select[id*='nacionalidad' i]"],
             nationality,
-        ):
-            _append_filled(filled, "nacionalidad")
-        elif _fill_by_label(page, [r"Nacionalidad"], nationality):
-            _append_filled(filled, "nacionalidad")
-    if values.get("tipo_via"):
-        if (
-            _select_if_possible(
-                page,
-                [
-                    "select[name*='via' i]",
-                    "select[id*='via' i]",
-                    "select[name*='calle' i]",
-                ],
-                values["tipo_via"],
-            )
-            or _set_if_possible(
-                page,
-                [
-                    "#calle",
-                    "input[name='calle']",
-                    "input[id='calle']",
-                ],
-                values["tipo_via"],
-            )
-            or _fill_by_label(
-                page, [r"Tipo\s+de\s+v[ií]a", r"Calle/plaza/Avda"], values["tipo_via"]
-            )
-        ):
-            _append_filled(filled, "tipo_via")
-    if values.get("nombre_via") and _fill_by_label(
-        page,
-        [r"Nombre de la v[ií]a p[uú]blica", r"v[ií]a p[uú]blica"],
-        values["nombre_via"],
-    ):
-        _append_filled(filled, "nombre_via")
-    if values.get("numero") and _fill_by_label(
-        page, [r"Num", r"N[uú]m"], values["numero"]
-    ):
-        _append_filled(filled, "numero")
-    if values.get("escalera") and _fill_by_label(page, [r"Esc"], values["escalera"]):
-        _append_filled(filled, "escalera")
-    if values.get("piso") and _fill_by_label(page, [r"Piso"], values["piso"]):
-        _append_filled(filled, "piso")
-    if values.get("puerta") and _fill_by_label(page, [r"Pta"], values["puerta"]):
-        _append_filled(filled, "puerta")
-    if values.get("municipio") and _fill_by_label(
-        page, [r"Municipio"], values["municipio"]
-    ):
-        _append_filled(filled, "municipio")
-    if values.get("provincia"):
-        if _select_if_possible(
-            page,
+        ),
+        _batch_item(
+            "tipo_via",
+            "select",
             [
-                "select[name*='provincia' i]",
-                "select[id*='provincia' i]",
+                "select[name*='via' i]",
+                "select[id*='via' i]",
+                "select[name*='calle' i]",
             ],
-            values["provincia"],
-        ):
-            _append_filled(filled, "provincia")
-        elif _fill_by_label(page, [r"Provincia"], values["provincia"]):
-            _append_filled(filled, "provincia")
-    if values.get("cp") and _fill_by_label(
-        page, [r"C\.?\s*Postal", r"C[oó]digo postal", r"CP"], values["cp"]
-    ):
-        _append_filled(filled, "cp")
-    if values.get("telefono") and _fill_by_label(
-        page, [r"Tel[eé]fono", r"Phone"], values["telefono"]
-    ):
-        _append_filled(filled, "telefono")
-
-    mapping: list[tuple[str, list[str], list[str]]] = [
-        (
+            values.get("tipo_via", ""),
+        ),
+        _batch_item(
+            "tipo_via",
+            "text",
+            ["#calle", "input[name='calle']", "input[id='calle']"],
+            values.get("tipo_via", ""),
+        ),
+        _batch_item(
+            "provincia",
+            "select",
+            ["select[name*='provincia' i]", "select[id*='provincia' i]"],
+            values.get("provincia", ""),
+        ),
+    ]
+    fill_labels(
+        [
+            ("nacionalidad", nationality),
+            ("tipo_via", values.get("tipo_via", "")),
+            ("nombre_via", values.get("nombre_via", "")),
+            ("numero", values.get("numero", "")),
+            ("escalera", values.get("escalera", "")),
+            ("piso", values.get("piso", "")),
+            ("puerta", values.get("puerta", "")),
+            ("municipio", values.get("municipio", "")),
+            ("provincia", values.get("provincia", "")),
+            ("cp", values.get("cp", "")),
+            ("telefono", values.get("telefono", "")),
+        ],
+        set(_run_batch_fill(page, select_batch)),
+    )
+    trailing_batch = [
+        _batch_item(
             "email",
+            "text",
             [
                 "#email",
                 "input[type='email']",
                 "input[name*='mail' i]",
                 "input[name*='email' i]",
             ],
-            [r"mail", r"email", r"correo"],
+            values.get("email", ""),
         ),
-        (
+        _batch_item(
             "fecha",
+            "text",
             ["#fecha", "input[name*='fecha' i]", "input[type='date']"],
-            [r"fecha"],
+            values.get("fecha", ""),
         ),
-        (
+        _batch_item(
             "nombre_apellidos",
+            "text",
             [
                 "#full_name",
                 "input[name*='full_name' i]",
                 "input[name*='nombre_apellidos' i]",
             ],
-            [r"nombre\s*y\s*apellidos", r"apellidos\s*y\s*nombre", r"full\s*name"],
+            values.get("nombre_apellidos", ""),
         ),
     ]
-    for key, selectors, labels in mapping:
-        value = values.get(key, "")
-        if not value:
-            continue
-        if _set_if_possible(page, selectors, value) or _fill_by_label(
-            page, labels, value
-        ):
-            _append_filled(filled, key)
+    fill_labels(
+        [
+            ("email", values.get("email", "")),
+            ("fecha", values.get("fecha", "")),
+            ("nombre_apellidos", values.get("nombre_apellidos", "")),
+        ],
+        set(_run_batch_fill(page, trailing_batch)),
+    )
 
 
 def _dismiss_open_datepicker(page: Page) -> None:
@@ -1287,15 +1574,27 @@ def _dismiss_open_datepicker(page: Page) -> None:
         pass
 
 
-def _pick_html_adapters(target_url: str) -> list[tuple[str, Any]]:
-    parsed = urlparse(target_url)
-    host = (parsed.netloc or "").lower()
-    path = (parsed.path or "").lower()
-    adapters: list[tuple[str, Any]] = []
-    if "sede.administracionespublicas.gob.es" in host and path.startswith("/tasaspdf"):
-        adapters.append(("admin_tasas_pdf", _apply_adapter_admin_tasas_pdf))
-    adapters.append(("generic_html", _apply_adapter_generic_html))
-    return adapters
+# Site-specific adapters, matched against "<host><path>" (lowercased).
+# The generic adapter always runs last.
+_ADAPTER_REGISTRY: list[tuple[re.Pattern[str], str, Any]] = [
+    (
+        re.compile(r"^[^/]*sede\.administracionespublicas\.gob\.es[^/]*/tasaspdf"),
+        "admin_tasas_pdf",
+        _apply_adapter_admin_tasas_pdf,
+    ),
+]
+
+
+@lru_cache(maxsize=256)
+def _pick_html_adapters(target_url: str) -> tuple[tuple[str, Any], ...]:
+    # Adapters are module-level functions, so the per-URL tuple is safe to share.
+    _, host, path, _ = _parse_lower(target_url)
+    host_path = f"{host}{path}"
+    return tuple(
+        (name, adapter)
+        for pattern, name, adapter in _ADAPTER_REGISTRY
+        if pattern.search(host_path)
+    ) + (("generic_html", _apply_adapter_generic_html),)
 
 
 def autofill_existing_html_page(
@@ -1307,7 +1606,7 @@ def autofill_existing_html_page(
     strict_template: bool = False,
 ) -> dict[str, Any]:
     values = _build_value_map(payload)
-    filled: list[str] = []
+    filled = _FilledFields()
     attempted_adapters: list[str] = []
     applied_explicit = _apply_explicit_mappings(page, values, filled, explicit_mappings)
 
@@ -1320,13 +1619,15 @@ def autofill_existing_html_page(
                 LOGGER.exception("Adapter failed: %s", adapter_name)
     _dismiss_open_datepicker(page)
 
+    # Paired artifacts share one timestamp prefix.
+    ts = _artifact_timestamp()
     screenshot_path = (
-        _save_screenshot(page, out_dir, "target_html_autofill")
+        _save_screenshot(page, out_dir, "target_html_autofill", ts=ts)
         if should_save_artifact_screenshots()
         else None
     )
     dom_snapshot_path = (
-        _save_html_snapshot(page, out_dir, "target_html_autofill")
+        _save_html_snapshot(page, out_dir, "target_html_autofill", ts=ts)
         if is_template_debug_capture_enabled()
         else None
     )
@@ -1336,7 +1637,7 @@ def autofill_existing_html_page(
         "attempted_adapters": attempted_adapters,
         "applied_mappings": applied_explicit,
         "target_url": page.url,
-        "filled_fields": filled,
+        "filled_fields": filled.order,
         "screenshot": str(screenshot_path) if screenshot_path else "",
         "dom_snapshot": str(dom_snapshot_path) if dom_snapshot_path else "",
         "filled_pdf": "",
@@ -1379,33 +1680,90 @@ def _autofill_html_target(
             browser.close()
 
 
-def _pdf_value_for_field(field_name: str, value_map: dict[str, str]) -> str:
-    return _pdf_value_for_field_impl(
-        field_name,
-        value_map,
-        norm_text=_norm_text,
-        strip_extra_spaces=_strip_extra_spaces,
-    )
-
-
-def _build_nif_split_field_map(
-    doc: fitz.Document, explicit_by_field: dict[str, str], value_map: dict[str, str]
-) -> dict[str, str]:
-    return _build_nif_split_field_map_impl(doc, explicit_by_field, value_map)
-
-
 def infer_pdf_checkbox_expected(
-    field_name: str, mapped_key: str, value_map: dict[str, str]
+    field_name: str,
+    mapped_key: str,
+    value_map: dict[str, str],
+    *,
+    ctx: CheckboxContext | None = None,
 ) -> bool | None:
     return _infer_pdf_checkbox_expected_impl(
-        field_name, mapped_key, value_map, norm_text=_norm_text
+        field_name, mapped_key, value_map, norm_text=_norm_text, ctx=ctx
     )
 
 
-def _should_ignore_pdf_mapping(
-    field_name: str, mapped_key: str, source: str, widget_type: str
-) -> bool:
-    return _should_ignore_pdf_mapping_impl(field_name, mapped_key, source, widget_type)
+def _build_checkbox_group_targets(
+    widget_index: list[PdfWidgetRecord],
+    field_names: frozenset[str],
+    logical_order: list[str],
+    selected_code: str,
+    *,
+    allow_two_state_sex_fallback: bool = False,
+) -> dict[str, bool]:
+    if not field_names:
+        return {}
+    positioned = [
+        (name, x0, y0)
+        for name, _, x0, y0, _, widget_type in widget_index
+        if name in field_names and "check" in widget_type
+    ]
+    if not positioned:
+        return {}
+    positioned.sort(key=lambda item: (item[2], item[1]))
+    # Keep only the first visual row if parser picks noisy duplicates on other rows.
+    first_row_y = positioned[0][2]
+    row = [item for item in positioned if abs(item[2] - first_row_y) <= 25.0]
+    row.sort(key=lambda item: item[1])
+    effective_order = logical_order
+    # Some official templates (e.g. EX-11) expose only two sexo checkboxes (H/M).
+    # In that case we must not shift by X and should map left->H, right->M.
+    if allow_two_state_sex_fallback and len(row) == 2 and len(logical_order) >= 2:
+        effective_order = ["H", "M"]
+    out: dict[str, bool] = {}
+    for idx, (fname, _, _) in enumerate(row):
+        if idx >= len(effective_order):
+            break
+        out[fname] = selected_code == effective_order[idx]
+    return out
+
+
+def _pdf_fill_result(
+    doc: fitz.Document,
+    target_url: str,
+    out_dir: Path,
+    ts: str,
+    *,
+    touched_fields: list[str],
+    applied_mappings: list[dict[str, Any]],
+    source_path: Path | None,
+    filled_pdf: Path,
+) -> dict[str, Any]:
+    screenshot_path: Path | None = None
+    if len(doc) > 0 and should_save_artifact_screenshots():
+        first_page = doc[0]
+        pix = first_page.get_pixmap(dpi=_pdf_preview_dpi(), alpha=False)
+        screenshot_path = out_dir / f"{ts}_target_pdf_preview.png"
+        pix.save(str(screenshot_path))
+
+    warnings: list[str] = []
+    if not touched_fields:
+        warnings.append(
+            "PDF has no matched fillable fields; saved original structure for manual completion."
+        )
+    if len(touched_fields) == 0 and len(doc) > 0:
+        warnings.append("No PDF widgets were filled. Check mappings and field names.")
+
+    return {
+        "mode": "pdf_pymupdf",
+        "target_url": target_url,
+        "filled_fields": touched_fields,
+        "applied_mappings": applied_mappings,
+        "screenshot": str(screenshot_path) if screenshot_path else "",
+        # Keep API contract stable; in non-debug mode avoid extra dumps.
+        "dom_snapshot": str(source_path) if source_path else "",
+        "filled_pdf": str(filled_pdf),
+        "warnings": warnings,
+    }
 
 
 def _autofill_pdf_target(
@@ -1416,20 +1774,21 @@ def _autofill_pdf_target(
     timeout_ms: int,
     explicit_mappings: list[dict[str, Any]] | None = None,
     strict_template: bool = False,
+    pdf_bytes: bytes | None = None,
 ) -> dict[str, Any]:
-    data, _ = _fetch_pdf_bytes(target_url, timeout_ms)
+    if pdf_bytes is not None:
+        data = pdf_bytes
+    else:
+        data, _ = _download_pdf_bytes(target_url, timeout_ms)
 
     out_dir.mkdir(parents=True, exist_ok=True)
+    ts = _artifact_timestamp()
     source_path: Path | None = None
     if is_template_debug_capture_enabled():
-        source_path = (
-            out_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_target_source.pdf"
-        )
+        source_path = out_dir / f"{ts}_target_source.pdf"
         source_path.write_bytes(data)
 
     value_map = _build_value_map(payload)
-    doc = fitz.open(stream=data, filetype="pdf")
-    filled_count = 0
     touched_fields: list[str] = []
     applied_mappings: list[dict[str, Any]] = []
     explicit_by_field: dict[str, dict[str, Any]] = {}
@@ -1456,120 +1815,103 @@ def _autofill_pdf_target(
                 "match_value": match_value,
                 "checked_when": checked_when,
             }
+    # Meta values are already stripped strings; project the keyed ones once.
+    explicit_keys_by_field: dict[str, str] = {
+        name: meta["key"] for name, meta in explicit_by_field.items() if meta["key"]
+    }
+    doc = fitz.open(stream=data, filetype="pdf")
     try:
+        if not explicit_by_field and not any(value_map.values()):
+            # Nothing to write: keep the template bytes and skip the widget walk.
+            filled_pdf = out_dir / f"{ts}_target_filled.pdf"
+            filled_pdf.write_bytes(data)
+            return _pdf_fill_result(
+                doc,
+                target_url,
+                out_dir,
+                ts,
+                touched_fields=[],
+                applied_mappings=[],
+                source_path=source_path,
+                filled_pdf=filled_pdf,
+            )
         strict_explicit_mode = strict_template or bool(explicit_by_field)
+        # Materialize every widget once; later passes (split-field builders,
+        # page filter, checkbox detection, group geometry, fill) read this
+        # index instead of re-walking the document. Pages are kept alive
+        # alongside their widgets.
+        pages = list(doc)
+        page_widgets = [list(p.widgets() or []) for p in pages]
+        widget_index: list[PdfWidgetRecord] = []
+        # Parallel to widget_index, so the fill loop reuses the parsed
+        # name/type instead of re-reading them through PyMuPDF.
+        widget_objects: list[Any] = []
+        for page_index, widgets in enumerate(page_widgets):
+            for widget in widgets:
+                widget_objects.append(widget)
+                widget_index.append(pdf_widget_record(widget, page_index))
         nif_split_field_map = _build_nif_split_field_map(
-            doc,
-            {
-                name: str(meta.get("key") or "")
-                for name, meta in explicit_by_field.items()
-                if str(meta.get("key") or "")
-            },
-            value_map,
+            doc, explicit_keys_by_field, value_map, widgets=widget_index
         )
         date_split_field_values = _build_date_split_field_values(
-            doc,
-            {
-                name: str(meta.get("key") or "")
-                for name, meta in explicit_by_field.items()
-                if str(meta.get("key") or "")
-            },
-            value_map,
+            doc, explicit_keys_by_field, value_map, widgets=widget_index
         )
         context = _rule_context(value_map)
-        sexo_value = (value_map.get("sexo", "") or "").strip().upper()
-        sexo_fields = {
-            name
-            for name, meta in explicit_by_field.items()
-            if str(meta.get("key") or "").strip().lower() == "sexo"
-            and str(meta.get("field_kind") or "").strip().lower()
-            in {"checkbox", "radio"}
-        }
-        estado_civil_fields = {
-            name
-            for name, meta in explicit_by_field.items()
-            if str(meta.get("key") or "").strip().lower() == "estado_civil"
-            and str(meta.get("field_kind") or "").strip().lower()
-            in {"checkbox", "radio"}
-        }
+        checkbox_ctx = CheckboxContext.from_value_map(value_map)
+        wanted_fields = (
+            set(explicit_by_field)
+            | set(nif_split_field_map)
+            | set(date_split_field_values)
+        )
+        target_pages: set[int] = set()
+        for name, page_index, _, _, _, widget_type in widget_index:
+            if name and (
+                not strict_explicit_mode
+                or "check" in widget_type
+                or name in wanted_fields
+                or "nombreyapellidosdeltitular" in _norm_text(name)
+            ):
+                target_pages.add(page_index)
+        mapped_sexo_fields: set[str] = set()
+        mapped_estado_fields: set[str] = set()
+        for name, meta in explicit_by_field.items():
+            if meta["field_kind"] not in _CHECK_KINDS:
+                continue
+            group_key = meta["key"].lower()
+            if group_key == "sexo":
+                mapped_sexo_fields.add(name)
+            elif group_key == "estado_civil":
+                mapped_estado_fields.add(name)
+        sexo_fields = frozenset(mapped_sexo_fields)
+        estado_civil_fields = frozenset(mapped_estado_fields)
         if not sexo_fields or not estado_civil_fields:
             detected_sexo_fields: set[str] = set()
             detected_estado_fields: set[str] = set()
-            for p in doc:
-                for widget in p.widgets() or []:
-                    widget_type = str(
-                        getattr(widget, "field_type_string", "") or ""
-                    ).lower()
-                    if "check" not in widget_type:
-                        continue
-                    name = str((widget.field_name or "")).strip()
-                    upper_name = name.upper()
-                    if upper_name in {"H", "M", "CHKBOX"}:
-                        detected_sexo_fields.add(name)
-                    if upper_name in {"C", "V", "D", "SP", "CHKBOX-0"}:
-                        detected_estado_fields.add(name)
+            for name, _, _, _, _, widget_type in widget_index:
+                if "check" not in widget_type:
+                    continue
+                upper_name = name.upper()
+                if upper_name in {"H", "M", "CHKBOX"}:
+                    detected_sexo_fields.add(name)
+                if upper_name in {"C", "V", "D", "SP", "CHKBOX-0"}:
+                    detected_estado_fields.add(name)
             if not sexo_fields:
-                sexo_fields = detected_sexo_fields
+                sexo_fields = frozenset(detected_sexo_fields)
             if not estado_civil_fields:
-                estado_civil_fields = detected_estado_fields
-        estado_civil_value = (value_map.get("estado_civil", "") or "").strip().upper()
-        sexo_target_by_field: dict[str, bool] = {}
-        estado_target_by_field: dict[str, bool] = {}
-
-        def _build_checkbox_group_targets(
-            field_names: set[str],
-            logical_order: list[str],
-            selected_code: str,
-            *,
-            allow_two_state_sex_fallback: bool = False,
-        ) -> dict[str, bool]:
-            if not field_names:
-                return {}
-            positioned: list[tuple[str, float, float]] = []
-            for p in doc:
-                for widget in p.widgets() or []:
-                    fname = str((widget.field_name or "")).strip()
-                    if fname not in field_names:
-                        continue
-                    wtype = str(getattr(widget, "field_type_string", "") or "").lower()
-                    if "check" not in wtype:
-                        continue
-                    rect = widget.rect
-                    positioned.append((fname, float(rect.x0), float(rect.y0)))
-            if not positioned:
-                return {}
-            positioned.sort(key=lambda item: (item[2], item[1]))
-            # Keep only the first visual row if parser picks noisy duplicates on other rows.
-            first_row_y = positioned[0][2]
-            row = [item for item in positioned if abs(item[2] - first_row_y) <= 25.0]
-            row.sort(key=lambda item: item[1])
-            effective_order = logical_order
-            # Some official templates (e.g. EX-11) expose only two sexo checkboxes (H/M).
-            # In that case we must not shift by X and should map left->H, right->M.
-            if (
-                allow_two_state_sex_fallback
-                and len(row) == 2
-                and len(logical_order) >= 2
-            ):
-                effective_order = ["H", "M"]
-            out: dict[str, bool] = {}
-            for idx, (fname, _, _) in enumerate(row):
-                if idx >= len(effective_order):
-                    break
-                out[fname] = selected_code == effective_order[idx]
-            return out
-
+                estado_civil_fields = frozenset(detected_estado_fields)
+        # Group targets reuse the values already normalized for checkbox rules.
         sexo_target_by_field = _build_checkbox_group_targets(
+            widget_index,
             sexo_fields,
             ["X", "H", "M"],
-            sexo_value,
+            checkbox_ctx.sexo,
             allow_two_state_sex_fallback=True,
         )
-        estado_civil_target = "SP" if estado_civil_value == "SP" else estado_civil_value
         estado_target_by_field = _build_checkbox_group_targets(
+            widget_index,
             estado_civil_fields,
             ["S", "C", "V", "D", "SP"],
-            estado_civil_target,
+            checkbox_ctx.estado,
         )
 
         def _set_checkbox(widget, checked: bool) -> None:
@@ -1580,6 +1922,9 @@ def _autofill_pdf_target(
             except Exception:
                 on_state = "Yes"
             target_value = on_state if checked else "Off"
+            if widget.field_value == target_value:
+                # Already in the wanted state; keep the existing appearance.
+                return
             try:
                 # For many government PDFs, explicit export values ("Yes"/"Off")
                 # are more reliable than bool assignment for checkbox state.
@@ -1597,173 +1942,144 @@ def _autofill_pdf_target(
                     getattr(widget, "field_name", ""),
                 )
 
-        for page in doc:
-            widgets = page.widgets() or []
-            for w in widgets:
-                field_name = (w.field_name or "").strip()
-                if not field_name:
+        # Same for every "nombre y apellidos del titular" widget.
+        titular_full_name = _strip_extra_spaces(
+            " ".join(
+                x
+                for x in (
+                    value_map.get("nombre", ""),
+                    value_map.get("primer_apellido", ""),
+                    value_map.get("segundo_apellido", ""),
+                )
+                if x
+            )
+        )
+        for entry, w in zip(widget_index, widget_objects, strict=True):
+            field_name, page_index, _, _, _, widget_type = entry
+            if not field_name or page_index not in target_pages:
+                continue
+            mapping_meta = explicit_by_field.get(field_name, {})
+            mapped_key = explicit_keys_by_field.get(field_name, "")
+            mapped_source = mapping_meta.get("source", "")
+            field_kind = mapping_meta.get("field_kind", "")
+            if field_name in nif_split_field_map:
+                mapped_key = nif_split_field_map[field_name]
+                mapped_source = "nif_split_inferred"
+            if _should_ignore_pdf_mapping(
+                field_name, mapped_key, mapped_source, widget_type
+            ):
+                mapped_key = ""
+            if "check" in widget_type:
+                if field_name in sexo_fields:
+                    checked_value = sexo_target_by_field.get(field_name)
+                    if checked_value is None:
+                        checked_value = False
+                    _set_checkbox(w, checked_value)
+                    touched_fields.append(field_name)
                     continue
-                widget_type = str(getattr(w, "field_type_string", "") or "").lower()
-                mapping_meta = explicit_by_field.get(field_name, {})
-                mapped_key = str(mapping_meta.get("key") or "")
-                mapped_source = str(mapping_meta.get("source") or "")
-                field_kind = str(mapping_meta.get("field_kind") or "").lower()
-                if field_name in nif_split_field_map:
-                    mapped_key = nif_split_field_map[field_name]
-                    mapped_source = "nif_split_inferred"
-                if _should_ignore_pdf_mapping(
-                    field_name, mapped_key, mapped_source, widget_type
-                ):
-                    mapped_key = ""
-                if "check" in widget_type:
-                    if field_name in sexo_fields:
-                        checked_value = sexo_target_by_field.get(field_name)
-                        if checked_value is None:
-                            checked_value = False
-                        _set_checkbox(w, checked_value)
-                        filled_count += 1
-                        touched_fields.append(field_name)
-                        continue
-                    if field_name in estado_civil_fields:
-                        checked_value = estado_target_by_field.get(field_name)
-                        if checked_value is None:
-                            checked_value = False
-                        _set_checkbox(w, checked_value)
-                        filled_count += 1
-                        touched_fields.append(field_name)
-                        continue
-                    checked_value = None
-                    if field_kind in {"checkbox", "radio"}:
-                        checked_value = _eval_checked_when(
-                            str(mapping_meta.get("checked_when") or ""), context
-                        )
-                        if checked_value is not None:
-                            checked_value = bool(
-                                checked_value
-                                and str(mapping_meta.get("match_value") or "").strip()
-                            )
+                if field_name in estado_civil_fields:
+                    checked_value = estado_target_by_field.get(field_name)
                     if checked_value is None:
-                        checked_value = infer_pdf_checkbox_expected(
-                            field_name, mapped_key, value_map
-                        )
+                        checked_value = False
+                    _set_checkbox(w, checked_value)
+                    touched_fields.append(field_name)
+                    continue
+                checked_value = None
+                if field_kind in _CHECK_KINDS:
+                    checked_value = _eval_checked_when(
+                        str(mapping_meta.get("checked_when") or ""), context
+                    )
                     if checked_value is not None:
-                        _set_checkbox(w, checked_value)
-                        filled_count += 1
-                        touched_fields.append(field_name)
-                        if field_kind in {"checkbox", "radio"}:
-                            applied_mappings.append(
-                                {
-                                    "selector": f"pdf:{field_name}",
-                                    "canonical_key": mapped_key,
-                                    "field_kind": field_kind,
-                                    "source": mapped_source or "explicit",
-                                    "confidence": float(
-                                        mapping_meta.get("confidence") or 1.0
-                                    ),
-                                    "reason": (
-                                        "rule_evaluated_true"
-                                        if checked_value
-                                        else "rule_evaluated_false"
-                                    ),
-                                }
-                            )
-                        continue
-                if field_name in date_split_field_values:
-                    value = date_split_field_values[field_name]
-                elif "nombreyapellidosdeltitular" in _norm_text(field_name):
-                    value = _strip_extra_spaces(
-                        " ".join(
-                            x
-                            for x in [
-                                value_map.get("nombre", ""),
-                                value_map.get("primer_apellido", ""),
-                                value_map.get("segundo_apellido", ""),
-                            ]
-                            if x
+                        checked_value = bool(
+                            checked_value
+                            and str(mapping_meta.get("match_value") or "").strip()
                         )
+                if checked_value is None:
+                    checked_value = infer_pdf_checkbox_expected(
+                        field_name, mapped_key, value_map, ctx=checkbox_ctx
                     )
-                elif mapped_key in CANONICAL_FIELD_KEYS:
-                    value = value_map.get(mapped_key, "")
-                else:
-                    if strict_explicit_mode:
-                        continue
-                    else:
-                        value = _pdf_value_for_field(field_name, value_map)
-                if not value:
-                    continue
-                try:
-                    w.field_value = value
-                    w.update()
-                    filled_count += 1
+                if checked_value is not None:
+                    _set_checkbox(w, checked_value)
                     touched_fields.append(field_name)
-                    if mapped_key:
+                    if field_kind in _CHECK_KINDS:
                         applied_mappings.append(
                             {
                                 "selector": f"pdf:{field_name}",
                                 "canonical_key": mapped_key,
-                                "field_kind": field_kind or "text",
-                                "source": "explicit",
-                                "confidence": 1.0,
-                                "reason": "rule_evaluated_true",
+                                "field_kind": field_kind,
+                                "source": mapped_source or "explicit",
+                                "confidence": float(
+                                    mapping_meta.get("confidence") or 1.0
+                                ),
+                                "reason": (
+                                    "rule_evaluated_true"
+                                    if checked_value
+                                    else "rule_evaluated_false"
+                                ),
                             }
                         )
-                except Exception:
-                    LOGGER.exception("Failed setting PDF field '%s'", field_name)
+                    continue
+            if field_name in date_split_field_values:
+                value = date_split_field_values[field_name]
+            elif "nombreyapellidosdeltitular" in _norm_text(field_name):
+                value = titular_full_name
+            elif mapped_key in CANONICAL_FIELD_KEY_SET:
+                value = value_map.get(mapped_key, "")
+            else:
+                if strict_explicit_mode:
+                    continue
+                else:
+                    value = _pdf_value_for_field(field_name, value_map)
+            if not value:
+                continue
+            try:
+                # Widget attributes are read at load time, so this compares
+                # against the template's own value; update() is the costly part.
+                if w.field_value != value:
+                    w.field_value = value
+                    w.update()
+                touched_fields.append(field_name)
+                if mapped_key:
+                    applied_mappings.append(
+                        {
+                            "selector": f"pdf:{field_name}",
+                            "canonical_key": mapped_key,
+                            "field_kind": field_kind or "text",
+                            "source": "explicit",
+                            "confidence": 1.0,
+                            "reason": "rule_evaluated_true",
+                        }
+                    )
+            except Exception:
+                LOGGER.exception("Failed setting PDF field '%s'", field_name)
 
-        if hasattr(doc, "need_appearances"):
+        # Nothing was written: leave appearance streams alone instead of
+        # rewriting every widget for an unchanged form.
+        if touched_fields and hasattr(doc, "need_appearances"):
             try:
                 doc.need_appearances(True)
             except Exception:
                 LOGGER.exception("Failed setting need_appearances on filled PDF.")
-        flatten_widgets = os.getenv("PDF_FLATTEN_WIDGETS", "0").strip().lower() not in {
-            "0",
-            "false",
-            "no",
-            "off",
-        }
-        if flatten_widgets and hasattr(doc, "bake"):
+        if touched_fields and _pdf_flatten_widgets_enabled() and hasattr(doc, "bake"):
             try:
                 # Some viewers render checkbox appearances incorrectly even when
                 # /V values are correct. Baking widgets makes visual output stable.
                 doc.bake(annots=False, widgets=True)
             except Exception:
                 LOGGER.exception("Failed baking widgets for filled PDF.")
-        filled_pdf = (
-            out_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_target_filled.pdf"
-        )
+        filled_pdf = out_dir / f"{ts}_target_filled.pdf"
         doc.save(str(filled_pdf))
 
-        screenshot_path: Path | None = None
-        if should_save_artifact_screenshots():
-            first_page = doc[0]
-            pix = first_page.get_pixmap(dpi=160, alpha=False)
-            screenshot_path = (
-                out_dir
-                / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_target_pdf_preview.png"
-            )
-            pix.save(str(screenshot_path))
-
-        warnings: list[str] = []
-        if filled_count == 0:
-            warnings.append(
-                "PDF has no matched fillable fields; saved original structure for manual completion."
-            )
-        if len(touched_fields) == 0 and len(doc) > 0:
-            warnings.append(
-                "No PDF widgets were filled. Check mappings and field names."
-            )
-
-        return {
-            "mode": "pdf_pymupdf",
-            "target_url": target_url,
-            "filled_fields": touched_fields,
-            "applied_mappings": applied_mappings,
-            "screenshot": str(screenshot_path) if screenshot_path else "",
-            # Keep API contract stable; in non-debug mode avoid extra dumps.
-            "dom_snapshot": str(source_path) if source_path else "",
-            "filled_pdf": str(filled_pdf),
-            "warnings": warnings,
-        }
+        return _pdf_fill_result(
+            doc,
+            target_url,
+            out_dir,
+            ts,
+            touched_fields=touched_fields,
+            applied_mappings=applied_mappings,
+            source_path=source_path,
+            filled_pdf=filled_pdf,
+        )
     finally:
         doc.close()
 
@@ -1778,13 +2094,14 @@ def autofill_target_preview(
     headless: bool = True,
     explicit_mappings: list[dict[str, Any]] | None = None,
     strict_template: bool = False,
+    pdf_bytes: bytes | None = None,
 ) -> dict[str, Any]:
     target = (target_url or "").strip()
     if not target:
         raise ValueError("target_url is required.")
 
-    target_type = _infer_target_type(target)
-    if target_type == "pdf":
+    # Already-fetched PDF bytes settle the target type without another probe.
+    if pdf_bytes is not None or _infer_target_type(target) == "pdf":
         return _autofill_pdf_target(
             payload,
             target,
@@ -1792,6 +2109,7 @@ def autofill_target_preview(
             timeout_ms=timeout_ms,
             explicit_mappings=explicit_mappings,
             strict_template=strict_template,
+            pdf_bytes=pdf_bytes,
         )
     return _autofill_html_target(
         payload,
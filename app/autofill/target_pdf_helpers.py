@@ -2,107 +2,154 @@
 
 from __future__ import annotations
 
-from typing import Any, Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, NamedTuple
 
 import fitz
 
+# Classifier result that joins given name and both surnames instead of
+# picking the first non-empty key.
+_JOIN_FULL_NAME: tuple[str, ...] = ("nombre", "primer_apellido", "segundo_apellido")
 
-def pdf_value_for_field(
-    field_name: str,
-    value_map: dict[str, str],
-    *,
-    norm_text: Callable[[str], str],
-    strip_extra_spaces: Callable[[str], str],
-) -> str:
-    """Map PDF field name to best-effort value from canonical map."""
-    n = norm_text(field_name)
+
+@lru_cache(maxsize=4096)
+def classify_pdf_field(n: str) -> tuple[str, ...]:
+    """Return candidate canonical keys for a normalized PDF field name."""
     if not n:
-        return ""
+        return ()
     if "nombreyapellidosdeltitular" in n:
-        return strip_extra_spaces(
-            " ".join(
-                x
-                for x in [
-                    value_map.get("nombre", ""),
-                    value_map.get("primer_apellido", ""),
-                    value_map.get("segundo_apellido", ""),
-                ]
-                if x
-            )
-        )
+        return _JOIN_FULL_NAME
     if "piso" in n and "puert" in n:
-        return (
-            value_map.get("piso_puerta", "")
-            or value_map.get("piso", "")
-            or value_map.get("puerta", "")
-        )
+        return ("piso_puerta", "piso", "puerta")
     if "pasaporte" in n or "passport" in n:
-        return value_map.get("pasaporte", "") or value_map.get("nif_nie", "")
-    if any(x in n for x in ["nif", "nie", "document"]):
-        return value_map.get("nif_nie", "")
+        return ("pasaporte", "nif_nie")
+    if "nif" in n or "nie" in n or "document" in n:
+        return ("nif_nie",)
     if "primerapellido" in n or "apellido1" in n:
-        return value_map.get("primer_apellido", "")
+        return ("primer_apellido",)
     if "segundoapellido" in n or "apellido2" in n:
-        return value_map.get("segundo_apellido", "")
+        return ("segundo_apellido",)
     if n == "nombre":
-        return value_map.get("nombre", "")
+        return ("nombre",)
     if "email" in n or "correo" in n:
-        return value_map.get("email", "")
-    if any(x in n for x in ["telefono", "phone", "movil"]):
-        return value_map.get("telefono", "")
-    if any(x in n for x in ["apellidosynombre", "nombreyapellidos", "fullname"]):
-        return value_map.get("nombre_apellidos", "")
+        return ("email",)
+    if "telefono" in n or "phone" in n or "movil" in n:
+        return ("telefono",)
+    if "apellidosynombre" in n or "nombreyapellidos" in n or "fullname" in n:
+        return ("nombre_apellidos",)
     if "apellidos" in n or "surname" in n:
-        return value_map.get("nombre_apellidos", "")
-    if n == "nombre" or "forename" in n:
-        return value_map.get("nombre_apellidos", "")
+        return ("nombre_apellidos",)
+    if "forename" in n:
+        return ("nombre_apellidos",)
     if "codigopostal" in n or n == "cp":
-        return value_map.get("cp", "")
+        return ("cp",)
     if "municipio" in n or "city" in n:
-        return value_map.get("municipio", "")
+        return ("municipio",)
     if "provincia" in n or "province" in n:
-        return value_map.get("provincia", "")
+        return ("provincia",)
     if "tipovia" in n:
-        return value_map.get("tipo_via", "")
+        return ("tipo_via",)
     if "domicilioenespana" in n or n == "domicilio":
-        return value_map.get("domicilio_en_espana", "")
+        return ("domicilio_en_espana",)
     if "nombrevia" in n or "direccion" in n or "calle" in n:
-        return value_map.get("nombre_via", "")
-    if n in {"numero", "num"} or "numero" in n:
-        return value_map.get("numero", "")
+        return ("nombre_via",)
+    if "numero" in n or n == "num":
+        return ("numero",)
     if "fecha" in n and "nacimiento" not in n:
-        return value_map.get("fecha", "")
+        return ("fecha",)
     if "fechanacimiento" in n or "birth" in n:
-        return value_map.get("fecha_nacimiento", "")
+        return ("fecha_nacimiento",)
     if "importe" in n:
-        return value_map.get("importe_euros", "")
+        return ("importe_euros",)
     if "iban" in n:
-        return value_map.get("iban", "")
+        return ("iban",)
     if "nacionalidad" in n or "nationality" in n:
-        return value_map.get("nacionalidad", "")
+        return ("nacionalidad",)
     if "estadocivil" in n:
-        return value_map.get("estado_civil", "")
+        return ("estado_civil",)
     if "lugar" in n and "nac" in n:
-        return value_map.get("lugar_nacimiento", "")
+        return ("lugar_nacimiento",)
     if n == "pais" or "country" in n:
-        return value_map.get("pais_nacimiento", "")
+        return ("pais_nacimiento",)
     if "padre" in n:
-        return value_map.get("nombre_padre", "")
+        return ("nombre_padre",)
     if "madre" in n:
-        return value_map.get("nombre_madre", "")
+        return ("nombre_madre",)
     if "representante" in n and "dni" not in n and "nie" not in n and "pas" not in n:
-        return value_map.get("representante_legal", "")
-    if "dniniepas" in n or (
-        "representante" in n and any(x in n for x in ["dni", "nie", "pas"])
-    ):
-        return value_map.get("representante_documento", "")
+        return ("representante_legal",)
+    if "dniniepas" in n or "representante" in n:
+        return ("representante_documento",)
     if "titulo" in n:
-        return value_map.get("titulo_representante", "")
+        return ("titulo_representante",)
+    return ()
+
+
+def pdf_value_for_field(
+    field_name: str,
+    value_map: dict[str, str],
+    *,
+    norm_text: Callable[[str], str],
+    strip_extra_spaces: Callable[[str], str],
+) -> str:
+    """Map PDF field name to best-effort value from canonical map."""
+    keys = classify_pdf_field(norm_text(field_name))
+    if keys is _JOIN_FULL_NAME:
+        return strip_extra_spaces(
+            " ".join(x for x in (value_map.get(k, "") for k in keys) if x)
+        )
+    for key in keys:
+        value = value_map.get(key, "")
+        if value:
+            return value
     return ""
 
 
+class PdfWidgetRecord(NamedTuple):
+    """Plain-Python view of one PDF widget's name, position and type."""
+
+    name: str
+    page_index: int
+    x0: float
+    y0: float
+    width: float
+    field_type: str
+
+
+# Sort keys for PdfWidgetRecord: reading order, and left to right in a row.
+BY_ROW_THEN_X = attrgetter("y0", "x0")
+BY_X = attrgetter("x0")
+
+
+def pdf_widget_record(widget: Any, page_index: int) -> PdfWidgetRecord:
+    """Read the attributes split-field builders need from a PyMuPDF widget."""
+    rect = widget.rect
+    return PdfWidgetRecord(
+        str((widget.field_name or "")).strip(),
+        page_index,
+        float(rect.x0),
+        float(rect.y0),
+        float(rect.x1 - rect.x0),
+        str(getattr(widget, "field_type_string", "") or "").lower(),
+    )
+
+
+def collect_pdf_widget_records(doc: fitz.Document) -> list[PdfWidgetRecord]:
+    """Walk every page's widgets once and return their records in order."""
+    return [
+        pdf_widget_record(widget, page_index)
+        for page_index, page in enumerate(doc)
+        for widget in page.widgets() or []
+    ]
+
+
 def build_nif_split_field_map(
-    doc: fitz.Document, explicit_by_field: dict[str, str], value_map: dict[str, str]
+    doc: fitz.Document,
+    explicit_by_field: dict[str, str],
+    value_map: dict[str, str],
+    *,
+    widgets: list[PdfWidgetRecord] | None = None,
 ) -> dict[str, str]:
     """Infer split NIF field mapping by widget widths and x-order."""
     prefix = value_map.get("nif_nie_prefix", "")
@@ -111,129 +158,157 @@ def build_nif_split_field_map(
     if not (prefix and number and suffix):
         return {}
 
-    candidates: list[dict[str, Any]] = []
+    if widgets is None:
+        widgets = collect_pdf_widget_records(doc)
+    candidates: list[PdfWidgetRecord] = []
     seen: set[str] = set()
-    for page in doc:
-        for w in page.widgets() or []:
-            field_name = str((w.field_name or "")).strip()
-            if not field_name or field_name in seen:
-                continue
-            if explicit_by_field.get(field_name) != "nif_nie":
-                continue
-            rect = w.rect
-            candidates.append(
-                {
-                    "name": field_name,
-                    "x0": float(rect.x0),
-                    "y0": float(rect.y0),
-                    "width": float(rect.x1 - rect.x0),
-                }
-            )
-            seen.add(field_name)
+    for record in widgets:
+        if not record.name or record.name in seen:
+            continue
+        if explicit_by_field.get(record.name) != "nif_nie":
+            continue
+        candidates.append(record)
+        seen.add(record.name)
 
     if len(candidates) < 3:
         return {}
 
-    wide = sorted(
-        [c for c in candidates if c["width"] > 40.0], key=lambda c: (c["y0"], c["x0"])
-    )
-    narrow = sorted(
-        [c for c in candidates if c["width"] <= 40.0], key=lambda c: (c["y0"], c["x0"])
-    )
+    wide = sorted((c for c in candidates if c.width > 40.0), key=BY_ROW_THEN_X)
+    narrow = sorted((c for c in candidates if c.width <= 40.0), key=BY_ROW_THEN_X)
     if not wide or len(narrow) < 2:
         return {}
 
     middle = wide[0]
-    same_row_narrow = [c for c in narrow if abs(c["y0"] - middle["y0"]) <= 25.0]
+    same_row_narrow = [c for c in narrow if abs(c.y0 - middle.y0) <= 25.0]
     if len(same_row_narrow) >= 2:
-        same_row_narrow.sort(key=lambda c: c["x0"])
+        same_row_narrow.sort(key=BY_X)
         left = same_row_narrow[0]
         right = same_row_narrow[-1]
     else:
         left, right = narrow[0], narrow[1]
-        if left["x0"] > right["x0"]:
+        if left.x0 > right.x0:
             left, right = right, left
 
     return {
-        str(left["name"]): "nif_nie_prefix",
-        str(middle["name"]): "nif_nie_number",
-        str(right["name"]): "nif_nie_suffix",
+        left.name: "nif_nie_prefix",
+        middle.name: "nif_nie_number",
+        right.name: "nif_nie_suffix",
     }
 
 
-def infer_pdf_checkbox_expected(
-    field_name: str, mapped_key: str, value_map: dict[str, str], *, norm_text: Callable[[str], str]
-) -> bool | None:
-    """Infer expected checkbox state from field naming conventions and mapped key."""
-    n = norm_text(field_name)
-    sexo = (value_map.get("sexo", "") or "").strip().upper()
-    estado = (value_map.get("estado_civil", "") or "").strip().upper()
-    hijos = (value_map.get("hijos_escolarizacion_espana", "") or "").strip().upper()
-    name_upper = (field_name or "").strip().upper()
-    key = (mapped_key or "").strip().lower()
-
-    if key == "sexo":
-        if name_upper == "M":
-            return sexo == "M"
-        if name_upper == "CHKBOX":
-            return sexo in {"H", "X"}
-        return (
-            ("x" in n and sexo == "X")
-            or ("h" in n and sexo == "H")
-            or ("m" in n and sexo == "M")
-        )
-    if key == "estado_civil":
-        if name_upper in {"C", "V", "D", "SP", "CHKBOX-0"}:
-            target = "S" if name_upper == "CHKBOX-0" else name_upper
-            return estado == target
-        return (
-            ("sp" in n and estado == "SP")
-            or ("s" in n and estado == "S")
-            or ("c" in n and estado == "C")
-            or ("v" in n and estado == "V")
-            or ("d" in n and estado == "D")
-        )
-    if key == "hijos_escolarizacion_espana":
-        if name_upper == "NO":
-            return hijos == "NO"
-        if "HIJAS" in name_upper or "HIJOS" in name_upper:
-            return hijos == "SI"
-        return (("si" in n or n.endswith("s")) and hijos == "SI") or (
-            "no" in n and hijos == "NO"
+@dataclass(frozen=True)
+class CheckboxContext:
+    """Checkbox-relevant payload values, normalized once per document."""
+
+    sexo: str
+    estado: str
+    hijos: str
+
+    @classmethod
+    def from_value_map(cls, value_map: dict[str, str]) -> CheckboxContext:
+        return cls(
+            sexo=(value_map.get("sexo", "") or "").strip().upper(),
+            estado=(value_map.get("estado_civil", "") or "").strip().upper(),
+            hijos=(value_map.get("hijos_escolarizacion_espana", "") or "")
+            .strip()
+            .upper(),
         )
 
+
+def _sexo_by_name(n: str, ctx: CheckboxContext) -> bool:
+    return (
+        ("x" in n and ctx.sexo == "X")
+        or ("h" in n and ctx.sexo == "H")
+        or ("m" in n and ctx.sexo == "M")
+    )
+
+
+def _estado_by_name(n: str, ctx: CheckboxContext) -> bool:
+    return (
+        ("sp" in n and ctx.estado == "SP")
+        or ("s" in n and ctx.estado == "S")
+        or ("c" in n and ctx.estado == "C")
+        or ("v" in n and ctx.estado == "V")
+        or ("d" in n and ctx.estado == "D")
+    )
+
+
+def _hijos_by_name(n: str, ctx: CheckboxContext) -> bool:
+    return (("si" in n or n.endswith("s")) and ctx.hijos == "SI") or (
+        "no" in n and ctx.hijos == "NO"
+    )
+
+
+def _check_sexo(n: str, name_upper: str, ctx: CheckboxContext) -> bool | None:
     if name_upper == "M":
-        return sexo == "M"
+        return ctx.sexo == "M"
     if name_upper == "CHKBOX":
-        return sexo in {"H", "X"}
+        return ctx.sexo in {"H", "X"}
+    return _sexo_by_name(n, ctx)
+
+
+def _check_estado(n: str, name_upper: str, ctx: CheckboxContext) -> bool | None:
     if name_upper in {"C", "V", "D", "SP", "CHKBOX-0"}:
         target = "S" if name_upper == "CHKBOX-0" else name_upper
-        return estado == target
+        return ctx.estado == target
+    return _estado_by_name(n, ctx)
+
+
+def _check_hijos(n: str, name_upper: str, ctx: CheckboxContext) -> bool | None:
     if name_upper == "NO":
-        return hijos == "NO"
+        return ctx.hijos == "NO"
     if "HIJAS" in name_upper or "HIJOS" in name_upper:
-        return hijos == "SI"
+        return ctx.hijos == "SI"
+    return _hijos_by_name(n, ctx)
+
+
+def _check_unmapped(n: str, name_upper: str, ctx: CheckboxContext) -> bool | None:
+    if name_upper == "M":
+        return ctx.sexo == "M"
+    if name_upper == "CHKBOX":
+        return ctx.sexo in {"H", "X"}
+    if name_upper in {"C", "V", "D", "SP", "CHKBOX-0"}:
+        target = "S" if name_upper == "CHKBOX-0" else name_upper
+        return ctx.estado == target
+    if name_upper == "NO":
+        return ctx.hijos == "NO"
+    if "HIJAS" in name_upper or "HIJOS" in name_upper:
+        return ctx.hijos == "SI"
     if "sexo" in n:
-        return (
-            ("x" in n and sexo == "X")
-            or ("h" in n and sexo == "H")
-            or ("m" in n and sexo == "M")
-        )
+        return _sexo_by_name(n, ctx)
     if "estadocivil" in n:
-        return (
-            ("sp" in n and estado == "SP")
-            or ("s" in n and estado == "S")
-            or ("c" in n and estado == "C")
-            or ("v" in n and estado == "V")
-            or ("d" in n and estado == "D")
-        )
+        return _estado_by_name(n, ctx)
     if "hijos" in n or "escolarizacion" in n:
-        return (("si" in n or n.endswith("s")) and hijos == "SI") or (
-            "no" in n and hijos == "NO"
-        )
+        return _hijos_by_name(n, ctx)
     return None
 
 
+_CHECKBOX_RULES_BY_KEY: dict[
+    str, Callable[[str, str, CheckboxContext], bool | None]
+] = {
+    "sexo": _check_sexo,
+    "estado_civil": _check_estado,
+    "hijos_escolarizacion_espana": _check_hijos,
+}
+
+
+def infer_pdf_checkbox_expected(
+    field_name: str,
+    mapped_key: str,
+    value_map: dict[str, str],
+    *,
+    norm_text: Callable[[str], str],
+    ctx: CheckboxContext | None = None,
+) -> bool | None:
+    """Infer expected checkbox state from field naming conventions and mapped key."""
+    if ctx is None:
+        ctx = CheckboxContext.from_value_map(value_map)
+    rule = _CHECKBOX_RULES_BY_KEY.get(
+        (mapped_key or "").strip().lower(), _check_unmapped
+    )
+    return rule(norm_text(field_name), (field_name or "").strip().upper(), ctx)
+
+
 def should_ignore_pdf_mapping(
     field_name: str, mapped_key: str, source: str, widget_type: str
 ) -> bool:
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
 from typing import Any, Awaitable, Callable, Protocol
 
@@ -37,7 +38,7 @@ class BrowserSessionFillService:
             [dict[str, Any], bool], list[dict[str, Any]]
         ],
         run_browser_call: Callable[..., Awaitable[Any]],
-        get_browser_session_state: Callable[..., Any],
+        get_browser_session_url: Callable[[str], str],
         fill_browser_session: Callable[..., Any],
         template_mapping_service: TemplateMappingService,
         crm_repo: CRMRepositoryProtocol,
@@ -46,6 +47,7 @@ class BrowserSessionFillService:
         latest_artifact_url: Callable[[Path, str], str],
         should_save_artifact_screenshots_on_error: Callable[[], bool],
         logger_info: Callable[..., Any],
+        max_concurrent_fills: int = 4,
     ) -> None:
         """Initialize fill service with injected collaborators."""
         self._read_or_bootstrap_record = read_or_bootstrap_record
@@ -54,7 +56,7 @@ class BrowserSessionFillService:
         self._collect_validation_errors = collect_validation_errors
         self._collect_validation_issues = collect_validation_issues
         self._run_browser_call = run_browser_call
-        self._get_browser_session_state = get_browser_session_state
+        self._get_browser_session_url = get_browser_session_url
         self._fill_browser_session = fill_browser_session
         self._template_mapping_service = template_mapping_service
         self._crm_repo = crm_repo
@@ -65,6 +67,27 @@ class BrowserSessionFillService:
             should_save_artifact_screenshots_on_error
         )
         self._logger_info = logger_info
+        # Bounds how many fills wait on the single browser thread at once.
+        self._fill_sem = asyncio.Semaphore(max(1, max_concurrent_fills))
+
+    async def _persist_fill_outcome(
+        self,
+        *,
+        document_id: str,
+        record: dict[str, Any],
+        payload: dict[str, Any],
+        missing_fields: list[str],
+    ) -> None:
+        """Write the runtime record and CRM payload off the event loop, together."""
+        await asyncio.gather(
+            asyncio.to_thread(self._write_record, document_id, record),
+            asyncio.to_thread(
+                self._crm_repo.save_edited_payload,
+                document_id=document_id,
+                payload=payload,
+                missing_fields=missing_fields,
+            ),
+        )
 
     async def fill_opened_session(
         self,
@@ -86,14 +109,12 @@ class BrowserSessionFillService:
         missing_fields = self._collect_validation_errors(payload, False)
         validation_issues = self._collect_validation_issues(payload, False)
         out_dir = self._autofill_dir / document_id
-        out_dir.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(out_dir.mkdir, parents=True, exist_ok=True)
 
         try:
-            session_state = await self._run_browser_call(
-                self._get_browser_session_state,
-                session_id,
+            current_url = self._safe_value(
+                await self._run_browser_call(self._get_browser_session_url, session_id)
             )
-            current_url = self._safe_value(session_state.get("current_url"))
         except Exception:
             current_url = ""
 
@@ -128,37 +149,58 @@ class BrowserSessionFillService:
         )
 
         try:
-            result = await self._run_browser_call(
-                self._fill_browser_session,
-                session_id,
-                payload,
-                out_dir,
-                timeout_ms=timeout_ms,
-                explicit_mappings=resolution.effective_mappings,
-                fill_strategy=fill_strategy,
-            )
+            async with self._fill_sem:
+                result: dict[str, Any] = await self._run_browser_call(
+                    self._fill_browser_session,
+                    session_id,
+                    payload,
+                    out_dir,
+                    timeout_ms=timeout_ms,
+                    explicit_mappings=resolution.effective_mappings,
+                    fill_strategy=fill_strategy,
+                )
         except Exception as exc:
             detail = str(exc) or exc.__class__.__name__
             screenshot_url = (
-                self._latest_artifact_url(out_dir, "*.png")
+                await asyncio.to_thread(self._latest_artifact_url, out_dir, "*.png")
                 if self._should_save_artifact_screenshots_on_error()
                 else ""
             )
-            dom_snapshot_url = self._latest_artifact_url(out_dir, "*.html")
-            record["payload"] = payload
-            record["missing_fields"] = missing_fields
-            record["autofill_preview"] = {
+            dom_snapshot_url = await asyncio.to_thread(
+                self._latest_artifact_url, out_dir, "*.html"
+            )
+            preview: dict[str, Any] = {
                 "status": "error",
                 "error": detail,
                 "screenshot_url": screenshot_url,
                 "dom_snapshot_url": dom_snapshot_url,
             }
-            self._write_record(document_id, record)
-            self._crm_repo.save_edited_payload(
-                document_id=document_id,
-                payload=payload,
-                missing_fields=missing_fields,
-            )
+        else:
+            filled_fields = result.get("filled_fields") or []
+            mode = str(result.get("mode", "") or "")
+            preview = {
+                "status": "ok",
+                "mode": mode,
+                "screenshot": result.get("screenshot", ""),
+                "dom_snapshot": result.get("dom_snapshot", ""),
+                "filled_pdf": self._safe_value(result.get("filled_pdf")),
+                "warnings": result.get("warnings", []),
+                "filled_fields": filled_fields,
+            }
+
+        # One persist site for both outcomes: the record is written exactly once per fill.
+        record["payload"] = payload
+        record["missing_fields"] = missing_fields
+        record["autofill_preview"] = preview
+        await self._persist_fill_outcome(
+            document_id=document_id,
+            record=record,
+            payload=payload,
+            missing_fields=missing_fields,
+        )
+
+        if preview["status"] == "error":
+            # result, mode and filled_fields are bound only on the else branch.
             return (
                 422,
                 {
@@ -170,27 +212,7 @@ class BrowserSessionFillService:
                 },
             )
 
-        record["payload"] = payload
-        record["missing_fields"] = missing_fields
-        filled_fields = list(result.get("filled_fields", []) or [])
-        mode = str(result.get("mode", "") or "")
         filled_pdf_url = self._artifact_url_from_value(result.get("filled_pdf"))
-        record["autofill_preview"] = {
-            "status": "ok",
-            "mode": mode,
-            "screenshot": result.get("screenshot", ""),
-            "dom_snapshot": result.get("dom_snapshot", ""),
-            "filled_pdf": self._safe_value(result.get("filled_pdf")),
-            "warnings": result.get("warnings", []),
-            "filled_fields": filled_fields,
-        }
-        self._write_record(document_id, record)
-        self._crm_repo.save_edited_payload(
-            document_id=document_id,
-            payload=payload,
-            missing_fields=missing_fields,
-        )
-
         screenshot_url = self._artifact_url_from_value(result.get("screenshot"))
         dom_snapshot_url = self._artifact_url_from_value(result.get("dom_snapshot"))
         self._logger_info(
@@ -198,7 +220,7 @@ class BrowserSessionFillService:
             document_id,
             mode,
             len(filled_fields),
-            len(list(result.get("warnings", []) or [])),
+            len(result.get("warnings") or ()),
             screenshot_url,
             dom_snapshot_url,
             filled_pdf_url,
@@ -1,15 +1,17 @@
 from __future__ import annotations
 
-import json
+import atexit
+import gzip
 import logging
 import os
 import re
-import shutil
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 from threading import RLock
+from time import monotonic
 from typing import Any
 from urllib.parse import urlparse
 
@@ -21,20 +23,29 @@ from playwright.sync_api import (
     Playwright,
     sync_playwright,
 )
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from app.autofill.form_filler import DEFAULT_CHROME_UA
+from app.autofill.form_helpers import chromium_on_path as _chromium_on_path
 from app.autofill.target_autofill import (
     autofill_existing_html_page,
     autofill_target_preview,
+    download_pdf_bytes,
     extract_html_placeholder_mappings,
-    extract_pdf_placeholder_mappings_from_url,
+    inspect_and_extract_pdf_from_url,
     inspect_form_fields,
-    inspect_pdf_fields_from_url,
+    inspect_pdf_fields_from_bytes,
     is_template_debug_capture_enabled,
+    is_template_debug_combined_enabled,
+    is_template_debug_html_enabled,
+    is_template_debug_screenshot_enabled,
 )
+from app.core import json_codec
 
 
-@dataclass
+# Slotted: one record per live session, read on every session request.
+@dataclass(slots=True)
 class BrowserSessionRecord:
     session_id: str
     browser: Browser
@@ -42,12 +53,50 @@ class BrowserSessionRecord:
     page: Page
     target_url: str
     lock: RLock = field(default_factory=RLock)
+    # Pooled browsers go back to the pool on close instead of being shut down.
+    pooled: bool = False
+    # (page url, pdf target url or "", forced) from the last fill-target
+    # resolution; forced marks PDFs recognised only by inspecting their bytes.
+    pdf_fill_target: tuple[str, str, bool] | None = None
 
 
+@dataclass(slots=True)
+class _PooledBrowser:
+    browser: Browser
+    headless: bool
+    slow_mo: int
+    uses: int = 0
+    leases: int = 0
+
+
+@dataclass(slots=True)
+class _WarmContext:
+    browser: Browser
+    context: BrowserContext
+    page: Page
+
+
+# Single dict operations are atomic under the GIL, so lookups and the close-time
+# pop (which hands the record to exactly one closer) skip the lock;
+# _SESSIONS_LOCK only guards registration. Work on a session's page is
+# serialized by BrowserSessionRecord.lock.
 _SESSIONS: dict[str, BrowserSessionRecord] = {}
 _SESSIONS_LOCK = RLock()
 _PLAYWRIGHT: Playwright | None = None
 _PLAYWRIGHT_LOCK = RLock()
+# Warm Chromium processes shared by every session launched with the same
+# options; sessions stay isolated in their own BrowserContext. Guarded by
+# _PLAYWRIGHT_LOCK together with the driver it belongs to.
+_BROWSER_POOL: list[_PooledBrowser] = []
+# Pool slots reserved by launches in flight; Chromium starts outside the lock.
+_BROWSER_POOL_LAUNCHING = 0
+# Fresh, never-used contexts on pooled browsers, ready for the next open. Each
+# one holds its browser lease; guarded by _PLAYWRIGHT_LOCK.
+_WARM_CONTEXTS: list[_WarmContext] = []
+_DEBUG_SAFE_RE = re.compile(r"[^a-z0-9]+")
+# Debug bundles are written in the background so fills do not wait on disk.
+_DEBUG_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="template-debug")
+atexit.register(_DEBUG_EXECUTOR.shutdown)
 LOGGER = logging.getLogger(__name__)
 
 
@@ -61,12 +110,10 @@ def _get_or_start_playwright() -> Playwright:
 
 def _stop_playwright_if_idle() -> None:
     global _PLAYWRIGHT
-    with _SESSIONS_LOCK:
-        has_sessions = bool(_SESSIONS)
-    if has_sessions:
+    if _SESSIONS:
         return
     with _PLAYWRIGHT_LOCK:
-        if _PLAYWRIGHT is None:
+        if _PLAYWRIGHT is None or _BROWSER_POOL or _BROWSER_POOL_LAUNCHING:
             return
         playwright = _PLAYWRIGHT
         _PLAYWRIGHT = None
@@ -77,16 +124,7 @@ def _chromium_executable_path() -> str | None:
     explicit = os.getenv("PLAYWRIGHT_CHROMIUM_EXECUTABLE_PATH", "").strip()
     if explicit:
         return explicit
-    for candidate in [
-        "chromium",
-        "chromium-browser",
-        "google-chrome",
-        "google-chrome-stable",
-    ]:
-        found = shutil.which(candidate)
-        if found:
-            return found
-    return None
+    return _chromium_on_path()
 
 
 def _launch_chromium(p, *, headless: bool, slow_mo: int):
@@ -97,6 +135,118 @@ def _launch_chromium(p, *, headless: bool, slow_mo: int):
     return p.chromium.launch(**launch_kwargs)
 
 
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
+def _is_browser_connected(browser: Browser) -> bool:
+    try:
+        return bool(browser.is_connected())
+    except Exception:
+        return False
+
+
+def _close_browser_quietly(browser: Browser) -> None:
+    try:
+        browser.close()
+    except Exception:
+        LOGGER.exception("Failed closing pooled browser.")
+
+
+def _acquire_browser(
+    p: Playwright, *, headless: bool, slow_mo: int
+) -> tuple[Browser, bool]:
+    """Share a warm browser with matching launch options, launching one if needed.
+
+    Returns ``(browser, pooled)``. Browsers that reached MAX_USES_PER_INSTANCE
+    take no new sessions and retire once their last session closes. When the
+    pool is full of such busy browsers the session gets a dedicated, unpooled
+    browser, as before pooling existed.
+    """
+    global _BROWSER_POOL_LAUNCHING
+    pool_size = _env_int("BROWSER_POOL_SIZE", 2)
+    max_uses = _env_int("MAX_USES_PER_INSTANCE", 50)
+    stale: list[Browser] = []
+    shared: Browser | None = None
+    reserved = False
+    with _PLAYWRIGHT_LOCK:
+        for entry in list(_BROWSER_POOL):
+            if not _is_browser_connected(entry.browser):
+                if not entry.leases:
+                    _BROWSER_POOL.remove(entry)
+                    stale.append(entry.browser)
+                continue
+            if (
+                entry.headless == headless
+                and entry.slow_mo == slow_mo
+                and entry.uses < max_uses
+            ):
+                entry.leases += 1
+                entry.uses += 1
+                shared = entry.browser
+                break
+        else:
+            if len(_BROWSER_POOL) + _BROWSER_POOL_LAUNCHING >= pool_size:
+                # Evict an idle browser launched with other options to make room.
+                for entry in _BROWSER_POOL:
+                    if not entry.leases:
+                        _BROWSER_POOL.remove(entry)
+                        stale.append(entry.browser)
+                        break
+            if len(_BROWSER_POOL) + _BROWSER_POOL_LAUNCHING < pool_size:
+                # Reserve the slot; launching under the lock would stall every
+                # other session open and close for the whole Chromium startup.
+                _BROWSER_POOL_LAUNCHING += 1
+                reserved = True
+    for stale_browser in stale:
+        _close_browser_quietly(stale_browser)
+    if shared is not None:
+        return shared, True
+    if not reserved:
+        return _launch_chromium(p, headless=headless, slow_mo=slow_mo), False
+    try:
+        browser = _launch_chromium(p, headless=headless, slow_mo=slow_mo)
+    except BaseException:
+        with _PLAYWRIGHT_LOCK:
+            _BROWSER_POOL_LAUNCHING -= 1
+        raise
+    with _PLAYWRIGHT_LOCK:
+        _BROWSER_POOL_LAUNCHING -= 1
+        _BROWSER_POOL.append(
+            _PooledBrowser(
+                browser=browser,
+                headless=headless,
+                slow_mo=slow_mo,
+                uses=1,
+                leases=1,
+            )
+        )
+    return browser, True
+
+
+def _release_browser(browser: Browser) -> None:
+    """Drop one session's lease, retiring the browser when worn out or dead."""
+    max_uses = _env_int("MAX_USES_PER_INSTANCE", 50)
+    retired = False
+    with _PLAYWRIGHT_LOCK:
+        for entry in _BROWSER_POOL:
+            if entry.browser is browser:
+                entry.leases = max(0, entry.leases - 1)
+                if not entry.leases and (
+                    entry.uses >= max_uses or not _is_browser_connected(browser)
+                ):
+                    _BROWSER_POOL.remove(entry)
+                    retired = True
+                break
+        else:
+            retired = True
+    if retired:
+        _close_browser_quietly(browser)
+
+
 def _attach_context_dialog_strategy(context: BrowserContext, page: Page) -> None:
     # Attach no-op handlers so Playwright does not auto-dismiss dialogs.
     def _noop_dialog_handler(dialog) -> None:
@@ -106,47 +256,110 @@ def _attach_context_dialog_strategy(context: BrowserContext, page: Page) -> None
     page.on("dialog", _noop_dialog_handler)
 
 
-def _looks_like_pdf_url(url: str) -> bool:
-    value = (url or "").lower()
-    if ".pdf" in value:
-        return True
-    target = (url or "").strip()
-    if not target:
-        return False
-    parsed = urlparse(target)
-    host = (parsed.netloc or "").lower()
-    path = (parsed.path or "").lower()
+# Portals that serve PDFs from extension-less URLs, matched against the lowercased
+# URL as ``<netloc pattern>/<path prefix>``; add new portals here.
+_STATIC_PDF_PORTALS = (
     # inclusion.gob.es serves many PDF documents via extension-less /documents/d/... URLs.
-    if "inclusion.gob.es" in host and path.startswith("/documents/d/"):
+    r"[^/?#]*inclusion\.gob\.es[^/?#]*/documents/d/",
+)
+_STATIC_PDF_PORTALS_RE = re.compile(
+    r"^(?:[a-z][a-z0-9+.-]*:)?//(?:" + "|".join(_STATIC_PDF_PORTALS) + ")"
+)
+
+
+def _looks_like_pdf_url_static(url: str) -> bool | None:
+    """Decide from the URL alone; ``None`` means only a network probe can tell."""
+    value = (url or "").strip().lower()
+    if not value:
+        return False
+    if ".pdf" in value or _STATIC_PDF_PORTALS_RE.match(value):
         return True
-    headers = {"User-Agent": DEFAULT_CHROME_UA}
-    try:
-        head = requests.head(target, timeout=8, headers=headers, allow_redirects=True)
-        content_type = (head.headers.get("content-type") or "").lower()
-        content_disp = (head.headers.get("content-disposition") or "").lower()
-        final_url = (head.url or "").lower()
-        if (
-            "application/pdf" in content_type
-            or ".pdf" in final_url
-            or ".pdf" in content_disp
-        ):
-            return True
-    except Exception:
-        pass
+    return None
+
+
+def _build_probe_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=32,
+        max_retries=Retry(total=1, backoff_factor=0.1),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = DEFAULT_CHROME_UA
+    session.headers["Accept-Language"] = "es-ES,es;q=0.9,en;q=0.8"
+    return session
+
+
+# Keep-alive pool shared by PDF probes so repeat hosts skip TCP/TLS setup.
+_PROBE_SESSION = _build_probe_session()
+
+
+def _probe_response_is_pdf(response: Any) -> bool:
+    content_type = (response.headers.get("content-type") or "").lower()
+    content_disp = (response.headers.get("content-disposition") or "").lower()
+    final_url = (response.url or "").lower()
+    if (
+        "application/pdf" in content_type
+        or ".pdf" in final_url
+        or ".pdf" in content_disp
+    ):
+        return True
+    # Headers are inconclusive (octet-stream, missing type): sniff the magic bytes.
+    chunk = next(response.iter_content(8), b"")
+    return chunk.startswith(b"%PDF")
+
+
+def _looks_like_pdf_url_probe(target: str) -> bool | None:
+    """Probe the URL over HTTP; ``None`` means the probe itself failed."""
+    # One ranged GET instead of HEAD + GET: many portals answer HEAD badly, and
+    # the first bytes settle ambiguous headers without downloading the body.
     try:
-        probe = requests.get(
-            target, timeout=8, headers=headers, allow_redirects=True, stream=True
-        )
-        content_type = (probe.headers.get("content-type") or "").lower()
-        content_disp = (probe.headers.get("content-disposition") or "").lower()
-        final_url = (probe.url or "").lower()
-        return (
-            "application/pdf" in content_type
-            or ".pdf" in final_url
-            or ".pdf" in content_disp
-        )
+        with _PROBE_SESSION.get(
+            target,
+            headers={"Range": "bytes=0-7"},
+            timeout=8,
+            allow_redirects=True,
+            stream=True,
+        ) as probe:
+            if probe.status_code != 416:
+                return _probe_response_is_pdf(probe)
+        # Range Not Satisfiable: some servers reject ranges on empty or dynamic bodies.
+        with _PROBE_SESSION.get(
+            target, timeout=8, allow_redirects=True, stream=True
+        ) as probe:
+            return _probe_response_is_pdf(probe)
     except Exception:
+        return None
+
+
+_PDF_PROBE_TTL_SECONDS = 300.0
+_PDF_PROBE_CACHE_MAX = 1024
+# url -> (looks_like_pdf, probed_at); negative answers are cached too, but
+# failed probes (timeouts, DNS errors) are not answers and are retried.
+_PDF_PROBE_CACHE: dict[str, tuple[bool, float]] = {}
+_PDF_PROBE_CACHE_LOCK = RLock()
+
+
+def _looks_like_pdf_url(url: str) -> bool:
+    static = _looks_like_pdf_url_static(url)
+    if static is not None:
+        return static
+    target = url.strip()
+    now = monotonic()
+    with _PDF_PROBE_CACHE_LOCK:
+        cached = _PDF_PROBE_CACHE.get(target)
+    if cached is not None and now - cached[1] < _PDF_PROBE_TTL_SECONDS:
+        return cached[0]
+    result = _looks_like_pdf_url_probe(target)
+    if result is None:
         return False
+    with _PDF_PROBE_CACHE_LOCK:
+        if len(_PDF_PROBE_CACHE) >= _PDF_PROBE_CACHE_MAX:
+            # Insertion order approximates age; drop the oldest entry.
+            _PDF_PROBE_CACHE.pop(next(iter(_PDF_PROBE_CACHE)))
+        _PDF_PROBE_CACHE[target] = (result, now)
+    return result
 
 
 def _new_context(browser: Browser) -> BrowserContext:
@@ -158,12 +371,157 @@ def _new_context(browser: Browser) -> BrowserContext:
     )
 
 
+def _pooled_entry(browser: Browser) -> _PooledBrowser | None:
+    for entry in _BROWSER_POOL:
+        if entry.browser is browser:
+            return entry
+    return None
+
+
+def _take_warm_context(*, headless: bool, slow_mo: int) -> _WarmContext | None:
+    """Hand out a prepared context whose browser matches the launch options."""
+    max_uses = _env_int("MAX_USES_PER_INSTANCE", 50)
+    discarded: list[_WarmContext] = []
+    taken: _WarmContext | None = None
+    with _PLAYWRIGHT_LOCK:
+        for warm in list(_WARM_CONTEXTS):
+            entry = _pooled_entry(warm.browser)
+            if entry is None or entry.headless != headless or entry.slow_mo != slow_mo:
+                continue
+            _WARM_CONTEXTS.remove(warm)
+            if entry.uses >= max_uses or not _is_browser_connected(warm.browser):
+                discarded.append(warm)
+                continue
+            entry.uses += 1
+            taken = warm
+            break
+    for warm in discarded:
+        try:
+            warm.context.close()
+        except Exception:
+            LOGGER.exception("Failed closing warm context.")
+        _release_browser(warm.browser)
+    return taken
+
+
+def _park_warm_context(browser: Browser) -> bool:
+    """Keep a closing session's browser lease for a fresh context, if wanted.
+
+    Contexts are never recycled between sessions; a new one is created so the
+    next document starts without the previous one's cookies or storage.
+    """
+    max_uses = _env_int("MAX_USES_PER_INSTANCE", 50)
+    with _PLAYWRIGHT_LOCK:
+        entry = _pooled_entry(browser)
+        if (
+            len(_WARM_CONTEXTS) >= _env_int("BROWSER_CONTEXT_POOL_SIZE", 2)
+            or entry is None
+            or entry.uses >= max_uses
+            or not _is_browser_connected(browser)
+        ):
+            return False
+    try:
+        context = _new_context(browser)
+        page = context.new_page()
+        _attach_context_dialog_strategy(context, page)
+    except Exception:
+        LOGGER.exception("Failed preparing warm context.")
+        return False
+    with _PLAYWRIGHT_LOCK:
+        _WARM_CONTEXTS.append(_WarmContext(browser=browser, context=context, page=page))
+    return True
+
+
+_DEBUG_ROOT = Path(__file__).resolve().parent / "runtime" / "template_debug"
+
+
 def _debug_root_dir() -> Path:
-    return Path(__file__).resolve().parent / "runtime" / "template_debug"
+    return _DEBUG_ROOT
 
 
 def _debug_safe(value: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "_", (value or "").lower()).strip("_")
+    return _DEBUG_SAFE_RE.sub("_", (value or "").lower()).strip("_")
+
+
+def _write_json(path: Path, obj: Any) -> None:
+    path.write_bytes(json_codec.dumps(obj, indent=True))
+
+
+@dataclass(frozen=True)
+class _HtmlDebugSnapshot:
+    fields: list[dict[str, Any]]
+    mappings: list[dict[str, Any]]
+    unknown_vars: list[str]
+    html: str | None
+    screenshot: bytes | None
+
+
+def _write_template_debug_bundle(
+    *,
+    run_dir: Path,
+    stage: str,
+    meta: dict[str, Any],
+    payload: dict[str, Any],
+    explicit_mappings: list[dict[str, Any]],
+    pdf_url: str,
+    html_snapshot: _HtmlDebugSnapshot | None,
+) -> None:
+    # Runs on _DEBUG_EXECUTOR: only files and the PDF download, never the page.
+    try:
+        run_dir.mkdir(parents=True, exist_ok=True)
+        combined = is_template_debug_combined_enabled()
+        if not combined:
+            _write_json(run_dir / "meta.json", meta)
+            _write_json(run_dir / "payload.json", payload)
+            _write_json(run_dir / "explicit_mappings.json", explicit_mappings)
+        if html_snapshot is None:
+            try:
+                fields, mappings, unknown_vars = inspect_and_extract_pdf_from_url(
+                    pdf_url, timeout_ms=15000
+                )
+            except Exception:
+                if combined:
+                    # Keep what the split layout has already written above.
+                    _write_json(
+                        run_dir / "bundle.json",
+                        {
+                            "meta": meta,
+                            "payload": payload,
+                            "explicit_mappings": explicit_mappings,
+                        },
+                    )
+                raise
+        else:
+            fields = html_snapshot.fields
+            mappings = html_snapshot.mappings
+            unknown_vars = html_snapshot.unknown_vars
+        placeholder_mappings = {"mappings": mappings, "unknown_vars": unknown_vars}
+        if combined:
+            _write_json(
+                run_dir / "bundle.json",
+                {
+                    "meta": meta,
+                    "payload": payload,
+                    "explicit_mappings": explicit_mappings,
+                    "fields": fields,
+                    "placeholder_mappings": placeholder_mappings,
+                },
+            )
+        else:
+            _write_json(run_dir / "fields.json", fields)
+            _write_json(run_dir / "placeholder_mappings.json", placeholder_mappings)
+        if html_snapshot is not None:
+            if html_snapshot.html is not None:
+                # DOM text can carry lone surrogates that strict UTF-8 rejects.
+                (run_dir / "page.html.gz").write_bytes(
+                    gzip.compress(
+                        html_snapshot.html.encode("utf-8", "replace"), compresslevel=3
+                    )
+                )
+            if html_snapshot.screenshot is not None:
+                (run_dir / "page.jpg").write_bytes(html_snapshot.screenshot)
+    except Exception:
+        LOGGER.exception("Failed writing template debug bundle at stage=%s", stage)
 
 
 def _capture_template_debug_bundle(
@@ -180,70 +538,55 @@ def _capture_template_debug_bundle(
             session.page.url if not session.page.is_closed() else session.target_url
         )
         host = (urlparse(current_url).netloc or "").lower()
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        captured_at = datetime.now()
+        ts = captured_at.strftime("%Y%m%d_%H%M%S")
         run_dir = (
             _debug_root_dir()
             / f"{ts}_{_debug_safe(host)}_{session.session_id[:8]}_{_debug_safe(stage)}"
         )
-        run_dir.mkdir(parents=True, exist_ok=True)
 
+        current_is_pdf = _looks_like_pdf_url(current_url)
+        pdf_detected = current_is_pdf or _looks_like_pdf_url(session.target_url)
         meta = {
             "session_id": session.session_id,
             "stage": stage,
             "target_url": session.target_url,
             "current_url": current_url,
-            "captured_at": datetime.now().isoformat(),
-            "pdf_detected": bool(
-                _looks_like_pdf_url(current_url)
-                or _looks_like_pdf_url(session.target_url)
-            ),
+            "captured_at": captured_at.isoformat(),
+            "pdf_detected": pdf_detected,
         }
-        (run_dir / "meta.json").write_text(
-            json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
-        (run_dir / "payload.json").write_text(
-            json.dumps(payload or {}, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
-        (run_dir / "explicit_mappings.json").write_text(
-            json.dumps(list(explicit_mappings or []), ensure_ascii=False, indent=2),
-            encoding="utf-8",
-        )
-
-        if _looks_like_pdf_url(current_url) or _looks_like_pdf_url(session.target_url):
-            url_for_pdf = (
-                current_url if _looks_like_pdf_url(current_url) else session.target_url
-            )
-            fields = inspect_pdf_fields_from_url(url_for_pdf, timeout_ms=15000)
-            mappings, unknown_vars = extract_pdf_placeholder_mappings_from_url(
-                url_for_pdf, timeout_ms=15000
-            )
-            (run_dir / "fields.json").write_text(
-                json.dumps(fields, ensure_ascii=False, indent=2), encoding="utf-8"
-            )
-            (run_dir / "placeholder_mappings.json").write_text(
-                json.dumps(
-                    {"mappings": mappings, "unknown_vars": unknown_vars},
-                    ensure_ascii=False,
-                    indent=2,
-                ),
-                encoding="utf-8",
-            )
-        else:
+        # Page reads must happen here, on the thread that owns the page, while
+        # the caller holds the session lock; everything else is deferred.
+        html_snapshot: _HtmlDebugSnapshot | None = None
+        if not pdf_detected:
             fields = inspect_form_fields(session.page)
             mappings, unknown_vars = extract_html_placeholder_mappings(session.page)
-            (run_dir / "fields.json").write_text(
-                json.dumps(fields, ensure_ascii=False, indent=2), encoding="utf-8"
-            )
-            (run_dir / "placeholder_mappings.json").write_text(
-                json.dumps(
-                    {"mappings": mappings, "unknown_vars": unknown_vars},
-                    ensure_ascii=False,
-                    indent=2,
+            html_snapshot = _HtmlDebugSnapshot(
+                fields=fields,
+                mappings=mappings,
+                unknown_vars=unknown_vars,
+                # The freshly opened page is just the target URL; skip its DOM.
+                html=(
+                    session.page.content()
+                    if stage != "session_opened" and is_template_debug_html_enabled()
+                    else None
+                ),
+                screenshot=(
+                    session.page.screenshot(full_page=True, type="jpeg", quality=70)
+                    if is_template_debug_screenshot_enabled()
+                    else None
                 ),
-                encoding="utf-8",
             )
-            (run_dir / "page.html").write_text(session.page.content(), encoding="utf-8")
-            session.page.screenshot(path=str(run_dir / "page.png"), full_page=True)
+        _DEBUG_EXECUTOR.submit(
+            _write_template_debug_bundle,
+            run_dir=run_dir,
+            stage=stage,
+            meta=meta,
+            payload=dict(payload or {}),
+            explicit_mappings=list(explicit_mappings or []),
+            pdf_url=current_url if current_is_pdf else session.target_url,
+            html_snapshot=html_snapshot,
+        )
     except Exception:
         LOGGER.exception("Failed capturing template debug bundle at stage=%s", stage)
 
@@ -251,9 +594,19 @@ def _capture_template_debug_bundle(
 def _navigate_with_fallback(page: Page, target_url: str, timeout_ms: int) -> None:
     errors: list[str] = []
     target_looks_like_pdf = _looks_like_pdf_url(target_url)
-    for wait_until in ("domcontentloaded", "load", "commit"):
+    # "commit" returns as soon as the response starts, so a slow page costs one
+    # bounded DOM wait instead of a full timeout per retried navigation.
+    for wait_until in ("commit", "load"):
         try:
             page.goto(target_url, wait_until=wait_until, timeout=timeout_ms)
+            if wait_until == "commit":
+                try:
+                    page.wait_for_load_state(
+                        "domcontentloaded", timeout=min(timeout_ms, 5000)
+                    )
+                except Exception:
+                    # The document is committed; a slow DOM is not a load failure.
+                    pass
             return
         except Exception as exc:
             message = str(exc)
@@ -270,8 +623,7 @@ def _navigate_with_fallback(page: Page, target_url: str, timeout_ms: int) -> Non
 
 
 def _get_session(session_id: str) -> BrowserSessionRecord:
-    with _SESSIONS_LOCK:
-        session = _SESSIONS.get(session_id)
+    session = _SESSIONS.get(session_id)
     if not session:
         raise ValueError(f"Browser session not found: {session_id}")
     return session
@@ -285,16 +637,32 @@ def open_browser_session(
     timeout_ms: int = 25000,
 ) -> dict[str, Any]:
     p = _get_or_start_playwright()
-    browser = _launch_chromium(
-        p,
-        headless=headless,
-        slow_mo=slowmo,
-    )
-    context = _new_context(browser)
-    page = context.new_page()
-    page.set_default_timeout(timeout_ms)
-    _attach_context_dialog_strategy(context, page)
-    _navigate_with_fallback(page, target_url, timeout_ms)
+    context: BrowserContext | None = None
+    warm = _take_warm_context(headless=headless, slow_mo=slowmo)
+    if warm is not None:
+        browser, pooled = warm.browser, True
+        context, page = warm.context, warm.page
+    else:
+        browser, pooled = _acquire_browser(p, headless=headless, slow_mo=slowmo)
+    try:
+        if context is None:
+            context = _new_context(browser)
+            page = context.new_page()
+            _attach_context_dialog_strategy(context, page)
+        page.set_default_timeout(timeout_ms)
+        _navigate_with_fallback(page, target_url, timeout_ms)
+    except Exception:
+        # Mirror close_browser_session so a failed open does not leak a lease.
+        if context is not None:
+            try:
+                context.close()
+            except Exception:
+                LOGGER.exception("Failed closing context after open failure.")
+        if pooled:
+            _release_browser(browser)
+        else:
+            _close_browser_quietly(browser)
+        raise
 
     session_id = uuid.uuid4().hex
     record = BrowserSessionRecord(
@@ -303,6 +671,7 @@ def open_browser_session(
         context=context,
         page=page,
         target_url=target_url,
+        pooled=pooled,
     )
     with _SESSIONS_LOCK:
         _SESSIONS[session_id] = record
@@ -340,6 +709,60 @@ def get_browser_session_state(session_id: str) -> dict[str, Any]:
         }
 
 
+def get_browser_session_current_url(session_id: str) -> str:
+    """Return only the page URL; unlike the full state it skips page.title()."""
+    session = _get_session(session_id)
+    with session.lock:
+        page = session.page
+        return "" if page.is_closed() else page.url
+
+
+def _resolve_pdf_fill_target(
+    session: BrowserSessionRecord, current_url: str, timeout_ms: int
+) -> tuple[str, bytes | None]:
+    """Return the PDF URL to fill ("" for HTML) and any bytes fetched to decide.
+
+    The decision is remembered per page URL, so repeated fills of the same
+    page skip the probes; caller holds ``session.lock``.
+    """
+    cached = session.pdf_fill_target
+    if cached is not None and cached[0] == current_url:
+        _, pdf_target_url, forced = cached
+        if not forced:
+            return pdf_target_url, None
+        # The URL still looks ambiguous, so the fill needs the bytes again or
+        # it would re-probe and take the HTML path. Download them fresh: the
+        # portal may have regenerated the PDF since the last fill.
+        return pdf_target_url, download_pdf_bytes(pdf_target_url, timeout_ms=timeout_ms)
+    pdf_target_url = ""
+    pdf_bytes: bytes | None = None
+    if _looks_like_pdf_url(current_url):
+        pdf_target_url = current_url
+    elif _looks_like_pdf_url(session.target_url):
+        # Some government portals render an HTML viewer URL in page.url
+        # while the original target points to a PDF resource.
+        pdf_target_url = session.target_url
+    elif session.target_url:
+        # Final fallback: probe target URL by trying to inspect PDF fields directly.
+        # If this succeeds, force PDF mode even when URL/headers look ambiguous.
+        # The freshly downloaded bytes are handed to the fill, which would
+        # otherwise download them again.
+        try:
+            probed = download_pdf_bytes(
+                session.target_url, timeout_ms=min(timeout_ms, 15000)
+            )
+            _ = inspect_pdf_fields_from_bytes(probed)
+            pdf_target_url = session.target_url
+            pdf_bytes = probed
+        except requests.RequestException:
+            # Network trouble is not an answer; probe again on the next fill.
+            return "", None
+        except Exception:
+            pdf_target_url = ""
+    session.pdf_fill_target = (current_url, pdf_target_url, pdf_bytes is not None)
+    return pdf_target_url, pdf_bytes
+
+
 def fill_browser_session(
     session_id: str,
     payload: dict[str, Any],
@@ -361,23 +784,9 @@ def fill_browser_session(
             explicit_mappings=explicit_mappings,
         )
         current_url = session.page.url
-        pdf_target_url = ""
-        if _looks_like_pdf_url(current_url):
-            pdf_target_url = current_url
-        elif _looks_like_pdf_url(session.target_url):
-            # Some government portals render an HTML viewer URL in page.url
-            # while the original target points to a PDF resource.
-            pdf_target_url = session.target_url
-        elif session.target_url:
-            # Final fallback: probe target URL by trying to inspect PDF fields directly.
-            # If this succeeds, force PDF mode even when URL/headers look ambiguous.
-            try:
-                _ = inspect_pdf_fields_from_url(
-                    session.target_url, timeout_ms=min(timeout_ms, 15000)
-                )
-                pdf_target_url = session.target_url
-            except Exception:
-                pdf_target_url = ""
+        pdf_target_url, pdf_bytes = _resolve_pdf_fill_target(
+            session, current_url, timeout_ms
+        )
         if pdf_target_url:
             result = autofill_target_preview(
                 payload,
@@ -388,6 +797,7 @@ def fill_browser_session(
                 headless=True,
                 explicit_mappings=explicit_mappings,
                 strict_template=(fill_strategy != "heuristic_fallback"),
+                pdf_bytes=pdf_bytes,
             )
             _capture_template_debug_bundle(
                 session=session,
@@ -422,13 +832,16 @@ def fill_browser_session(
 
 
 def close_browser_session(session_id: str) -> None:
-    with _SESSIONS_LOCK:
-        session = _SESSIONS.pop(session_id, None)
+    session = _SESSIONS.pop(session_id, None)
     if not session:
         return
     with session.lock:
         try:
             session.context.close()
         finally:
-            session.browser.close()
+            if session.pooled:
+                if not _park_warm_context(session.browser):
+                    _release_browser(session.browser)
+            else:
+                session.browser.close()
     _stop_playwright_if_idle()
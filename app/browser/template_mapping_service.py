@@ -3,8 +3,12 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from threading import Lock
+from time import monotonic
 from typing import Any, Callable, Protocol
 
+_RESOLUTION_CACHE_MAX = 256
+
 
 class FormMappingRepositoryProtocol(Protocol):
     """Protocol for mapping repository used by template resolver."""
@@ -37,14 +41,61 @@ class TemplateMappingService:
         collect_validation_issues: Callable[
             [dict[str, Any], bool], list[dict[str, Any]]
         ],
+        cache_ttl_seconds: float = 30.0,
     ) -> None:
         """Initialize service with explicit dependencies."""
         self._form_mapping_repo = form_mapping_repo
         self._safe_value = safe_value
         self._collect_validation_errors = collect_validation_errors
         self._collect_validation_issues = collect_validation_issues
+        self._cache_ttl_seconds = cache_ttl_seconds
+        # url -> (stored_at, template version token or None, resolution)
+        self._resolution_cache: dict[
+            str, tuple[float, str | None, TemplateResolution]
+        ] = {}
+        self._cache_lock = Lock()
+
+    def _template_version(self, current_url: str) -> str | None:
+        get_version = getattr(self._form_mapping_repo, "get_version_for_url", None)
+        if get_version is None:
+            return None
+        try:
+            token = get_version(current_url)
+        except Exception:
+            return None
+        return str(token) if token is not None else None
 
     def resolve_for_url(self, current_url: str) -> TemplateResolution:
+        """Resolve latest template, reusing cached resolutions while still current.
+
+        Repositories exposing ``get_version_for_url`` validate hits by version
+        token, so an unchanged template is reused past the TTL and a saved one
+        is picked up at once; otherwise hits expire after the TTL.
+        """
+        now = monotonic()
+        version = self._template_version(current_url)
+        with self._cache_lock:
+            cached = self._resolution_cache.get(current_url)
+        if cached is not None:
+            stored_at, cached_version, cached_resolution = cached
+            if version is not None:
+                if cached_version == version:
+                    return cached_resolution
+            elif now - stored_at < self._cache_ttl_seconds:
+                return cached_resolution
+        resolution = self._resolve_uncached(current_url)
+        # Misses are not cached so a freshly saved template is picked up at once.
+        if resolution.is_valid and self._cache_ttl_seconds > 0:
+            with self._cache_lock:
+                if (
+                    current_url not in self._resolution_cache
+                    and len(self._resolution_cache) >= _RESOLUTION_CACHE_MAX
+                ):
+                    self._resolution_cache.pop(next(iter(self._resolution_cache)))
+                self._resolution_cache[current_url] = (now, version, resolution)
+        return resolution
+
+    def _resolve_uncached(self, current_url: str) -> TemplateResolution:
         """Resolve latest template and convert mappings to canonical shape."""
         template = self._form_mapping_repo.get_latest_for_url(current_url)
         if not template:
@@ -68,12 +119,15 @@ class TemplateMappingService:
                 message="Template has no mappings.",
             )
 
-        merged_map: dict[str, dict[str, Any]] = {}
+        # Later duplicates of a selector replace the earlier row in place, so the
+        # output keeps first-seen order with last-wins values.
+        effective: list[dict[str, Any]] = []
+        position: dict[str, int] = {}
         for item in learned:
             selector = self._safe_value(item.get("selector"))
             if not selector:
                 continue
-            merged_map[selector] = {
+            row = {
                 "selector": selector,
                 "canonical_key": self._safe_value(item.get("canonical_key")),
                 "field_kind": self._safe_value(item.get("field_kind")) or "text",
@@ -82,12 +136,18 @@ class TemplateMappingService:
                 "source": self._safe_value(item.get("source")) or "template",
                 "confidence": float(item.get("confidence") or 0.99),
             }
+            index = position.get(selector)
+            if index is None:
+                position[selector] = len(effective)
+                effective.append(row)
+            else:
+                effective[index] = row
 
         return TemplateResolution(
             is_valid=True,
             current_url=current_url,
             template_source=self._safe_value(template.get("source")),
-            effective_mappings=list(merged_map.values()),
+            effective_mappings=effective,
         )
 
     def build_template_response(
@@ -0,0 +1,50 @@
+"""Compact JSON encoding for hot paths, backed by orjson when installed."""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any
+
+try:
+    import orjson
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore[assignment]
+
+# orjson decodes integers beyond 64 bits as floats without raising; any run of
+# 20+ digits might be one, so such documents go to the stdlib instead.
+_LONG_DIGITS_BYTES = re.compile(rb"\d{20}")
+_LONG_DIGITS_STR = re.compile(r"\d{20}")
+
+
+def dumps(obj: Any, *, indent: bool = False) -> bytes:
+    """Encode ``obj`` as UTF-8 JSON bytes; compact unless ``indent`` is set."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, option=option)
+        except orjson.JSONEncodeError:
+            # orjson rejects lone surrogates and out-of-range ints that the
+            # stdlib accepts; unsupported types still raise TypeError below.
+            pass
+    if indent:
+        return json.dumps(obj, indent=2).encode("ascii")
+    return json.dumps(obj, separators=(",", ":")).encode("ascii")
+
+
+def loads(raw: str | bytes) -> Any:
+    """Decode JSON text or bytes; raises ``json.JSONDecodeError`` on bad input."""
+    if isinstance(raw, str):
+        long_digits = _LONG_DIGITS_STR.search(raw) is not None
+    else:
+        long_digits = _LONG_DIGITS_BYTES.search(raw) is not None
+    if orjson is not None and not long_digits:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Lone-surrogate escapes written by the stdlib fallback (or older
+            # rows); the stdlib re-raises real syntax errors.
+            pass
+    return json.loads(raw)
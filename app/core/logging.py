@@ -2,13 +2,14 @@
 
 from __future__ import annotations
 
-import json
 import logging
 import sys
 from contextvars import ContextVar
 from datetime import datetime, timezone
 from typing import Any
 
+from app.core import json_codec
+
 CORRELATION_ID_CTX: ContextVar[str] = ContextVar("correlation_id", default="")
 
 
@@ -33,7 +34,7 @@ class JsonLogFormatter(logging.Formatter):
         if record.exc_info:
             payload["exception"] = self.formatException(record.exc_info)
 
-        return json.dumps(payload, ensure_ascii=False)
+        return json_codec.dumps(payload).decode("utf-8")
 
 
 def setup_logging(level: str = "INFO") -> None:
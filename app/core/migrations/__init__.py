@@ -1,5 +1,5 @@
 """Database migration utilities."""
 
-from app.core.migrations.runner import apply_migrations
+from app.core.migrations.runner import apply_migrations, configure_connection
 
-__all__ = ["apply_migrations"]
+__all__ = ["apply_migrations", "configure_connection"]
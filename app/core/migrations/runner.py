@@ -7,12 +7,28 @@ from pathlib import Path
 
 MIGRATIONS_DIR = Path(__file__).resolve().parent / "sql"
 
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-65536",
+)
+
+
+def configure_connection(connection: sqlite3.Connection) -> None:
+    """Switch a runtime-state connection to WAL with NORMAL sync and busy waits."""
+    for pragma in _CONNECTION_PRAGMAS:
+        connection.execute(pragma)
+
 
 def apply_migrations(database_path: Path) -> None:
     """Apply all SQL migrations in ascending order for the given database."""
     database_path.parent.mkdir(parents=True, exist_ok=True)
     connection = sqlite3.connect(str(database_path))
     try:
+        configure_connection(connection)
         cursor = connection.cursor()
         cursor.execute(
             """
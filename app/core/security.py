@@ -5,11 +5,21 @@ from __future__ import annotations
 import base64
 import hashlib
 import hmac
-import json
 import os
 import time
+from functools import lru_cache
 from typing import Any
 
+from app.core import json_codec
+
+try:
+    import fastpbkdf2
+except Exception:  # pragma: no cover
+    fastpbkdf2 = None
+
+# Raising this only affects new hashes; stored hashes carry their own rounds.
+_PBKDF2_ROUNDS = 120_000
+
 
 def _b64url_encode(raw: bytes) -> str:
     """Return URL-safe base64 string without padding."""
@@ -22,11 +32,25 @@ def _b64url_decode(value: str) -> bytes:
     return base64.urlsafe_b64decode((value + padding).encode("utf-8"))
 
 
+@lru_cache(maxsize=1)
+def _fastpbkdf2_enabled() -> bool:
+    raw = os.getenv("PASSWORD_HASH_FASTPBKDF2", "1").strip().lower()
+    return raw not in {"0", "false", "no", "off"}
+
+
+def _pbkdf2_sha256(password: str, salt: bytes, rounds: int) -> bytes:
+    """Derive a PBKDF2-HMAC-SHA256 key, via fastpbkdf2 when installed and enabled."""
+    secret = password.encode("utf-8")
+    if fastpbkdf2 is not None and _fastpbkdf2_enabled():
+        return bytes(fastpbkdf2.pbkdf2_hmac("sha256", secret, salt, rounds))
+    return hashlib.pbkdf2_hmac("sha256", secret, salt, rounds)
+
+
 def hash_password(password: str) -> str:
     """Hash password using PBKDF2-HMAC-SHA256 with random salt."""
     salt = os.urandom(16)
-    derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 120_000)
-    return f"pbkdf2_sha256$120000${_b64url_encode(salt)}${_b64url_encode(derived)}"
+    derived = _pbkdf2_sha256(password, salt, _PBKDF2_ROUNDS)
+    return f"pbkdf2_sha256${_PBKDF2_ROUNDS}${_b64url_encode(salt)}${_b64url_encode(derived)}"
 
 
 def verify_password(password: str, stored_hash: str) -> bool:
@@ -41,25 +65,33 @@ def verify_password(password: str, stored_hash: str) -> bool:
     except Exception:
         return False
 
-    derived = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, rounds)
+    derived = _pbkdf2_sha256(password, salt, rounds)
     return hmac.compare_digest(derived, expected)
 
 
+@lru_cache(maxsize=8)
+def _hmac_template(secret_key: str) -> hmac.HMAC:
+    """Keyed HMAC-SHA256 context; callers ``copy()`` it and never update it."""
+    return hmac.new(secret_key.encode("utf-8"), b"", hashlib.sha256)
+
+
+def _sign(signing_input: bytes, secret_key: str) -> bytes:
+    mac = _hmac_template(secret_key).copy()
+    mac.update(signing_input)
+    return mac.digest()
+
+
+# HS256 tokens always carry the same header; encode it once.
+_JWT_HEADER_PART = _b64url_encode(b'{"alg":"HS256","typ":"JWT"}')
+_JWT_HEADER_PREFIX = _JWT_HEADER_PART.encode("ascii") + b"."
+
+
 def build_signed_token(payload: dict[str, Any], secret_key: str) -> str:
     """Create compact signed token using JWT-like 3-part structure."""
-    header = {"alg": "HS256", "typ": "JWT"}
-    header_part = _b64url_encode(
-        json.dumps(header, separators=(",", ":")).encode("utf-8")
-    )
-    payload_part = _b64url_encode(
-        json.dumps(payload, separators=(",", ":")).encode("utf-8")
-    )
-    signing_input = f"{header_part}.{payload_part}".encode("utf-8")
-    signature = hmac.new(
-        secret_key.encode("utf-8"), signing_input, hashlib.sha256
-    ).digest()
-    signature_part = _b64url_encode(signature)
-    return f"{header_part}.{payload_part}.{signature_part}"
+    payload_part = _b64url_encode(json_codec.dumps(payload))
+    signing_input = _JWT_HEADER_PREFIX + payload_part.encode("ascii")
+    signature_part = _b64url_encode(_sign(signing_input, secret_key))
+    return f"{_JWT_HEADER_PART}.{payload_part}.{signature_part}"
 
 
 def decode_signed_token(token: str, secret_key: str) -> dict[str, Any]:
@@ -70,16 +102,14 @@ def decode_signed_token(token: str, secret_key: str) -> dict[str, Any]:
         raise ValueError("Malformed token") from exc
 
     signing_input = f"{header_part}.{payload_part}".encode("utf-8")
-    expected_sig = hmac.new(
-        secret_key.encode("utf-8"), signing_input, hashlib.sha256
-    ).digest()
+    expected_sig = _sign(signing_input, secret_key)
     got_sig = _b64url_decode(signature_part)
     if not hmac.compare_digest(expected_sig, got_sig):
         raise ValueError("Invalid token signature")
 
     payload_raw = _b64url_decode(payload_part)
     try:
-        payload = json.loads(payload_raw.decode("utf-8"))
+        payload = json_codec.loads(payload_raw)
     except Exception as exc:
         raise ValueError("Invalid token payload") from exc
     if not isinstance(payload, dict):
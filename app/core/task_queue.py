@@ -12,7 +12,8 @@ from pathlib import Path
 from threading import Lock
 from typing import Any, Awaitable, Callable
 
-from app.core.migrations import apply_migrations
+from app.core import json_codec
+from app.core.migrations import apply_migrations, configure_connection
 
 TaskHandler = Callable[[dict[str, Any]], Awaitable[dict[str, Any]]]
 
@@ -51,6 +52,7 @@ class TaskQueue:
             str(settings.database_path),
             check_same_thread=False,
         )
+        configure_connection(self._connection)
         self._connection.row_factory = sqlite3.Row
         self._lock = Lock()
         self._handlers: dict[str, TaskHandler] = {}
@@ -150,7 +152,7 @@ class TaskQueue:
                 (
                     task_id,
                     task_kind,
-                    json.dumps(payload, ensure_ascii=False),
+                    json_codec.dumps(payload).decode("utf-8"),
                     TASK_STATUS_QUEUED,
                     retries,
                     retry_delay,
@@ -182,7 +184,7 @@ class TaskQueue:
         result: dict[str, Any] | None = None
         if row["result_json"]:
             try:
-                decoded = json.loads(str(row["result_json"]))
+                decoded = json_codec.loads(str(row["result_json"]))
                 if isinstance(decoded, dict):
                     result = decoded
             except json.JSONDecodeError:
@@ -258,7 +260,7 @@ class TaskQueue:
             return True
 
         try:
-            payload_raw = json.loads(str(row["payload_json"]))
+            payload_raw = json_codec.loads(str(row["payload_json"]))
             payload = payload_raw if isinstance(payload_raw, dict) else {}
         except json.JSONDecodeError:
             self._mark_failed(
@@ -294,7 +296,7 @@ class TaskQueue:
                 """,
                 (
                     TASK_STATUS_COMPLETED,
-                    json.dumps(result, ensure_ascii=False),
+                    json_codec.dumps(result).decode("utf-8"),
                     now,
                     task_id,
                 ),
@@ -172,6 +172,24 @@ class FormMappingRepository:
             LOGGER.exception("Failed reading local mapping template: %s", file_path)
             return None
 
+    def get_version_for_url(self, target_url: str) -> str | None:
+        """Cheap change token for the URL's template, without loading mappings."""
+        host, path = _normalize_url_parts(target_url)
+        if not host:
+            return None
+        if self._mongo_enabled and self._collection is not None:
+            doc = self._collection.find_one(
+                {"host": host, "path": path}, {"_id": 0, "updated_at": 1}
+            )
+            updated_at = doc.get("updated_at") if doc else None
+            # No timestamp means no usable token; callers fall back to their TTL.
+            return str(updated_at) if updated_at else None
+        try:
+            stat = self._fallback_file(host, path).stat()
+        except OSError:
+            return None
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
     def get_template_for_revision(
         self, *, target_url: str, revision: str
     ) -> dict[str, Any] | None:
@@ -42,3 +42,19 @@ def test_login_rate_limiter_resets_after_success(tmp_path: Path) -> None:
 
     limiter.assert_allowed(email="ok@example.com", client_ip="127.0.0.1")
     limiter.close()
+
+
+def test_login_rate_limiter_connection_uses_wal_pragmas(tmp_path: Path) -> None:
+    limiter = LoginRateLimiter(
+        database_path=tmp_path / "state.db",
+        max_attempts=2,
+        window_seconds=300,
+        lock_seconds=120,
+    )
+    try:
+        connection = limiter._connection
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert connection.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    finally:
+        limiter.close()
@@ -3,6 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 
 import fitz
+import pytest
 
 from app.autofill.form_filler import (
     _check_download_content,
@@ -21,12 +22,15 @@ from app.autofill.target_autofill import (
     _normalize_ascii_upper,
     _normalize_door_token,
     _normalize_signal,
+    _pdf_flatten_widgets_enabled,
     _sanitize_floor_token,
     _split_address_details,
     _split_compact_floor_door,
     _split_date_parts,
     build_date_split_field_values,
     infer_pdf_checkbox_expected,
+    is_template_debug_capture_enabled,
+    refresh_env_flags,
 )
 
 
@@ -37,6 +41,32 @@ def test_target_autofill_basic_normalizers() -> None:
     assert _normalize_door_token(" 21 ") == "21"
 
 
+def test_target_autofill_env_flags_are_cached_until_refresh(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("TEMPLATE_DEBUG_CAPTURE", "1")
+    refresh_env_flags()
+    assert is_template_debug_capture_enabled() is True
+    monkeypatch.setenv("TEMPLATE_DEBUG_CAPTURE", "0")
+    assert is_template_debug_capture_enabled() is True
+    refresh_env_flags()
+    assert is_template_debug_capture_enabled() is False
+
+
+def test_target_autofill_pdf_flatten_flag_is_cached_until_refresh(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("PDF_FLATTEN_WIDGETS", "off")
+    refresh_env_flags()
+    assert _pdf_flatten_widgets_enabled() is False
+    monkeypatch.setenv("PDF_FLATTEN_WIDGETS", "bake")
+    assert _pdf_flatten_widgets_enabled() is False
+    refresh_env_flags()
+    assert _pdf_flatten_widgets_enabled() is True
+    monkeypatch.delenv("PDF_FLATTEN_WIDGETS")
+    refresh_env_flags()
+
+
 def test_target_autofill_address_splitters() -> None:
     floor, door = _split_compact_floor_door("5C", "")
     via, number, escalera, piso, puerta = _split_address_details(
@@ -50,6 +80,9 @@ def test_target_autofill_address_splitters() -> None:
     assert piso == "2"
     assert puerta == "B"
     assert _compose_floor_door_token("2", "B") == "2 B"
+    assert _split_address_details(" Gran  Vía, ") == ("Gran Vía", "", "", "", "")
+    # Priority order decides overlapping markers, not position.
+    assert _split_address_details("piso num 5") == ("piso", "5", "", "", "")
 
 
 def test_target_autofill_date_and_pdf_helpers() -> None:
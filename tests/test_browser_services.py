@@ -7,6 +7,7 @@ from typing import Any
 import pytest
 from fastapi import HTTPException
 
+from app.browser import template_mapping_service
 from app.browser.session_fill_service import BrowserSessionFillService
 from app.browser.template_mapping_service import TemplateMappingService
 
@@ -71,6 +72,98 @@ def test_template_mapping_service_returns_effective_mappings() -> None:
     assert resolution.effective_mappings[0]["selector"] == "#field-nie"
 
 
+def test_template_mapping_service_caches_valid_resolutions(monkeypatch) -> None:
+    """Repeated resolutions for one URL should reuse the cached template."""
+    lookups: list[str] = []
+    clock = [100.0]
+    monkeypatch.setattr(template_mapping_service, "monotonic", lambda: clock[0])
+
+    class _CountingRepo(_FakeMappingsRepo):
+        def get_latest_for_url(self, target_url: str) -> dict[str, Any] | None:
+            lookups.append(target_url)
+            return super().get_latest_for_url(target_url)
+
+    service = TemplateMappingService(
+        form_mapping_repo=_CountingRepo(
+            {
+                "source": "learned",
+                "mappings": [{"selector": "#a", "canonical_key": "nombre"}],
+            }
+        ),
+        safe_value=_safe,
+        collect_validation_errors=lambda payload, require_tramite: [],
+        collect_validation_issues=lambda payload, require_tramite: [],
+    )
+
+    first = service.resolve_for_url("https://example.com/form")
+    second = service.resolve_for_url("https://example.com/form")
+    clock[0] += 31.0
+    service.resolve_for_url("https://example.com/form")
+
+    assert second is first
+    assert lookups == ["https://example.com/form", "https://example.com/form"]
+
+
+def test_template_mapping_service_validates_cache_by_template_version() -> None:
+    """Versioned repositories should refresh the cache only when the token moves."""
+    lookups: list[str] = []
+    versions = ["v1"]
+
+    class _VersionedRepo(_FakeMappingsRepo):
+        def get_latest_for_url(self, target_url: str) -> dict[str, Any] | None:
+            lookups.append(target_url)
+            return super().get_latest_for_url(target_url)
+
+        def get_version_for_url(self, target_url: str) -> str | None:
+            _ = target_url
+            return versions[-1]
+
+    service = TemplateMappingService(
+        form_mapping_repo=_VersionedRepo(
+            {
+                "source": "learned",
+                "mappings": [{"selector": "#a", "canonical_key": "nombre"}],
+            }
+        ),
+        safe_value=_safe,
+        collect_validation_errors=lambda payload, require_tramite: [],
+        collect_validation_issues=lambda payload, require_tramite: [],
+        cache_ttl_seconds=1e-9,
+    )
+
+    first = service.resolve_for_url("https://example.com/form")
+    # Past the TTL, but the version is unchanged: still a hit.
+    assert service.resolve_for_url("https://example.com/form") is first
+    versions.append("v2")
+    assert service.resolve_for_url("https://example.com/form") is not first
+    assert len(lookups) == 2
+
+
+def test_template_mapping_service_dedups_selectors_last_wins() -> None:
+    """Duplicate selectors keep their first position but take the last row."""
+    service = TemplateMappingService(
+        form_mapping_repo=_FakeMappingsRepo(
+            {
+                "source": "learned",
+                "mappings": [
+                    {"selector": "#a", "canonical_key": "nombre"},
+                    {"selector": "#b", "canonical_key": "cp"},
+                    {"selector": "#a", "canonical_key": "apellidos"},
+                ],
+            }
+        ),
+        safe_value=_safe,
+        collect_validation_errors=lambda payload, require_tramite: [],
+        collect_validation_issues=lambda payload, require_tramite: [],
+    )
+
+    resolution = service.resolve_for_url("https://example.com/form")
+
+    assert [
+        (row["selector"], row["canonical_key"]) for row in resolution.effective_mappings
+    ] == [("#a", "apellidos"), ("#b", "cp")]
+
+
 def test_template_mapping_service_returns_not_found_error() -> None:
     """Template service should return structured error for absent template."""
     service = TemplateMappingService(
@@ -106,7 +199,7 @@ def test_browser_fill_service_requires_opened_session() -> None:
         collect_validation_errors=lambda payload, require_tramite: [],
         collect_validation_issues=lambda payload, require_tramite: [],
         run_browser_call=lambda *args, **kwargs: asyncio.sleep(0),
-        get_browser_session_state=lambda session_id: {},
+        get_browser_session_url=lambda session_id: "",
         fill_browser_session=lambda *args, **kwargs: {},
         template_mapping_service=template_service,
         crm_repo=_FakeCRMRepo(),
@@ -127,3 +220,130 @@ def test_browser_fill_service_requires_opened_session() -> None:
             )
 
     asyncio.run(scenario())
+
+
+def _build_opened_fill_service(
+    autofill_dir: Path, **overrides: Any
+) -> BrowserSessionFillService:
+    """Fill service for a document whose browser session is already open."""
+    template_service = TemplateMappingService(
+        form_mapping_repo=_FakeMappingsRepo(
+            {
+                "source": "learned",
+                "mappings": [
+                    {
+                        "selector": "#field-nie",
+                        "canonical_key": "nif_nie",
+                        "field_kind": "text",
+                    }
+                ],
+            }
+        ),
+        safe_value=_safe,
+        collect_validation_errors=lambda payload, require_tramite: [],
+        collect_validation_issues=lambda payload, require_tramite: [],
+    )
+
+    async def _run_browser_call(fn: Any, *args: Any, **kwargs: Any) -> Any:
+        return fn(*args, **kwargs)
+
+    options: dict[str, Any] = {
+        "read_or_bootstrap_record": lambda document_id: {
+            "document_id": document_id,
+            "browser_session_id": "session-1",
+        },
+        "write_record": lambda document_id, record: None,
+        "safe_value": _safe,
+        "collect_validation_errors": lambda payload, require_tramite: [],
+        "collect_validation_issues": lambda payload, require_tramite: [],
+        "run_browser_call": _run_browser_call,
+        "get_browser_session_url": lambda session_id: "https://example.com/form",
+        "fill_browser_session": lambda *args, **kwargs: {
+            "mode": "html",
+            "filled_fields": ["#field-nie"],
+        },
+        "template_mapping_service": template_service,
+        "crm_repo": _FakeCRMRepo(),
+        "autofill_dir": autofill_dir,
+        "artifact_url_from_value": lambda value: "",
+        "latest_artifact_url": lambda base_dir, pattern: "",
+        "should_save_artifact_screenshots_on_error": lambda: False,
+        "logger_info": lambda *args, **kwargs: None,
+    }
+    options.update(overrides)
+    return BrowserSessionFillService(**options)
+
+
+def test_browser_fill_service_persists_record_and_crm_payload(tmp_path: Path) -> None:
+    """Successful fill should write both the runtime record and the CRM payload."""
+    written: list[str] = []
+    saved: list[str] = []
+
+    class _RecordingCRMRepo(_FakeCRMRepo):
+        def save_edited_payload(self, **kwargs: Any) -> dict[str, Any]:
+            saved.append(kwargs["document_id"])
+            return {}
+
+    service = _build_opened_fill_service(
+        tmp_path,
+        write_record=lambda document_id, record: written.append(document_id),
+        crm_repo=_RecordingCRMRepo(),
+    )
+
+    status_code, _ = asyncio.run(
+        service.fill_opened_session(
+            document_id="doc-1",
+            payload={},
+            timeout_ms=1000,
+            fill_strategy="strict_template",
+        )
+    )
+
+    assert status_code == 200
+    assert written == ["doc-1"]
+    assert saved == ["doc-1"]
+    assert (tmp_path / "doc-1").is_dir()
+
+
+def test_browser_fill_service_bounds_concurrent_fills(tmp_path: Path) -> None:
+    """Fills beyond max_concurrent_fills should wait for a free slot."""
+    active = 0
+    peak = 0
+
+    async def _run_browser_call(fn: Any, *args: Any, **kwargs: Any) -> Any:
+        nonlocal active, peak
+        if fn is not _fill:
+            return fn(*args, **kwargs)
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return fn(*args, **kwargs)
+
+    def _fill(*args: Any, **kwargs: Any) -> dict[str, Any]:
+        return {"mode": "html", "filled_fields": ["#field-nie"]}
+
+    service = _build_opened_fill_service(
+        tmp_path,
+        run_browser_call=_run_browser_call,
+        fill_browser_session=_fill,
+        max_concurrent_fills=2,
+    )
+
+    async def scenario() -> list[tuple[int, dict[str, Any]]]:
+        return await asyncio.gather(
+            *(
+                service.fill_opened_session(
+                    document_id=f"doc-{index}",
+                    payload={},
+                    timeout_ms=1000,
+                    fill_strategy="strict_template",
+                )
+                for index in range(5)
+            )
+        )
+
+    results = asyncio.run(scenario())
+
+    assert [status for status, _ in results] == [200] * 5
+    assert peak == 2
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
+from types import SimpleNamespace
 
 from app.mappings.repository import FormMappingRepository
 
@@ -38,3 +39,39 @@ def test_single_latest_template_replaces_previous(tmp_path: Path, monkeypatch) -
     assert len(files) == 1
     parsed = json.loads(files[0].read_text(encoding="utf-8"))
     assert parsed["mappings"][0]["selector"] == "#b"
+
+
+def test_template_version_changes_on_save(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.delenv("MONGODB_URI", raising=False)
+    repo = FormMappingRepository(tmp_path)
+    url = "https://example.com/forms/abc"
+    assert repo.get_version_for_url(url) is None
+
+    repo.save_template(
+        target_url=url,
+        fields=[],
+        mappings=[{"selector": "#a", "canonical_key": "nombre", "field_kind": "text"}],
+    )
+    first = repo.get_version_for_url(url)
+    repo.save_template(
+        target_url=url,
+        fields=[{"selector": "#a"}, {"selector": "#b"}],
+        mappings=[{"selector": "#b", "canonical_key": "cp", "field_kind": "text"}],
+    )
+
+    assert first is not None
+    assert repo.get_version_for_url(url) not in {None, first}
+    assert repo.get_version_for_url("https://example.com/forms/abc/") == (
+        repo.get_version_for_url(url)
+    )
+
+
+def test_template_version_is_none_for_mongo_doc_without_timestamp(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.delenv("MONGODB_URI", raising=False)
+    repo = FormMappingRepository(tmp_path)
+    repo._mongo_enabled = True
+    repo._collection = SimpleNamespace(find_one=lambda *args: {"path": "/forms/abc"})
+
+    assert repo.get_version_for_url("https://example.com/forms/abc") is None
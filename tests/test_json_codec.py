@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.core import json_codec
+
+
+def test_json_codec_round_trips_compact_utf8() -> None:
+    raw = json_codec.dumps({"nombre": "José", "n": [1, 2]})
+    assert isinstance(raw, bytes)
+    assert json_codec.loads(raw) == {"nombre": "José", "n": [1, 2]}
+    assert json_codec.loads(raw.decode("utf-8")) == {"nombre": "José", "n": [1, 2]}
+
+
+def test_json_codec_falls_back_for_lone_surrogates() -> None:
+    raw = json_codec.dumps({"message": "bad \ud800 text", "big": 2**70})
+    assert json_codec.loads(raw) == {"message": "bad \ud800 text", "big": 2**70}
+
+
+def test_json_codec_errors_match_stdlib_types() -> None:
+    with pytest.raises(json.JSONDecodeError):
+        json_codec.loads("{not json")
+    with pytest.raises(TypeError):
+        json_codec.dumps({"value": object()})
+
+
+def test_json_codec_indents_on_request_including_fallback() -> None:
+    pretty = json_codec.dumps({"a": [1]}, indent=True)
+    assert pretty.startswith(b"{\n  ")
+    assert json_codec.loads(pretty) == {"a": [1]}
+    fallback = json_codec.dumps({"a": "\ud800"}, indent=True)
+    assert fallback.startswith(b"{\n  ")
+    assert json_codec.loads(fallback) == {"a": "\ud800"}
+
+
+def test_json_codec_keeps_integers_beyond_64_bits() -> None:
+    raw = json_codec.dumps({"big": 2**70})
+    assert json_codec.loads(raw) == {"big": 2**70}
+    assert json_codec.loads(raw.decode("ascii")) == {"big": 2**70}
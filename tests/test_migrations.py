@@ -35,3 +35,15 @@ def test_apply_migrations_creates_queue_tables(tmp_path: Path) -> None:
         assert "0003_auth_login_rate_limit.sql" in migration_ids
     finally:
         connection.close()
+
+
+def test_apply_migrations_switches_database_to_wal(tmp_path: Path) -> None:
+    db_path = tmp_path / "state.db"
+
+    apply_migrations(db_path)
+
+    connection = sqlite3.connect(str(db_path))
+    try:
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    finally:
+        connection.close()
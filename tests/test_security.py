@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import hashlib
+import hmac
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.security import (
+    _b64url_decode,
+    _b64url_encode,
+    build_signed_token,
+    decode_signed_token,
+)
+
+
+def test_signed_token_matches_plain_hmac_and_round_trips() -> None:
+    token = build_signed_token({"sub": "user-1", "exp": 0}, "secret")
+    header_part, payload_part, signature_part = token.split(".")
+
+    assert _b64url_decode(header_part) == b'{"alg":"HS256","typ":"JWT"}'
+    expected = hmac.new(
+        b"secret", f"{header_part}.{payload_part}".encode(), hashlib.sha256
+    ).digest()
+    assert signature_part == _b64url_encode(expected)
+    assert decode_signed_token(token, "secret") == {"sub": "user-1", "exp": 0}
+
+
+def test_signed_token_rejects_other_key_after_cached_signing() -> None:
+    token = build_signed_token({"sub": "user-1"}, "secret")
+    decode_signed_token(token, "secret")
+
+    with pytest.raises(ValueError, match="signature"):
+        decode_signed_token(token, "other-secret")
+
+
+def test_password_hash_uses_fastpbkdf2_when_enabled(monkeypatch) -> None:
+    from app.core import security
+
+    monkeypatch.delenv("PASSWORD_HASH_FASTPBKDF2", raising=False)
+    security._fastpbkdf2_enabled.cache_clear()
+    calls: list[int] = []
+
+    def _fake_pbkdf2_hmac(name, password, salt, rounds):
+        calls.append(rounds)
+        return hashlib.pbkdf2_hmac(name, password, salt, rounds)
+
+    monkeypatch.setattr(
+        security,
+        "fastpbkdf2",
+        SimpleNamespace(pbkdf2_hmac=_fake_pbkdf2_hmac),
+    )
+    stored = security.hash_password("pw")
+    assert calls == [120_000]
+
+    # The flag is read once per process; disabling it routes back to hashlib.
+    monkeypatch.setattr(security, "_fastpbkdf2_enabled", lambda: False)
+    assert security.verify_password("pw", stored) is True
+    assert security.verify_password("other", stored) is False
+    assert calls == [120_000]
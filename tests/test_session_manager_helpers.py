@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
 from types import SimpleNamespace
 from typing import Any, cast
 
+import pytest
+
+import app.autofill.target_autofill as target_autofill
 import app.browser.session_manager as session_manager
 
 
@@ -11,6 +18,11 @@ class _FakePage:
         self._outcomes = outcomes
         self.url = url
         self.calls: list[str] = []
+        self.load_waits: list[tuple[str, int]] = []
+
+    def wait_for_load_state(self, state: str, timeout: int) -> None:
+        self.load_waits.append((state, timeout))
+        raise RuntimeError("Timeout waiting for domcontentloaded")
 
     def goto(self, target_url: str, wait_until: str, timeout: int) -> None:
         _ = target_url
@@ -34,7 +46,18 @@ def test_session_manager_navigate_with_fallback_succeeds_on_second_attempt() ->
         cast(Any, page), "https://example.test", 1000
     )
 
-    assert page.calls == ["domcontentloaded", "load"]
+    assert page.calls == ["commit", "load"]
+
+
+def test_session_manager_navigate_commits_then_waits_for_dom_briefly() -> None:
+    page = _FakePage(["ok"])
+
+    session_manager._navigate_with_fallback(
+        cast(Any, page), "https://example.test", 25000
+    )
+
+    assert page.calls == ["commit"]
+    assert page.load_waits == [("domcontentloaded", 5000)]
 
 
 def test_session_manager_navigate_with_fallback_accepts_err_aborted_for_pdf() -> None:
@@ -44,7 +67,7 @@ def test_session_manager_navigate_with_fallback_accepts_err_aborted_for_pdf() ->
         cast(Any, page), "https://example.test/doc.pdf", 1000
     )
 
-    assert page.calls == ["domcontentloaded"]
+    assert page.calls == ["commit"]
 
 
 def test_session_manager_navigate_with_fallback_raises_after_all_failures() -> None:
@@ -64,23 +87,116 @@ def test_session_manager_looks_like_pdf_url_short_circuit() -> None:
     assert session_manager._looks_like_pdf_url("https://example.test/file.pdf") is True
 
 
-def test_session_manager_looks_like_pdf_url_detects_head_content_type(monkeypatch) -> None:
-    def _fake_head(*args, **kwargs):
+class _FakeProbeResponse(SimpleNamespace):
+    def __enter__(self) -> "_FakeProbeResponse":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+    def iter_content(self, chunk_size: int):
+        _ = chunk_size
+        return iter([self.body] if self.body else [])
+
+
+def test_session_manager_looks_like_pdf_url_detects_content_type(
+    monkeypatch,
+) -> None:
+    def _fake_get(*args, **kwargs):
         _ = args
         _ = kwargs
-        return SimpleNamespace(
+        return _FakeProbeResponse(
+            status_code=206,
             headers={"content-type": "application/pdf"},
             url="https://example.test/doc",
+            body=b"",
         )
 
-    monkeypatch.setattr(session_manager.requests, "head", _fake_head)
+    monkeypatch.setattr(session_manager, "_PDF_PROBE_CACHE", {})
+    monkeypatch.setattr(session_manager._PROBE_SESSION, "get", _fake_get)
+
+    assert session_manager._looks_like_pdf_url("https://example.test/doc") is True
+
+
+def test_session_manager_pdf_probe_sniffs_magic_bytes(monkeypatch) -> None:
+    bodies = {
+        "https://x.test/doc": b"%PDF-1.7",
+        "https://x.test/page": b"<!doctyp",
+    }
+
+    def _fake_get(target: str, **kwargs):
+        assert kwargs["headers"] == {"Range": "bytes=0-7"}
+        return _FakeProbeResponse(
+            status_code=206,
+            headers={"content-type": "application/octet-stream"},
+            url=target,
+            body=bodies[target],
+        )
+
+    monkeypatch.setattr(session_manager._PROBE_SESSION, "get", _fake_get)
+
+    assert session_manager._looks_like_pdf_url_probe("https://x.test/doc") is True
+    assert session_manager._looks_like_pdf_url_probe("https://x.test/page") is False
+
+
+def test_session_manager_pdf_probe_retries_without_range_on_416(
+    monkeypatch,
+) -> None:
+    get_headers: list[dict[str, str]] = []
+
+    def _fake_get(*args, **kwargs):
+        _ = args
+        get_headers.append(dict(kwargs.get("headers") or {}))
+        if kwargs.get("headers"):
+            return _FakeProbeResponse(
+                status_code=416, headers={}, url="https://x.test/d", body=b""
+            )
+        return _FakeProbeResponse(
+            status_code=200,
+            headers={"content-type": "application/pdf"},
+            url="https://x.test/d",
+            body=b"",
+        )
+
+    monkeypatch.setattr(session_manager._PROBE_SESSION, "get", _fake_get)
+
+    assert session_manager._looks_like_pdf_url_probe("https://x.test/d") is True
+    assert get_headers == [{"Range": "bytes=0-7"}, {}]
+
+
+def test_session_manager_looks_like_pdf_url_caches_negative_probes(
+    monkeypatch,
+) -> None:
+    calls: list[str] = []
+
+    def _fake_probe(target: str) -> bool:
+        calls.append(target)
+        return False
+
+    monkeypatch.setattr(session_manager, "_PDF_PROBE_CACHE", {})
+    monkeypatch.setattr(session_manager, "_looks_like_pdf_url_probe", _fake_probe)
+
+    assert session_manager._looks_like_pdf_url("https://example.test/page") is False
+    assert session_manager._looks_like_pdf_url(" https://example.test/page ") is False
+    assert session_manager._looks_like_pdf_url("https://example.test/a.pdf") is True
+    assert calls == ["https://example.test/page"]
+
+
+def test_session_manager_looks_like_pdf_url_retries_failed_probes(
+    monkeypatch,
+) -> None:
+    outcomes: list[bool | None] = [None, True]
+
+    monkeypatch.setattr(session_manager, "_PDF_PROBE_CACHE", {})
     monkeypatch.setattr(
-        session_manager.requests,
-        "get",
-        lambda *a, **k: SimpleNamespace(headers={}, url="https://example.test/doc"),
+        session_manager, "_looks_like_pdf_url_probe", lambda target: outcomes.pop(0)
     )
 
+    assert session_manager._looks_like_pdf_url("https://example.test/doc") is False
+    assert session_manager._PDF_PROBE_CACHE == {}
+    assert session_manager._looks_like_pdf_url("https://example.test/doc") is True
     assert session_manager._looks_like_pdf_url("https://example.test/doc") is True
+    assert outcomes == []
 
 
 def test_session_manager_stop_playwright_if_idle_stops_instance() -> None:
@@ -97,3 +213,352 @@ def test_session_manager_stop_playwright_if_idle_stops_instance() -> None:
 
     assert fake.stopped is True
     assert session_manager._PLAYWRIGHT is None
+
+
+class _FakeContext:
+    def __init__(self) -> None:
+        self.closed = False
+        self.page = SimpleNamespace(
+            url="about:blank",
+            on=lambda *a: None,
+            set_default_timeout=lambda timeout: None,
+        )
+
+    def on(self, *args: Any) -> None:
+        _ = args
+
+    def new_page(self) -> Any:
+        return self.page
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class _FakeBrowser:
+    def __init__(self) -> None:
+        self.closed = False
+        self.contexts: list[_FakeContext] = []
+
+    def is_connected(self) -> bool:
+        return not self.closed
+
+    def new_context(self, **kwargs: Any) -> _FakeContext:
+        _ = kwargs
+        context = _FakeContext()
+        self.contexts.append(context)
+        return context
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _fake_playwright(launched: list[_FakeBrowser]) -> Any:
+    def _launch(**kwargs: Any) -> _FakeBrowser:
+        _ = kwargs
+        browser = _FakeBrowser()
+        launched.append(browser)
+        return browser
+
+    return SimpleNamespace(chromium=SimpleNamespace(launch=_launch))
+
+
+def test_session_manager_browser_pool_shares_and_retires(monkeypatch) -> None:
+    monkeypatch.setattr(session_manager, "_BROWSER_POOL", [])
+    monkeypatch.setenv("BROWSER_POOL_SIZE", "1")
+    monkeypatch.setenv("MAX_USES_PER_INSTANCE", "2")
+    launched: list[_FakeBrowser] = []
+    p = _fake_playwright(launched)
+
+    first, pooled = session_manager._acquire_browser(p, headless=True, slow_mo=0)
+    assert pooled is True
+    # Concurrent sessions with the same options share one browser process.
+    second, second_pooled = session_manager._acquire_browser(
+        p, headless=True, slow_mo=0
+    )
+    assert second is first and second_pooled is True
+    # The shared browser is worn out and the pool is full: overflow is unpooled.
+    overflow, overflow_pooled = session_manager._acquire_browser(
+        p, headless=True, slow_mo=0
+    )
+    assert overflow_pooled is False and overflow is not first
+
+    session_manager._release_browser(first)
+    assert launched[0].closed is False
+    session_manager._release_browser(second)
+    assert launched[0].closed is True
+    assert session_manager._BROWSER_POOL == []
+    assert len(launched) == 2
+
+
+def test_session_manager_browser_pool_launches_outside_lock(monkeypatch) -> None:
+    monkeypatch.setattr(session_manager, "_BROWSER_POOL", [])
+    monkeypatch.setattr(session_manager, "_BROWSER_POOL_LAUNCHING", 0)
+    monkeypatch.setenv("BROWSER_POOL_SIZE", "1")
+    lock_free: list[bool] = []
+
+    def _probe_lock() -> bool:
+        acquired = session_manager._PLAYWRIGHT_LOCK.acquire(timeout=0)
+        if acquired:
+            session_manager._PLAYWRIGHT_LOCK.release()
+        return acquired
+
+    def _launch(**kwargs: Any) -> _FakeBrowser:
+        _ = kwargs
+        # Another thread must be able to take the driver lock mid-launch.
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            lock_free.append(executor.submit(_probe_lock).result())
+        raise RuntimeError("launch failed")
+
+    p: Any = SimpleNamespace(chromium=SimpleNamespace(launch=_launch))
+    with pytest.raises(RuntimeError):
+        session_manager._acquire_browser(p, headless=True, slow_mo=0)
+    assert lock_free == [True]
+    # The reserved slot is handed back so the next open can still pool.
+    assert session_manager._BROWSER_POOL_LAUNCHING == 0
+    launched: list[_FakeBrowser] = []
+    _, pooled = session_manager._acquire_browser(
+        _fake_playwright(launched), headless=True, slow_mo=0
+    )
+    assert pooled is True
+
+
+def test_session_manager_close_parks_fresh_context_for_next_open(
+    monkeypatch,
+) -> None:
+    monkeypatch.setattr(session_manager, "_BROWSER_POOL", [])
+    monkeypatch.setattr(session_manager, "_WARM_CONTEXTS", [])
+    monkeypatch.setattr(session_manager, "_SESSIONS", {})
+    monkeypatch.setenv("BROWSER_CONTEXT_POOL_SIZE", "1")
+    launched: list[_FakeBrowser] = []
+    p = _fake_playwright(launched)
+    monkeypatch.setattr(session_manager, "_get_or_start_playwright", lambda: p)
+    monkeypatch.setattr(session_manager, "_navigate_with_fallback", lambda *a: None)
+    monkeypatch.setattr(
+        session_manager, "_capture_template_debug_bundle", lambda **k: None
+    )
+
+    first = session_manager.open_browser_session("https://example.test")
+    session_manager.close_browser_session(first["session_id"])
+    (browser,) = launched
+    used, warm = browser.contexts
+    assert used.closed is True and warm.closed is False
+
+    second = session_manager.open_browser_session("https://example.test")
+    assert len(launched) == 1 and len(browser.contexts) == 2
+    assert session_manager._SESSIONS[second["session_id"]].context is warm
+    assert session_manager._WARM_CONTEXTS == []
+
+
+class _DebugCapture:
+    """Runs template debug captures into ``root`` and waits for the writer."""
+
+    def __init__(self, root, monkeypatch) -> None:
+        self.root = root
+        self._monkeypatch = monkeypatch
+
+    def enable(self, *options: str) -> None:
+        for option in options:
+            self._monkeypatch.setattr(
+                session_manager, f"is_template_debug_{option}_enabled", lambda: True
+            )
+
+    def run(self, page: Any, *, stage: str = "before_fill", payload=None):
+        session = SimpleNamespace(
+            session_id="abcdef123456", target_url=page.url, page=page
+        )
+        executor = ThreadPoolExecutor(max_workers=1)
+        self._monkeypatch.setattr(session_manager, "_DEBUG_EXECUTOR", executor)
+        session_manager._capture_template_debug_bundle(
+            session=cast(Any, session), stage=stage, payload=payload or {}
+        )
+        executor.shutdown(wait=True)
+        (run_dir,) = list(self.root.iterdir())
+        return run_dir
+
+
+@pytest.fixture
+def debug_capture(tmp_path, monkeypatch) -> _DebugCapture:
+    monkeypatch.setattr(
+        session_manager, "is_template_debug_capture_enabled", lambda: True
+    )
+    for option in ("combined", "screenshot", "html"):
+        monkeypatch.setattr(
+            session_manager, f"is_template_debug_{option}_enabled", lambda: False
+        )
+    monkeypatch.setattr(session_manager, "_debug_root_dir", lambda: tmp_path)
+    return _DebugCapture(tmp_path, monkeypatch)
+
+
+def _pdf_debug_page() -> SimpleNamespace:
+    return SimpleNamespace(url="https://example.test/a.pdf", is_closed=lambda: False)
+
+
+def test_session_manager_debug_bundle_is_written_in_background(
+    debug_capture, monkeypatch
+) -> None:
+    monkeypatch.setattr(
+        session_manager,
+        "inspect_and_extract_pdf_from_url",
+        lambda url, timeout_ms: ([{"name": "nombre"}], [], []),
+    )
+
+    run_dir = debug_capture.run(_pdf_debug_page(), payload={"a": 1})
+
+    assert sorted(p.name for p in run_dir.iterdir()) == [
+        "explicit_mappings.json",
+        "fields.json",
+        "meta.json",
+        "payload.json",
+        "placeholder_mappings.json",
+    ]
+
+
+def test_session_manager_debug_bundle_combined_layout(
+    debug_capture, monkeypatch
+) -> None:
+    debug_capture.enable("combined")
+    monkeypatch.setattr(
+        session_manager,
+        "inspect_and_extract_pdf_from_url",
+        lambda url, timeout_ms: ([{"name": "nombre"}], [], ["zzz"]),
+    )
+
+    run_dir = debug_capture.run(_pdf_debug_page(), payload={"a": 1})
+
+    (bundle_path,) = list(run_dir.iterdir())
+    assert bundle_path.name == "bundle.json"
+    bundle = json.loads(bundle_path.read_text(encoding="utf-8"))
+    assert bundle["payload"] == {"a": 1}
+    assert bundle["fields"] == [{"name": "nombre"}]
+    assert bundle["placeholder_mappings"] == {"mappings": [], "unknown_vars": ["zzz"]}
+    assert bundle["meta"]["stage"] == "before_fill"
+
+
+def test_session_manager_combined_bundle_keeps_meta_when_inspect_fails(
+    debug_capture, monkeypatch
+) -> None:
+    def _failing_inspect(url, timeout_ms):
+        raise RuntimeError("download failed")
+
+    debug_capture.enable("combined")
+    monkeypatch.setattr(
+        session_manager, "inspect_and_extract_pdf_from_url", _failing_inspect
+    )
+
+    run_dir = debug_capture.run(_pdf_debug_page(), payload={"a": 1})
+
+    bundle = json.loads((run_dir / "bundle.json").read_text(encoding="utf-8"))
+    assert bundle["meta"]["stage"] == "before_fill"
+    assert bundle["payload"] == {"a": 1}
+    assert "fields" not in bundle
+
+
+def test_session_manager_debug_bundle_skips_screenshot_by_default(
+    debug_capture, monkeypatch
+) -> None:
+    def _no_screenshot(**kwargs):
+        raise AssertionError("screenshot should be opt-in")
+
+    page = SimpleNamespace(
+        url="https://example.test/form",
+        is_closed=lambda: False,
+        content=lambda: "<html></html>",
+        screenshot=_no_screenshot,
+    )
+    debug_capture.enable("html")
+    monkeypatch.setattr(session_manager, "_looks_like_pdf_url", lambda url: False)
+    monkeypatch.setattr(session_manager, "inspect_form_fields", lambda page: [])
+    monkeypatch.setattr(
+        session_manager, "extract_html_placeholder_mappings", lambda page: ([], [])
+    )
+
+    run_dir = debug_capture.run(page)
+
+    names = {p.name for p in run_dir.iterdir()}
+    assert "page.jpg" not in names
+    html = gzip.decompress((run_dir / "page.html.gz").read_bytes())
+    assert html == b"<html></html>"
+
+
+def test_session_manager_fill_target_is_resolved_once_per_page_url(
+    monkeypatch,
+) -> None:
+    probes: list[str] = []
+
+    def _fake_fetch(url: str, *, timeout_ms: int) -> bytes:
+        _ = timeout_ms
+        probes.append(url)
+        raise RuntimeError("Target URL does not look like PDF")
+
+    monkeypatch.setattr(session_manager, "_looks_like_pdf_url", lambda url: False)
+    monkeypatch.setattr(session_manager, "download_pdf_bytes", _fake_fetch)
+    session = SimpleNamespace(
+        target_url="https://example.test/start", pdf_fill_target=None
+    )
+
+    for _ in range(2):
+        assert session_manager._resolve_pdf_fill_target(
+            cast(Any, session), "https://example.test/form", 1000
+        ) == ("", None)
+    session_manager._resolve_pdf_fill_target(
+        cast(Any, session), "https://example.test/next", 1000
+    )
+
+    assert probes == ["https://example.test/start"] * 2
+
+
+def test_session_manager_forced_pdf_session_fills_as_pdf_every_time(
+    tmp_path, monkeypatch
+) -> None:
+    fetches: list[str] = []
+    previews: list[tuple[str, bytes | None]] = []
+
+    def _fake_download(url: str, timeout_ms: int) -> tuple[bytes, str]:
+        _ = timeout_ms
+        fetches.append(url)
+        return f"%PDF-fresh-{len(fetches)}".encode(), "application/pdf"
+
+    def _fake_preview(payload, target_url, out_dir, **kwargs):
+        _ = payload
+        _ = out_dir
+        previews.append((target_url, kwargs["pdf_bytes"]))
+        return {"filled_fields": []}
+
+    page = SimpleNamespace(url="https://example.test/viewer", is_closed=lambda: False)
+    session = session_manager.BrowserSessionRecord(
+        session_id="abcdef123456",
+        browser=cast(Any, None),
+        context=cast(Any, None),
+        page=cast(Any, page),
+        target_url="https://example.test/documents/d/form",
+    )
+    monkeypatch.setattr(session_manager, "_get_session", lambda session_id: session)
+    monkeypatch.setattr(
+        session_manager, "_capture_template_debug_bundle", lambda **kwargs: None
+    )
+    monkeypatch.setattr(session_manager, "_looks_like_pdf_url", lambda url: False)
+    # A recent debug capture left stale bytes in the short-lived cache.
+    monkeypatch.setattr(
+        target_autofill,
+        "_PDF_BYTES_CACHE",
+        {session.target_url: (monotonic(), b"%PDF-stale", "application/pdf")},
+    )
+    monkeypatch.setattr(target_autofill, "_download_pdf_bytes", _fake_download)
+    monkeypatch.setattr(
+        session_manager, "inspect_pdf_fields_from_bytes", lambda data: []
+    )
+    monkeypatch.setattr(session_manager, "autofill_target_preview", _fake_preview)
+    monkeypatch.setattr(
+        session_manager,
+        "autofill_existing_html_page",
+        lambda *args, **kwargs: pytest.fail("forced PDF took the HTML path"),
+    )
+
+    for _ in range(2):
+        session_manager.fill_browser_session("abcdef123456", {}, tmp_path)
+
+    assert previews == [
+        (session.target_url, b"%PDF-fresh-1"),
+        (session.target_url, b"%PDF-fresh-2"),
+    ]
+    assert fetches == [session.target_url] * 2
@@ -1,10 +1,27 @@
 from __future__ import annotations
 
+from pathlib import Path
+from time import monotonic
+from typing import Any, cast
+
+import fitz
+import pytest
+
+from app.autofill import target_autofill
 from app.autofill.target_autofill import (
+    _LABEL_PATTERNS,
+    _apply_adapter_admin_tasas_pdf,
+    _apply_adapter_generic_html,
     _canonical_keys_from_placeholder_tokens,
+    _combined_label_pattern,
     _eval_checked_when,
+    _FilledFields,
     _select_canonical_for_composite_placeholder,
     build_autofill_value_map,
+    extract_html_placeholder_mappings,
+    extract_pdf_placeholder_mappings_from_bytes,
+    inspect_and_extract_pdf_from_bytes,
+    inspect_pdf_fields_from_bytes,
 )
 from tests.mock_user import mock_payload
 
@@ -79,3 +96,332 @@ def test_build_value_map_splits_compact_floor_and_door() -> None:
     values = build_autofill_value_map(payload)
     assert values["piso"] == "5"
     assert values["puerta"] == "C"
+
+
+def _placeholder_pdf_bytes() -> bytes:
+    doc = fitz.open()
+    page = doc.new_page()
+    for idx, (name, value) in enumerate(
+        [("nombre", "{nombre}"), ("via", "{tipo_via} {nombre_via}"), ("x", "{zzz}")]
+    ):
+        widget = fitz.Widget()
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.field_name = name
+        widget.rect = fitz.Rect(100, 48 + idx * 30, 300, 64 + idx * 30)
+        widget.field_value = value
+        page.add_widget(widget)
+    data: bytes = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_inspect_and_extract_pdf_matches_separate_passes() -> None:
+    data = _placeholder_pdf_bytes()
+    fields, mappings, unknown_vars = inspect_and_extract_pdf_from_bytes(data)
+    assert fields == inspect_pdf_fields_from_bytes(data)
+    assert (mappings, unknown_vars) == extract_pdf_placeholder_mappings_from_bytes(data)
+    assert [row["name"] for row in fields] == ["nombre", "via", "x"]
+    assert [m["canonical_key"] for m in mappings] == ["nombre", "domicilio_en_espana"]
+    assert unknown_vars == ["zzz"]
+
+
+class _PlaceholderRowsPage:
+    """Stands in for the page script: returns the rows it would emit."""
+
+    def __init__(self, rows: list[dict] | None) -> None:
+        self.rows = rows
+        self.evaluations = 0
+
+    def evaluate(self, _script: str) -> list[dict] | None:
+        self.evaluations += 1
+        return self.rows
+
+
+def test_extract_html_placeholder_mappings_uses_in_page_filtered_rows() -> None:
+    page = _PlaceholderRowsPage(
+        [
+            {"selector": "#nombre", "key": "nombre"},
+            {"selector": "#zzz", "key": "zzz"},
+            {"selector": "#again", "key": "zzz"},
+            {"selector": "", "key": "nombre"},
+        ]
+    )
+    mappings, unknown_vars = extract_html_placeholder_mappings(
+        page  # type: ignore[arg-type]
+    )
+    assert mappings == [
+        {
+            "selector": "#nombre",
+            "canonical_key": "nombre",
+            "source": "placeholder",
+            "confidence": 1.0,
+        }
+    ]
+    assert unknown_vars == ["zzz"]
+    assert page.evaluations == 1
+
+
+def test_extract_html_placeholder_mappings_handles_empty_page() -> None:
+    empty_rows: tuple[list[dict] | None, ...] = (None, [])
+    for rows in empty_rows:
+        page = cast(Any, _PlaceholderRowsPage(rows))
+        assert extract_html_placeholder_mappings(page) == ([], [])
+
+
+class _BatchRecordingPage:
+    def __init__(self, accept: set[str] | None = None) -> None:
+        self.calls: list[list[dict]] = []
+        self.accept = accept
+
+    def evaluate(self, _script: str, batch: list[dict]) -> list[str]:
+        self.calls.append(batch)
+        keys = [item["key"] for item in batch]
+        if self.accept is not None:
+            keys = [key for key in keys if key in self.accept]
+        return list(dict.fromkeys(keys))
+
+    def get_by_label(self, _pattern: object) -> object:
+        raise LookupError("no labels on this page")
+
+
+def test_admin_tasas_adapter_fills_in_one_round_trip() -> None:
+    page = _BatchRecordingPage()
+    filled = _FilledFields()
+    _apply_adapter_admin_tasas_pdf(
+        page,  # type: ignore[arg-type]
+        {
+            "nif_nie": "X1234567L",
+            "nombre_apellidos": "PEREZ GOMEZ, JUAN",
+            "nacionalidad": "UKR",
+            "provincia": "Nowhere",
+            "cp": "28001",
+        },
+        filled,
+    )
+    assert len(page.calls) == 1
+    by_key = {item["key"]: item for item in page.calls[0]}
+    assert by_key["nacionalidad"]["values"] == ["UCRANIA"]
+    assert by_key["provincia"]["values"] == ["Nowhere", "MADRID"]
+    assert filled.order == [
+        "nif_nie",
+        "primer_apellido",
+        "segundo_apellido",
+        "nombre",
+        "nacionalidad",
+        "provincia",
+        "cp",
+    ]
+
+
+def test_generic_adapter_batches_selectors_and_keeps_fill_order() -> None:
+    page = _BatchRecordingPage(accept={"email", "nacionalidad"})
+    filled = _FilledFields()
+    _apply_adapter_generic_html(
+        page,  # type: ignore[arg-type]
+        {"nif_nie": "X1234567L", "email": "a@b.es", "nacionalidad": "UKR"},
+        filled,
+    )
+    assert [[item["key"] for item in call] for call in page.calls] == [
+        ["nacionalidad"],
+        ["email"],
+    ]
+    assert filled.order == ["nacionalidad", "email"]
+
+
+def test_generic_adapter_writes_full_name_after_label_fills(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    # "^Nombre" resolves to the same #full_name input the selector batch fills.
+    dom: dict[str, str] = {}
+
+    def _fake_fill_by_label(_page, patterns, value):
+        if patterns is _LABEL_PATTERNS["nombre"]:
+            dom["#full_name"] = value
+            return True
+        return False
+
+    def _fake_batch(_page, batch):
+        filled_keys = []
+        for item in batch:
+            if item["values"] and "#full_name" in item["selectors"]:
+                dom["#full_name"] = item["values"][0]
+                filled_keys.append(item["key"])
+        return filled_keys
+
+    monkeypatch.setattr(target_autofill, "_fill_by_label", _fake_fill_by_label)
+    monkeypatch.setattr(target_autofill, "_run_batch_fill", _fake_batch)
+    filled = _FilledFields()
+    _apply_adapter_generic_html(
+        object(),  # type: ignore[arg-type]
+        {"nombre_apellidos": "PEREZ GOMEZ, JUAN"},
+        filled,
+    )
+    assert dom["#full_name"] == "PEREZ GOMEZ, JUAN"
+    assert filled.order[-1] == "nombre_apellidos"
+
+
+def test_combined_label_pattern_matches_any_alternative() -> None:
+    combined = _combined_label_pattern(_LABEL_PATTERNS["cp"])
+    for label in ["C. Postal", "Código postal", "CP"]:
+        assert combined.search(label)
+    assert not combined.search("Municipio")
+    assert _combined_label_pattern(_LABEL_PATTERNS["cp"]) is combined
+
+
+def test_pdf_autofill_without_values_keeps_source_bytes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    data = _placeholder_pdf_bytes()
+    monkeypatch.setattr(
+        target_autofill,
+        "_download_pdf_bytes",
+        lambda _url, _t: (data, "application/pdf"),
+    )
+    result = target_autofill._autofill_pdf_target(
+        {}, "https://example.test/form.pdf", tmp_path, timeout_ms=1000
+    )
+    assert result["filled_fields"] == []
+    assert Path(result["filled_pdf"]).read_bytes() == data
+    assert len(result["warnings"]) == 2
+
+
+def test_pdf_autofill_skips_update_for_unchanged_values(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    payload = mock_payload()
+    nombre = build_autofill_value_map(payload)["nombre"]
+    doc = fitz.open()
+    page = doc.new_page()
+    for idx, (name, value) in enumerate([("nombre", nombre), ("nie", "")]):
+        widget = fitz.Widget()
+        widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+        widget.field_name = name
+        widget.rect = fitz.Rect(100, 48 + idx * 30, 300, 64 + idx * 30)
+        widget.field_value = value
+        page.add_widget(widget)
+    data = doc.tobytes()
+    doc.close()
+    monkeypatch.setattr(
+        target_autofill,
+        "_download_pdf_bytes",
+        lambda _url, _t: (data, "application/pdf"),
+    )
+    updated: list[str] = []
+    original_update = fitz.Widget.update
+
+    def _recording_update(self: fitz.Widget) -> None:
+        updated.append(self.field_name)
+        original_update(self)
+
+    monkeypatch.setattr(fitz.Widget, "update", _recording_update)
+    result = target_autofill._autofill_pdf_target(
+        payload,
+        "https://example.test/form.pdf",
+        tmp_path,
+        timeout_ms=1000,
+        explicit_mappings=[
+            {"selector": "pdf:nombre", "canonical_key": "nombre"},
+            {"selector": "pdf:nie", "canonical_key": "nif_nie"},
+        ],
+    )
+    assert result["filled_fields"] == ["nombre", "nie"]
+    assert updated == ["nie"]
+
+
+def test_autofill_target_preview_uses_prefetched_pdf_bytes(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def _no_network(*_args: object, **_kwargs: object) -> None:
+        raise AssertionError("prefetched bytes must skip probing and fetching")
+
+    monkeypatch.setattr(target_autofill, "_infer_target_type", _no_network)
+    monkeypatch.setattr(target_autofill, "_download_pdf_bytes", _no_network)
+    result = target_autofill.autofill_target_preview(
+        {},
+        "https://example.test/viewer?id=1",
+        tmp_path,
+        pdf_bytes=_placeholder_pdf_bytes(),
+    )
+    assert result["mode"] == "pdf_pymupdf"
+
+
+def test_fetch_pdf_bytes_reuses_recent_download(monkeypatch) -> None:
+    downloads: list[str] = []
+
+    def _fake_download(url: str, timeout_ms: int) -> tuple[bytes, str]:
+        _ = timeout_ms
+        downloads.append(url)
+        return b"%PDF-1.7", "application/pdf"
+
+    monkeypatch.setattr(target_autofill, "_PDF_BYTES_CACHE", {})
+    monkeypatch.setattr(target_autofill, "_download_pdf_bytes", _fake_download)
+
+    first = target_autofill.fetch_pdf_bytes("https://example.test/form.pdf")
+    second = target_autofill.fetch_pdf_bytes("https://example.test/form.pdf")
+    target_autofill.fetch_pdf_bytes("https://example.test/other.pdf")
+
+    assert first == second == b"%PDF-1.7"
+    assert downloads == [
+        "https://example.test/form.pdf",
+        "https://example.test/other.pdf",
+    ]
+
+
+def test_pdf_autofill_downloads_fresh_bytes_despite_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fresh = _placeholder_pdf_bytes()
+    monkeypatch.setattr(
+        target_autofill,
+        "_PDF_BYTES_CACHE",
+        {"https://example.test/form.pdf": (monotonic(), b"stale", "application/pdf")},
+    )
+    monkeypatch.setattr(
+        target_autofill,
+        "_download_pdf_bytes",
+        lambda _url, _t: (fresh, "application/pdf"),
+    )
+    result = target_autofill._autofill_pdf_target(
+        {}, "https://example.test/form.pdf", tmp_path, timeout_ms=1000
+    )
+    assert Path(result["filled_pdf"]).read_bytes() == fresh
+
+
+class _ShadowCheckboxLocator:
+    def __init__(self) -> None:
+        self.checked = False
+
+    @property
+    def first(self) -> "_ShadowCheckboxLocator":
+        return self
+
+    def count(self) -> int:
+        return 1
+
+    def is_visible(self) -> bool:
+        return True
+
+    def is_disabled(self) -> bool:
+        return False
+
+    def get_attribute(self, name: str) -> str:
+        return "checkbox" if name == "type" else ""
+
+    def check(self) -> None:
+        self.checked = True
+
+
+def test_set_check_falls_back_to_locator_for_shadow_dom_checkbox() -> None:
+    loc = _ShadowCheckboxLocator()
+
+    class _Page:
+        def locator(self, _selector: str) -> _ShadowCheckboxLocator:
+            return loc
+
+        def evaluate(self, _script: str, _selector: str) -> None:
+            # document.querySelector does not reach into shadow roots.
+            return None
+
+    page = cast(Any, _Page())
+    assert target_autofill._set_check_if_possible(page, ["#consent"], True)
+    assert loc.checked is True
@@ -4,7 +4,9 @@ from dataclasses import dataclass
 
 from app.autofill.target_helpers import norm_text, strip_extra_spaces
 from app.autofill.target_pdf_helpers import (
+    CheckboxContext,
     build_nif_split_field_map,
+    classify_pdf_field,
     infer_pdf_checkbox_expected,
     pdf_value_for_field,
     should_ignore_pdf_mapping,
@@ -67,6 +69,16 @@ def test_target_pdf_helpers_pdf_value_for_field_variants() -> None:
     assert piso_puerta == "2 B"
 
 
+def test_target_pdf_helpers_classify_pdf_field_keeps_rule_priority() -> None:
+    assert classify_pdf_field("pisoypuerta") == ("piso_puerta", "piso", "puerta")
+    assert classify_pdf_field("fechadesolicitud") == ("fecha",)
+    assert classify_pdf_field("fechanacimiento") == ("fecha_nacimiento",)
+    assert classify_pdf_field("nombre") == ("nombre",)
+    assert classify_pdf_field("forename") == ("nombre_apellidos",)
+    assert classify_pdf_field("zzz") == ()
+    assert classify_pdf_field("") == ()
+
+
 def test_target_pdf_helpers_build_nif_split_field_map() -> None:
     doc = [
         _Page(
@@ -103,7 +115,9 @@ def test_target_pdf_helpers_infer_checkbox_expected() -> None:
     hijos = infer_pdf_checkbox_expected(
         "HIJOS", "hijos_escolarizacion_espana", value_map, norm_text=norm_text
     )
-    none_case = infer_pdf_checkbox_expected("random", "", value_map, norm_text=norm_text)
+    none_case = infer_pdf_checkbox_expected(
+        "random", "", value_map, norm_text=norm_text
+    )
 
     assert sexo is True
     assert estado is False
@@ -111,5 +125,13 @@ def test_target_pdf_helpers_infer_checkbox_expected() -> None:
     assert none_case is None
 
 
+def test_target_pdf_helpers_checkbox_context_is_used_when_given() -> None:
+    ctx = CheckboxContext.from_value_map({"sexo": " m ", "estado_civil": "c"})
+    assert ctx == CheckboxContext(sexo="M", estado="C", hijos="")
+    # The precomputed context wins over the (stale) value map.
+    assert infer_pdf_checkbox_expected("M", "sexo", {}, norm_text=norm_text, ctx=ctx)
+    assert infer_pdf_checkbox_expected("C", "", {}, norm_text=norm_text, ctx=ctx)
+
+
 def test_target_pdf_helpers_should_ignore_mapping_is_disabled() -> None:
     assert should_ignore_pdf_mapping("name", "key", "source", "checkbox") is False
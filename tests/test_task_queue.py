@@ -51,6 +51,28 @@ def test_task_queue_executes_registered_handler(tmp_path: Path) -> None:
     asyncio.run(scenario())
 
 
+def test_task_queue_round_trips_payloads_orjson_rejects(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        queue = _build_queue(tmp_path)
+
+        async def handler(payload: dict[str, object]) -> dict[str, object]:
+            return {"echo": payload["text"], "big": payload["big"]}
+
+        queue.register_handler("sample", handler)
+        await queue.start()
+        task_id = queue.submit(
+            task_type="sample", payload={"text": "bad \ud800", "big": 2**70}
+        )
+        result = await _wait_terminal(queue, task_id)
+        await queue.stop()
+        queue.close()
+
+        assert result["status"] == "completed"
+        assert result["result"] == {"echo": "bad \ud800", "big": 2**70}
+
+    asyncio.run(scenario())
+
+
 def test_task_queue_moves_to_dead_letter_after_retries(tmp_path: Path) -> None:
     async def scenario() -> None:
         queue = _build_queue(tmp_path)
@@ -107,3 +129,14 @@ def test_task_queue_respects_idempotency_key(tmp_path: Path) -> None:
         assert result["status"] == "completed"
 
     asyncio.run(scenario())
+
+
+def test_task_queue_connection_uses_wal_pragmas(tmp_path: Path) -> None:
+    queue = _build_queue(tmp_path)
+    try:
+        connection = queue._connection
+        assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert connection.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert connection.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    finally:
+        queue.close()
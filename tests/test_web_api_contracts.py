@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from fastapi.routing import APIRoute
 
-from web_api import app
+from web_api import _env_int, app
 
 
 def test_health_endpoint_contract_function() -> None:
@@ -76,3 +76,14 @@ def test_openapi_contains_documents_and_crm_contracts() -> None:
     assert address_autofill["responses"]["200"]["content"]["application/json"][
         "schema"
     ]["$ref"].endswith("AddressAutofillResponse")
+
+
+def test_env_int_falls_back_on_blank_and_clamps_to_minimum(monkeypatch) -> None:
+    monkeypatch.setenv("MAX_CONCURRENT_FILLS", "")
+    assert _env_int("MAX_CONCURRENT_FILLS", 4, minimum=1) == 4
+    monkeypatch.setenv("MAX_CONCURRENT_FILLS", "lots")
+    assert _env_int("MAX_CONCURRENT_FILLS", 4, minimum=1) == 4
+    monkeypatch.setenv("MAX_CONCURRENT_FILLS", "0")
+    assert _env_int("MAX_CONCURRENT_FILLS", 4, minimum=1) == 1
+    monkeypatch.setenv("MAX_CONCURRENT_FILLS", "8")
+    assert _env_int("MAX_CONCURRENT_FILLS", 4, minimum=1) == 8
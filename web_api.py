@@ -32,6 +32,7 @@ from app.browser.session_lifecycle_service import BrowserSessionLifecycleService
 from app.browser.session_manager import (
     close_browser_session,
     fill_browser_session,
+    get_browser_session_current_url,
     get_browser_session_state,
     open_browser_session,
 )
@@ -79,6 +80,13 @@ _BROWSER_EXECUTOR = ThreadPoolExecutor(
 DEFAULT_TARGET_URL = ""
 
 
+def _env_int(name: str, default: int, *, minimum: int) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except ValueError:
+        return default
+
+
 def _safe(value: Any) -> str:
     if value is None:
         return ""
@@ -300,7 +308,7 @@ def create_app() -> FastAPI:
             payload, require_tramite=require_tramite
         ),
         run_browser_call=_run_browser_call,
-        get_browser_session_state=get_browser_session_state,
+        get_browser_session_url=get_browser_session_current_url,
         fill_browser_session=fill_browser_session,
         template_mapping_service=template_mapping_service,
         crm_repo=CRM_REPO,
@@ -309,6 +317,7 @@ def create_app() -> FastAPI:
         latest_artifact_url=_latest_artifact_url,
         should_save_artifact_screenshots_on_error=should_save_artifact_screenshots_on_error,
         logger_info=LOGGER.info,
+        max_concurrent_fills=_env_int("MAX_CONCURRENT_FILLS", 4, minimum=1),
     )
     task_queue = TaskQueue(
         QueueSettings(